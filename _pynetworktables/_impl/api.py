@@ -7,6 +7,8 @@ from .entry_notifier import EntryNotifier
 from .rpc_server import RpcServer
 from .storage import Storage
 
+from .support import profiling
+
 from .constants import NT_NOTIFY_IMMEDIATE, NT_NOTIFY_NEW
 
 _is_new = NT_NOTIFY_IMMEDIATE | NT_NOTIFY_NEW
@@ -60,10 +62,12 @@ class NtCoreApi(object):
         self.getEntryNameById = self.storage.getEntryNameById
         self.getEntryTypeById = self.storage.getEntryTypeById
         self.getEntryValue = self.storage.getEntryValue
+        self.getEntryValuesByName = self.storage.getEntryValuesByName
         self.setDefaultEntryValue = self.storage.setDefaultEntryValue
         self.setDefaultEntryValueById = self.storage.setDefaultEntryValueById
         self.setEntryValue = self.storage.setEntryValue
         self.setEntryValueById = self.storage.setEntryValueById
+        self.setEntryValuesByName = self.storage.setEntryValuesByName
         self.setEntryTypeValue = self.storage.setEntryTypeValue
         self.setEntryTypeValueById = self.storage.setEntryTypeValueById
         self.setEntryFlags = self.storage.setEntryFlags
@@ -83,6 +87,9 @@ class NtCoreApi(object):
     def addEntryListener(self, prefix, callback, flags):
         return self.storage.addListener(prefix, callback, flags)
 
+    def addEntryListenerBatch(self, prefix, callback, flags, collapse=False):
+        return self.storage.addListenerBatch(prefix, callback, flags, collapse)
+
     def addEntryListenerById(self, local_id, callback, flags):
         return self.storage.addListenerById(local_id, callback, flags)
 
@@ -103,8 +110,11 @@ class NtCoreApi(object):
 
         return self.storage.addListenerById(local_id, listener, flags)
 
-    def createEntryListenerPoller(self):
-        return self.entry_notifier.createPoller()
+    def createEntryListenerPoller(self, conflate=False, maxlen=None):
+        return self.entry_notifier.createPoller(conflate, maxlen)
+
+    def getEntryListenerPollerOverflow(self, poller_uid):
+        return self.entry_notifier.getPollerOverflow(poller_uid)
 
     def destroyEntryListenerPoller(self, poller_uid):
         self.entry_notifier.removePoller(poller_uid)
@@ -134,6 +144,9 @@ class NtCoreApi(object):
     def addConnectionListener(self, callback, immediate_notify):
         return self.dispatcher.addListener(callback, immediate_notify)
 
+    def addConnectionBackpressureListener(self, callback):
+        return self.conn_notifier.addBackpressure(callback)
+
     def createConnectionListenerPoller(self):
         return self.conn_notifier.createPoller()
 
@@ -183,14 +196,16 @@ class NtCoreApi(object):
         else:
             return False
 
-    def startServer(self, persist_filename, listen_address, port):
-        return self.dispatcher.startServer(persist_filename, listen_address, port)
+    def startServer(self, persist_filename, listen_address, port, use_asyncio=False):
+        return self.dispatcher.startServer(
+            persist_filename, listen_address, port, use_asyncio
+        )
 
     def stopServer(self):
         self.dispatcher.stop()
 
-    def startClient(self):
-        return self.dispatcher.startClient()
+    def startClient(self, use_asyncio=False):
+        return self.dispatcher.startClient(use_asyncio)
 
     def stopClient(self):
         self.dispatcher.stop()
@@ -207,17 +222,32 @@ class NtCoreApi(object):
     def stopDSClient(self):
         self.ds_client.stop()
 
-    def setUpdateRate(self, interval):
-        self.dispatcher.setUpdateRate(interval)
+    def setUpdateRate(self, interval, max_interval=None):
+        self.dispatcher.setUpdateRate(interval, max_interval)
+
+    def setOutgoingBudget(self, max_messages, max_bytes):
+        self.dispatcher.setOutgoingBudget(max_messages, max_bytes)
+
+    def setHandshakeLimits(self, max_handshakes, max_pending):
+        self.dispatcher.setHandshakeLimits(max_handshakes, max_pending)
+
+    def setResumeEnabled(self, enabled):
+        self.dispatcher.setResumeEnabled(enabled)
 
     def flush(self):
         self.dispatcher.flush()
 
+    def getConnections(self):
+        return self.dispatcher.getConnections()
+
     def getRemoteAddress(self):
         if not self.dispatcher.isServer():
             for conn in self.dispatcher.getConnections():
                 return conn.remote_ip
 
+    def getConnectionStats(self):
+        return self.dispatcher.getConnectionStats()
+
     def getIsConnected(self):
         return self.dispatcher.isConnected()
 
@@ -227,6 +257,22 @@ class NtCoreApi(object):
         self.entry_notifier.setVerboseLogging(verbose)
         self.rpc_server.setVerboseLogging(verbose)
 
+    #
+    # Profiling (python-specific)
+    #
+
+    def setProfiling(self, enabled):
+        profiling.enable(enabled)
+
+    def getProfile(self):
+        return profiling.get_stats()
+
+    def getProfileText(self):
+        return profiling.to_prometheus()
+
+    def resetProfile(self):
+        profiling.reset()
+
     #
     # Persistence
     #
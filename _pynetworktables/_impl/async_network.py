@@ -0,0 +1,602 @@
+# novalidate
+"""
+    asyncio based network engine
+
+    The default engine uses a read thread and a write thread for every
+    connection, plus a dispatch thread and a server/client thread. With a
+    lot of clients that is a lot of threads fighting over the GIL.
+
+    This engine runs all of that on a single event loop thread instead:
+    the accept loop (or the client connect loop), the handshakes, reads,
+    writes and the periodic dispatch. The handshakes are the same generators
+    that the threaded connections use, and incoming messages are passed to
+    Storage.processIncoming exactly as the read thread does.
+"""
+
+import asyncio
+import socket
+import threading
+from time import monotonic
+
+from .constants import (
+    msgtype_str,
+    NT_NET_MODE_NONE,
+    NT_NET_MODE_SERVER,
+    NT_NET_MODE_CLIENT,
+    NT_NET_MODE_FAILURE,
+)
+
+from .frame_decoder import FrameDecoder
+from .network_connection import NetworkConnection, _msg_type
+from .wire import WireCodec
+
+from .support import profiling
+from .support.safe_thread import SafeThread
+from .tcpsockets.tcp_stream import get_round_trip_time, get_send_backlog
+
+import logging
+
+logger = logging.getLogger("nt")
+
+
+class _AsyncStream(object):
+    """The parts of the TCPStream interface used by NetworkConnection,
+    implemented on top of an asyncio transport"""
+
+    def __init__(self, engine, transport, sock_type):
+        self.m_engine = engine
+        self.m_transport = transport
+
+        peer = transport.get_extra_info("peername") or ("", 0)
+        self.m_peerIP = peer[0]
+        self.m_peerPort = peer[1]
+
+        # Python-specific for debugging
+        self.sock_type = sock_type
+
+    def send(self, contents):
+        self.m_transport.write(contents)
+
+    def close(self):
+        self.m_engine.callInLoop(self.m_transport.close)
+
+    def getPeerIP(self):
+        return self.m_peerIP
+
+    def getPeerPort(self):
+        return self.m_peerPort
+
+    def setNoDelay(self):
+        sd = self.m_transport.get_extra_info("socket")
+        if sd is not None:
+            sd.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def getSendBacklog(self):
+        # data that the transport hasn't handed to the kernel yet, plus what
+        # the kernel hasn't sent or had acknowledged
+        backlog = self.m_transport.get_write_buffer_size()
+        sd = self.m_transport.get_extra_info("socket")
+        if sd is not None:
+            backlog += get_send_backlog(sd) or 0
+        return backlog
+
+    def getRoundTripTime(self):
+        sd = self.m_transport.get_extra_info("socket")
+        if sd is not None:
+            return get_round_trip_time(sd)
+
+
+class AsyncNetworkConnection(NetworkConnection):
+    """
+    A connection that is serviced by the event loop instead of by a read
+    thread and a write thread. Received data is fed to a FrameDecoder, and
+    the handshake generator is sent each message until it finishes.
+
+    Other than stop, the methods must be called from the event loop thread.
+    """
+
+    def __init__(self, uid, stream, notifier, handshake, get_entry_type, verbose=False):
+        NetworkConnection.__init__(
+            self, uid, stream, notifier, handshake, get_entry_type, verbose=verbose
+        )
+
+        self.m_encoder = WireCodec(self.m_proto_rev)
+        self.m_decoder = WireCodec(self.m_proto_rev)
+        self.m_reader = FrameDecoder(None, self.m_decoder, get_entry_type)
+        self.m_handshake_steps = None
+        self.m_handshake_start = 0
+
+        # set if the remote end went away before the connection was started
+        self.m_lost = False
+
+    def start(self):
+        if self.m_active:
+            return
+
+        self.m_active = True
+        self.set_state(self.State.kInit)
+        self.set_state(self.State.kHandshake)
+
+        self.m_handshake_start = monotonic()
+        self.m_handshake_steps = self.m_handshake(self, self._sendHandshakeMessages)
+        self._handshakeStep(None)
+
+        # a server connection may have been waiting for its turn to start,
+        # and anything the client sent meanwhile has been buffered
+        self._processReceived()
+        if self.m_lost:
+            self.connectionLost()
+
+    def stop(self):
+        logger.debug("NetworkConnection stopping (%s)", self)
+
+        if not self.m_active:
+            return
+
+        self._close()
+
+    def _close(self):
+        self.set_state(self.State.kDead)
+        self.m_active = False
+        if self.m_handshake_steps is not None:
+            self.m_handshake_steps = None
+            self._handshakeFinished()
+        self.m_stream.close()
+
+    def _handshakeStep(self, msg):
+        try:
+            self.m_handshake_steps.send(msg)
+            return
+        except StopIteration as e:
+            handshake_success = e.value
+        except Exception:
+            logger.exception("Unhandled exception during handshake")
+            handshake_success = False
+
+        self.m_handshake_steps = None
+        self._handshakeFinished()
+
+        if handshake_success:
+            self.m_handshake_duration = monotonic() - self.m_handshake_start
+            self.set_state(self.State.kActive)
+        else:
+            self._close()
+
+    def dataReceived(self, data):
+        self.m_reader.feed(data)
+        self._processReceived()
+
+    def _processReceived(self):
+        reader = self.m_reader
+        decoder = self.m_decoder
+        verbose = self.m_verbose
+
+        try:
+            # the protocol revision can change after any handshake message,
+            # so those are decoded one at a time
+            while self.m_handshake_steps is not None:
+                decoder.set_proto_rev(self.m_proto_rev)
+                msg = reader.parseMessage()
+                if msg is None:
+                    return
+
+                self.m_read_counts[msg.type] += 1
+                self._handshakeStep(msg)
+
+            while self.m_active:
+                decoder.set_proto_rev(self.m_proto_rev)
+                msgs = reader.parseMessages()
+                if not msgs:
+                    return
+
+                self.m_last_update = monotonic()
+                self.m_read_counts.update(map(_msg_type, msgs))
+
+                process_incoming = self.m_process_incoming
+                if profiling.enabled:
+                    process_incoming = profiling.timed(
+                        process_incoming, "storage.process_incoming"
+                    )
+
+                for msg in msgs:
+                    if verbose:
+                        logger.debug(
+                            "%s received type=%s with str=%s id=%s seq_num=%s value=%s",
+                            self.m_stream.sock_type,
+                            msgtype_str(msg.type),
+                            msg.str,
+                            msg.id,
+                            msg.seq_num_uid,
+                            msg.value,
+                        )
+
+                    process_incoming(msg, self)
+
+        except Exception as e:
+            if verbose:
+                logger.exception("read error")
+            else:
+                logger.warning("read error: %s", e)
+
+            # terminate connection on bad message
+            self._close()
+
+    def connectionLost(self):
+        if not self.m_active:
+            self.m_lost = True
+        elif self.m_handshake_steps is not None:
+            # tells the handshake that the remote end went away
+            self._handshakeStep(None)
+
+        self.set_state(self.State.kDead)
+        self.m_active = False
+
+    def _sendMessages(self, msgs):
+        encoder = self.m_encoder
+        encoder.set_proto_rev(self.m_proto_rev)
+
+        verbose = self.m_verbose
+        out = []
+
+        profile = profiling.enabled
+        if profile:
+            encode_start = profiling.perf_counter_ns()
+
+        for msg in msgs:
+            if verbose:
+                logger.debug(
+                    "%s sending type=%s with str=%s id=%s seq_num=%s value=%s",
+                    self.m_stream.sock_type,
+                    msgtype_str(msg.type),
+                    msg.str,
+                    msg.id,
+                    msg.seq_num_uid,
+                    msg.value,
+                )
+            msg.write(out, encoder)
+
+        if profile:
+            profiling.histogram("wire.encode").record(
+                profiling.perf_counter_ns() - encode_start
+            )
+
+        if out:
+            data = b"".join(out)
+            self.m_stream.send(data)
+            self.m_bytes_written += len(data)
+
+        self.m_write_counts.update(map(_msg_type, msgs))
+
+
+class _ConnectionProtocol(asyncio.Protocol):
+    def __init__(self, engine, sock_type):
+        self.m_engine = engine
+        self.m_sock_type = sock_type
+        self.m_conn = None
+
+    def connection_made(self, transport):
+        self.m_conn = self.m_engine._connectionMade(transport, self.m_sock_type)
+
+    def data_received(self, data):
+        if self.m_conn is not None:
+            self.m_conn.dataReceived(data)
+
+    def connection_lost(self, exc):
+        if self.m_conn is not None:
+            self.m_conn.connectionLost()
+
+
+class AsyncNetworkEngine(object):
+    """
+    Runs the network side of a Dispatcher on an asyncio event loop in a
+    single thread. The dispatcher's connection list, locks and reconnect
+    state are used just like the threaded engine uses them.
+    """
+
+    def __init__(self, dispatcher):
+        self.m_dispatcher = dispatcher
+        self.m_is_server = False
+
+        self.m_loop = asyncio.new_event_loop()
+        self.m_thread = None
+        self.m_thread_ident = None
+        self.m_tasks = []
+
+        self.m_server = None
+        self.m_connect_timeout = 1
+        self.m_reconnect = None
+
+        self.m_tick_time = 0
+        self.m_tick_handle = None
+
+        # periodic persistent save running in the executor, if any
+        self.m_save = None
+
+    def start(self, is_server):
+        self.m_is_server = is_server
+        self.m_thread = SafeThread(target=self._threadMain, name="nt-asyncio-thread")
+
+    def stop(self):
+        self.callInLoop(self._shutdown)
+
+        if threading.get_ident() != self.m_thread_ident:
+            self.m_thread.join(1)
+            if self.m_thread.is_alive():
+                logger.warning("%s did not die", self.m_thread.name)
+
+    def flush(self):
+        self.callInLoop(self._flush)
+
+    def reconnect(self):
+        self.callInLoop(self._reconnect)
+
+    def callInLoop(self, fn, *args):
+        """Calls fn on the event loop thread, immediately if this is it"""
+        if threading.get_ident() == self.m_thread_ident:
+            fn(*args)
+        else:
+            try:
+                self.m_loop.call_soon_threadsafe(fn, *args)
+            except RuntimeError:
+                # loop has been closed already
+                pass
+
+    def _threadMain(self):
+        loop = self.m_loop
+        asyncio.set_event_loop(loop)
+        self.m_thread_ident = threading.get_ident()
+
+        d = self.m_dispatcher
+
+        if self.m_is_server:
+            main = self._serverMain()
+        else:
+            main = self._clientMain()
+
+        self.m_tasks.append(loop.create_task(main))
+
+        now = monotonic()
+        self.m_tick_time = now
+        d.m_next_save_time = now + d.m_save_delta_time
+        self._scheduleTick(now)
+
+        try:
+            loop.run_forever()
+
+            # let the cancelled tasks and closed transports finish up
+            loop.run_until_complete(
+                asyncio.gather(*self.m_tasks, return_exceptions=True)
+            )
+
+            # and a persistent save that is still running
+            if self.m_save is not None:
+                loop.run_until_complete(asyncio.wait([self.m_save]))
+        finally:
+            d.m_networkMode = NT_NET_MODE_NONE
+            loop.close()
+
+    def _shutdown(self):
+        d = self.m_dispatcher
+
+        if self.m_tick_handle is not None:
+            self.m_tick_handle.cancel()
+
+        if self.m_server is not None:
+            self.m_server.close()
+
+        with d.m_user_mutex:
+            conns = list(d.m_connections)
+
+        for conn in conns:
+            conn.stop()
+
+        for task in self.m_tasks:
+            task.cancel()
+
+        self.m_loop.stop()
+
+    #
+    # Periodic dispatch
+    #
+
+    def _scheduleTick(self, now):
+        rate = self.m_dispatcher.m_update_rate
+
+        # handle loop taking too long
+        tick_time = self.m_tick_time + rate
+        if tick_time < now or tick_time > now + rate:
+            tick_time = now + rate
+
+        self.m_tick_time = tick_time
+        self.m_tick_handle = self.m_loop.call_at(tick_time, self._tick)
+
+    def _tick(self):
+        d = self.m_dispatcher
+        if not d.m_active:
+            return
+
+        start = monotonic()
+
+        # perform periodic persistent save, unless the last one is still going
+        if self.m_is_server and self.m_save is None and d._isSaveDue(start):
+            self.m_save = self.m_loop.run_in_executor(None, d._periodicSave)
+            self.m_save.add_done_callback(self._saveDone)
+
+        d._dispatchStep(start, self.m_is_server)
+        self._scheduleTick(start)
+
+    def _saveDone(self, future):
+        self.m_save = None
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("periodic persistent save: %s", future.exception())
+
+    def _flush(self):
+        d = self.m_dispatcher
+        if d.m_active:
+            d._dispatchStep(monotonic(), self.m_is_server, True)
+
+    #
+    # Connections
+    #
+
+    def _connectionMade(self, transport, sock_type):
+        d = self.m_dispatcher
+        stream = _AsyncStream(self, transport, sock_type)
+
+        if sock_type == "server":
+            logger.debug(
+                "server: client connection from %s port %s",
+                stream.getPeerIP(),
+                stream.getPeerPort(),
+            )
+            handshake = d._serverHandshakeSteps
+        else:
+            handshake = d._clientHandshakeSteps
+
+        with d.m_user_mutex:
+            connection_uid = d.m_connections_uid
+            d.m_connections_uid += 1
+
+        conn = AsyncNetworkConnection(
+            connection_uid,
+            stream,
+            d.m_notifier,
+            handshake,
+            d.m_storage.getMessageEntryType,
+            verbose=d.m_verbose,
+        )
+
+        conn.set_process_incoming(d.m_storage.processIncoming)
+
+        # client connections are started once the connect loop picks one
+        if sock_type == "server":
+            if not d.m_active:
+                transport.close()
+                return None
+
+            if not d._admitServerConnection(conn):
+                return None
+
+        return conn
+
+    async def _serverMain(self):
+        d = self.m_dispatcher
+        acceptor = d.m_server_acceptor
+
+        if not acceptor.start():
+            d.m_active = False
+            d.m_networkMode = NT_NET_MODE_SERVER | NT_NET_MODE_FAILURE
+            self.m_loop.stop()
+            return
+
+        d.m_networkMode = NT_NET_MODE_SERVER
+
+        self.m_server = await self.m_loop.create_server(
+            lambda: _ConnectionProtocol(self, "server"), sock=acceptor.m_lsd
+        )
+
+    async def _clientMain(self):
+        d = self.m_dispatcher
+        self.m_reconnect = asyncio.Event()
+
+        while d.m_active:
+            # sleep between retries
+            await asyncio.sleep(0.250)
+
+            # get next server to connect to
+            with d.m_user_mutex:
+                if d.m_client_connector_override:
+                    server_or_servers = d.m_client_connector_override
+                else:
+                    if not d.m_client_connector:
+                        d.m_networkMode = NT_NET_MODE_CLIENT | NT_NET_MODE_FAILURE
+                        continue
+                    server_or_servers = d.m_client_connector
+
+            # try to connect (with timeout)
+            if d.m_verbose:
+                logger.debug("client trying to connect")
+
+            conn = await self._connect(server_or_servers)
+            if conn is None:
+                d.m_networkMode = NT_NET_MODE_CLIENT | NT_NET_MODE_FAILURE
+                continue  # keep retrying
+
+            logger.debug("client connected")
+            d.m_networkMode = NT_NET_MODE_CLIENT
+
+            self.m_reconnect.clear()
+
+            with d.m_user_mutex:
+                # disconnect any current
+                for c in d.m_connections:
+                    if c != conn:
+                        c.stop()
+
+                del d.m_connections[:]
+                d.m_connections.append(conn)
+                conn.set_proto_rev(d.m_reconnect_proto_rev)
+                conn.start()
+
+                # reconnect the next time starting with latest protocol revision
+                d.m_reconnect_proto_rev = d.m_default_proto
+
+                d.m_do_reconnect = False
+
+            # block until told to reconnect
+            await self.m_reconnect.wait()
+
+    def _reconnect(self):
+        if self.m_reconnect is not None:
+            self.m_reconnect.set()
+
+    async def _connect(self, server_or_servers):
+        if isinstance(server_or_servers, tuple):
+            server_or_servers = [server_or_servers]
+
+        # parallel connect, the first one to succeed is used
+        pending = set(
+            self.m_loop.create_task(self._connectOne(server, port))
+            for server, port in server_or_servers
+        )
+
+        conn = None
+        try:
+            while pending and conn is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    c = task.result()
+                    if c is None:
+                        continue
+
+                    if conn is None:
+                        conn = c
+                    else:
+                        c.get_stream().close()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return conn
+
+    async def _connectOne(self, server, port):
+        verbose = self.m_dispatcher.m_verbose
+
+        try:
+            if verbose:
+                logger.debug("Trying connection to %s:%s", server, port)
+
+            _, protocol = await asyncio.wait_for(
+                self.m_loop.create_connection(
+                    lambda: _ConnectionProtocol(self, "client"), server, port
+                ),
+                self.m_connect_timeout,
+            )
+        except (OSError, asyncio.TimeoutError):
+            if verbose:
+                logger.debug("Connection to %s:%s failed", server, port)
+            return None
+
+        return protocol.m_conn
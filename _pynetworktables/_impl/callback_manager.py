@@ -6,7 +6,7 @@
 # the project.
 # ----------------------------------------------------------------------------
 
-from collections import deque, namedtuple
+from collections import OrderedDict, deque, namedtuple
 from threading import Condition
 import time
 
@@ -16,6 +16,7 @@ try:
 except ImportError:
     from queue import Queue, Empty
 
+from .support import profiling
 from .support.safe_thread import SafeThread
 from .support.uidvector import UidVector
 
@@ -26,16 +27,108 @@ logger = logging.getLogger("nt")
 _ListenerData = namedtuple("ListenerData", ["callback", "poller_uid"])
 
 
+class BatchCallback(object):
+    """python-specific: used as the callback of a listener to collect the
+    items it matches and deliver them to the user callback as a single list
+    once the callback thread has drained its queue.
+
+    If key is given, only the last item for each key is delivered (merge is
+    called with the previous and the new item to combine them)
+    """
+
+    #: a batch is delivered early once it has this many items in it
+    MAX_SIZE = 1024
+
+    def __init__(self, callback, pending, key=None, merge=None):
+        self.callback = callback
+        self.m_pending = pending
+        self.m_key = key
+        self.m_merge = merge
+        self.m_items = OrderedDict() if key else []
+
+    def __call__(self, item):
+        items = self.m_items
+        if not items:
+            self.m_pending.append(self)
+
+        key = self.m_key
+        if key is None:
+            items.append(item)
+        else:
+            k = key(item)
+            prev = items.get(k)
+            if prev is not None and self.m_merge:
+                item = self.m_merge(prev, item)
+            items[k] = item
+
+        if len(items) >= self.MAX_SIZE:
+            self.flush()
+
+    def flush(self):
+        items = self.m_items
+        if not items:
+            return
+
+        if self.m_key is None:
+            self.m_items = []
+        else:
+            self.m_items = OrderedDict()
+            items = list(items.values())
+
+        try:
+            self.m_pending.remove(self)
+        except ValueError:
+            pass
+
+        self.callback(items)
+
+
 class Poller(object):
-    def __init__(self):
+    def __init__(self, key=None, maxlen=None):
         # Note: this is really close to the python queue, but we really have to
         # mess with its internals to get the same semantics as WPILib, so we are
         # rolling our own :(
-        self.poll_queue = deque()
         self.poll_cond = Condition()
         self.terminating = False
         self.cancelling = False
 
+        # python-specific: if key is given, only the newest item for each key
+        # is kept (conflation). If maxlen is given, the oldest items are
+        # dropped once the queue is full. Either way, overflow counts the
+        # items that were thrown away without being polled.
+        self.key = key
+        self.maxlen = maxlen
+        self.overflow = 0
+
+        if key is None:
+            self.poll_queue = deque(maxlen=maxlen)
+        else:
+            self.poll_queue = OrderedDict()
+
+    def push(self, args):
+        # args are (listener_uid, item), caller must hold poll_cond
+        q = self.poll_queue
+        if self.key is None:
+            if len(q) == self.maxlen:
+                self.overflow += 1
+            q.append(args)
+        else:
+            k = self.key(args[1])
+            if k in q:
+                # the old item is replaced below, so move its key to the end
+                q.move_to_end(k)
+                self.overflow += 1
+            elif len(q) == self.maxlen:
+                q.popitem(last=False)
+                self.overflow += 1
+            q[k] = args
+
+    def items(self):
+        # caller must hold poll_cond
+        if self.key is None:
+            return self.poll_queue
+        return self.poll_queue.values()
+
     def terminate(self):
         with self.poll_cond:
             self.terminating = True
@@ -54,6 +147,29 @@ class CallbackThread(object):
         self.m_active = False
         self.name = name
 
+        # python optimization: copy of the listeners, only rebuilt when
+        # the listeners change instead of for every notification
+        self.m_listeners_version = None
+        self.m_listeners_copy = []
+
+        # python-specific: batch callbacks that have items waiting to be
+        # delivered once the queue is empty
+        self.m_pending_batches = []
+
+    #
+    # derived may override the following
+    #
+
+    def updateListeners(self, listeners):
+        """Called when the listeners have changed, with a list of
+        (listener_uid, listener) in the order that they were added"""
+        self.m_listeners_copy = listeners
+
+    def getListeners(self, data):
+        """Returns the (listener_uid, listener) pairs that data may match, in
+        the order that they were added"""
+        return self.m_listeners_copy
+
     #
     # derived must implement the following
     #
@@ -84,17 +200,22 @@ class CallbackThread(object):
         poller = self.m_pollers.get(poller_uid)
         if poller:
             with poller.poll_cond:
-                poller.poll_queue.append(args)
+                poller.push(args)
                 poller.poll_cond.notify()
 
     def main(self):
         # micro-optimization: lift these out of the loop
-        doCallback = self.doCallback
+        untimedCallback = self.doCallback
+        timedCallback = None
         matches = self.matches
         queue_get = self.m_queue.get
+        queue_empty = self.m_queue.empty
+        pending_batches = self.m_pending_batches
         setListener = self.setListener
-        listeners_get = self.m_listeners.get
-        listeners_items = self.m_listeners.items
+        getListeners = self.getListeners
+        listeners = self.m_listeners
+        listeners_get = listeners.get
+        listeners_items = listeners.items
 
         while True:
             item = queue_get()
@@ -102,6 +223,16 @@ class CallbackThread(object):
                 logger.debug("%s thread no longer active", self.name)
                 break
 
+            # python-specific: time the callbacks while profiling
+            if profiling.enabled:
+                if timedCallback is None:
+                    timedCallback = profiling.timed(
+                        untimedCallback, "callback.%s" % self.name
+                    )
+                doCallback = timedCallback
+            else:
+                doCallback = untimedCallback
+
             listener_uid, item = item
             if listener_uid is not None:
                 listener = listeners_get(listener_uid)
@@ -120,8 +251,13 @@ class CallbackThread(object):
                     elif listener.poller_uid is not None:
                         self.sendPoller(listener.poller_uid, listener_uid, item)
             else:
-                # Use copy because iterator might get invalidated
-                for listener_uid, listener in list(listeners_items()):
+                version = listeners.version
+                if version != self.m_listeners_version:
+                    self.m_listeners_version = version
+                    # Use copy because iterator might get invalidated
+                    self.updateListeners(list(listeners_items()))
+
+                for listener_uid, listener in getListeners(item):
                     if matches(listener, item):
                         setListener(item, listener_uid)
                         cb = listener.callback
@@ -137,6 +273,18 @@ class CallbackThread(object):
                         elif listener.poller_uid is not None:
                             self.sendPoller(listener.poller_uid, listener_uid, item)
 
+            # deliver batches once everything queued so far has been seen
+            if pending_batches and queue_empty():
+                for batch in pending_batches[:]:
+                    try:
+                        batch.flush()
+                    except Exception:
+                        logger.warning(
+                            "Unhandled exception processing %s batch callback",
+                            self.name,
+                            exc_info=True,
+                        )
+
         # Wake any blocked pollers
         for poller in self.m_pollers.values():
             poller.terminate()
@@ -163,10 +311,23 @@ class CallbackManager(object):
         if thr:
             thr.m_listeners.pop(listener_uid, None)
 
-    def createPoller(self):
+    def createPoller(self, key=None, maxlen=None):
         self.start()
         thr = self.m_owner
-        return thr.m_pollers.add(Poller())
+        return thr.m_pollers.add(Poller(key, maxlen))
+
+    def getPollerOverflow(self, poller_uid):
+        """python-specific: returns the number of items that a poller has
+        dropped because of conflation or because its queue was full"""
+        thr = self.m_owner
+        if not thr:
+            return 0
+
+        poller = thr.m_pollers.get(poller_uid)
+        if not poller:
+            return 0
+
+        return poller.overflow
 
     def removePoller(self, poller_uid):
         thr = self.m_owner
@@ -195,15 +356,17 @@ class CallbackManager(object):
         # not as efficient as it could be
         q = thr.m_queue
 
+        pending = thr.m_pending_batches
+
         if timeout is None:
-            while not q.empty() and thr.m_active:
+            while (not q.empty() or pending) and thr.m_active:
                 time.sleep(0.005)
         else:
             wait_until = time.monotonic() + timeout
-            while not q.empty() and thr.m_active:
+            while (not q.empty() or pending) and thr.m_active:
                 time.sleep(0.005)
                 if time.monotonic() > wait_until:
-                    return q.empty()
+                    return q.empty() and not pending
 
         return True
 
@@ -235,7 +398,7 @@ class CallbackManager(object):
             if result is None:  # timeout
                 timed_out = True
             elif result == 1:  # success
-                infos.extend(poller.poll_queue)
+                infos.extend(poller.items())
                 poller.poll_queue.clear()
 
         return infos, timed_out
@@ -10,19 +10,27 @@ from collections import namedtuple
 
 from .callback_manager import CallbackManager, CallbackThread
 
-_ConnectionCallback = namedtuple("ConnectionCallback", ["callback", "poller_uid"])
+_ConnectionCallback = namedtuple(
+    "ConnectionCallback", ["callback", "poller_uid", "backpressure"]
+)
 
 _ConnectionNotification = namedtuple(
     "ConnectionNotification", ["connected", "conn_info"]
 )
 
+# python-specific: sent when a connection goes over its outgoing budget and
+# when it recovers, only to listeners that asked for it
+_BackpressureNotification = namedtuple(
+    "BackpressureNotification", ["backpressured", "conn_info"]
+)
+
 
 class ConnectionNotifierThread(CallbackThread):
     def __init__(self):
         CallbackThread.__init__(self, "connection-notifier")
 
     def matches(self, listener, data):
-        return True
+        return listener.backpressure == (data.__class__ is _BackpressureNotification)
 
     def setListener(self, data, listener_uid):
         pass
@@ -36,13 +44,19 @@ class ConnectionNotifier(CallbackManager):
     THREAD_CLASS = ConnectionNotifierThread
 
     def add(self, callback):
-        return self.doAdd(_ConnectionCallback(callback, None))
+        return self.doAdd(_ConnectionCallback(callback, None, False))
 
     def addPolled(self, poller_uid):
-        return self.doAdd(_ConnectionCallback(None, poller_uid))
+        return self.doAdd(_ConnectionCallback(None, poller_uid, False))
+
+    def addBackpressure(self, callback):
+        return self.doAdd(_ConnectionCallback(callback, None, True))
 
     def notifyConnection(self, connected, conn_info, only_listener=None):
         self.send(only_listener, _ConnectionNotification(connected, conn_info))
 
+    def notifyBackpressure(self, backpressured, conn_info):
+        self.send(None, _BackpressureNotification(backpressured, conn_info))
+
     def start(self):
         CallbackManager.start(self)
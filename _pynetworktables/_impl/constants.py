@@ -64,6 +64,13 @@ kClearEntries =     b'\x14'
 kExecuteRpc =       b'\x20'
 kRpcResponse =      b'\x21'
 
+# python-specific: session resumption. A client that sends a client hello
+# with this protocol revision follows it with a kResume message, and a server
+# that supports resumption replies with one after its server hello. The
+# connection itself then uses protocol revision 0x0300.
+kResume =           b'\x30'
+kProtoRevResume =   0x0301
+
 kClearAllMagic =    0xD06CB27A
 
 _msgtypes = {
@@ -80,6 +87,7 @@ _msgtypes = {
     kClearEntries:    'kClearEntries',
     kExecuteRpc:      'kExecuteRpc',
     kRpcResponse:     'kRpcResponse',
+    kResume:          'kResume',
 }
 
 def msgtype_str(msgtype):
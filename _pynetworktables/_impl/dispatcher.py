@@ -6,15 +6,19 @@
 # the project.
 # ----------------------------------------------------------------------------
 
+from collections import deque
+import os
 import threading
 import time
 
-from .message import Message
+from .async_network import AsyncNetworkEngine
+from .message import CachedMessage, Message
 from .network_connection import NetworkConnection
 
 from .tcpsockets.tcp_acceptor import TcpAcceptor
 from .tcpsockets.tcp_connector import TcpConnector
 
+from .support import profiling
 from .support.safe_thread import SafeThread
 
 from .constants import (
@@ -25,6 +29,9 @@ from .constants import (
     kServerHelloDone,
     kClientHelloDone,
     kEntryAssign,
+    kEntryDelete,
+    kResume,
+    kProtoRevResume,
     NT_NET_MODE_NONE,
     NT_NET_MODE_SERVER,
     NT_NET_MODE_CLIENT,
@@ -38,6 +45,16 @@ import logging
 logger = logging.getLogger("nt")
 
 
+def _runHandshake(steps, get_msg):
+    # feeds messages to a handshake generator until it returns its result
+    try:
+        steps.send(None)
+        while True:
+            steps.send(get_msg())
+    except StopIteration as e:
+        return e.value
+
+
 class Dispatcher(object):
     def __init__(self, storage, conn_notifier, verbose=False):
 
@@ -69,6 +86,51 @@ class Dispatcher(object):
 
         self.m_active = False  # set to false to terminate threads
         self.m_update_rate = 0.050  # periodic dispatch rate, in s
+        # python-specific: if larger than m_update_rate, each connection picks
+        # its own send interval up to this (see SendScheduler)
+        self.m_max_update_rate = self.m_update_rate
+
+        # python-specific: connections that have more than this many messages
+        # or bytes waiting to be written are not posted to (None disables)
+        self.m_max_outgoing_messages = 8192
+        self.m_max_outgoing_bytes = 1 << 20
+
+        # python-specific: server admission control. At most m_max_handshakes
+        # connections do their handshake at the same time, the next
+        # m_max_pending_handshakes wait (without being started) in the order
+        # they were accepted, and any more are closed (None disables either)
+        self.m_max_handshakes = 16
+        self.m_max_pending_handshakes = 256
+        self.m_handshake_mutex = threading.Lock()
+        self.m_handshakes = 0
+        self.m_pending_handshakes = deque()
+
+        # python-specific: connections that are about to be started, and
+        # whether a call to _startServerConnections is starting them
+        self.m_ready_handshakes = deque()
+        self.m_starting_handshakes = False
+
+        # python-specific: slots in m_connections of server connections that
+        # died, for _addServerConnection to reuse
+        self.m_free_slots = deque()
+
+        # python-specific: session resumption. A server identifies the entry
+        # ids it assigns with m_resume_token, and a client that has enabled
+        # resumption keeps the token of the server that its entries came
+        # from. m_resume_unsupported is set when the server didn't accept the
+        # resume protocol revision, until the server changes.
+        self.m_resume_token = None
+        self.m_resume_enabled = False
+        self.m_resume_server_token = None
+        self.m_resume_unsupported = False
+
+        # persistent save and verbose logging state of the dispatch loop
+        self.m_save_delta_time = 1.0
+        self.m_next_save_time = 0
+        self.m_dispatch_count = 0
+
+        # python-specific: asyncio engine, if one was selected at startup
+        self.m_engine = None
 
         # Condition variable for forced dispatch wakeup (flush)
         self.m_flush_mutex = threading.Lock()
@@ -81,6 +143,9 @@ class Dispatcher(object):
         self.m_reconnect_proto_rev = self.m_default_proto
         self.m_do_reconnect = True
 
+        # python-specific
+        profiling.register_lock(self, "m_user_mutex", "dispatcher.lock_wait")
+
     def setVerboseLogging(self, verbose):
         self.m_verbose = verbose
 
@@ -123,7 +188,7 @@ class Dispatcher(object):
 
         return True
 
-    def startServer(self, persist_filename, listen_address, port):
+    def startServer(self, persist_filename, listen_address, port, use_asyncio=False):
 
         with self.m_user_mutex:
             if self.m_active:
@@ -147,6 +212,15 @@ class Dispatcher(object):
 
         self.m_storage.setDispatcher(self, True)
 
+        # python-specific: a new token each time, as the entry ids may have
+        # been assigned by another server while this was a client
+        self.m_resume_token = os.urandom(8).hex()
+
+        if use_asyncio:
+            self.m_engine = AsyncNetworkEngine(self)
+            self.m_engine.start(True)
+            return True
+
         self.m_dispatch_thread = SafeThread(
             target=self._dispatchThreadMain, name="nt-dispatch-thread"
         )
@@ -155,7 +229,7 @@ class Dispatcher(object):
         )
         return True
 
-    def startClient(self):
+    def startClient(self, use_asyncio=False):
         with self.m_user_mutex:
             if self.m_active:
                 return False
@@ -164,8 +238,14 @@ class Dispatcher(object):
         logger.info("NetworkTables initialized in client mode")
 
         self.m_networkMode = NT_NET_MODE_CLIENT | NT_NET_MODE_STARTING
+        self.m_resume_unsupported = False
         self.m_storage.setDispatcher(self, False)
 
+        if use_asyncio:
+            self.m_engine = AsyncNetworkEngine(self)
+            self.m_engine.start(False)
+            return False
+
         self.m_dispatch_thread = SafeThread(
             target=self._dispatchThreadMain, name="nt-dispatch-thread"
         )
@@ -186,38 +266,59 @@ class Dispatcher(object):
             if self.m_networkMode & NT_NET_MODE_TEST != 0:
                 return
 
-        # wake up dispatch thread with a flush
-        with self.m_flush_mutex:
-            self.m_flush_cv.notify()
+        if self.m_engine is not None:
+            # python-specific: everything runs on the event loop, which
+            # closes all of the connections before it exits
+            with self.m_user_mutex:
+                self.m_client_connector = None
 
-        # wake up client thread with a reconnect
-        with self.m_user_mutex:
-            self.m_client_connector = None
+            self.m_engine.stop()
+            self.m_engine = None
+
+        else:
+            # wake up dispatch thread with a flush
+            with self.m_flush_mutex:
+                self.m_flush_cv.notify()
+
+            # wake up client thread with a reconnect
+            with self.m_user_mutex:
+                self.m_client_connector = None
 
-        self._clientReconnect()
+            self._clientReconnect()
 
-        # wake up server thread by shutting down the socket
-        if self.m_server_acceptor:
-            self.m_server_acceptor.shutdown()
+            # wake up server thread by shutting down the socket
+            if self.m_server_acceptor:
+                self.m_server_acceptor.shutdown()
 
-        # join threads, timeout
-        self.m_dispatch_thread.join(1)
-        self.m_clientserver_thread.join(1)
+            # join threads, timeout
+            self.m_dispatch_thread.join(1)
+            self.m_clientserver_thread.join(1)
 
         with self.m_user_mutex:
             conns = self.m_connections
             self.m_connections = []
+            self.m_free_slots.clear()
 
         # close all connections
         for conn in conns:
             conn.stop()
 
+        # python-specific: and the ones that were waiting to be started
+        with self.m_handshake_mutex:
+            pending = [conn for conn, _ in self.m_pending_handshakes]
+            pending.extend(self.m_ready_handshakes)
+            self.m_pending_handshakes.clear()
+            self.m_ready_handshakes.clear()
+
+        for conn in pending:
+            conn.get_stream().close()
+
         # cleanup the server socket
         # -> needed because we don't have destructors
         if self.m_server_acceptor:
             self.m_server_acceptor.close()
 
-    def setUpdateRate(self, interval):
+    def setUpdateRate(self, interval, max_interval=None):
         # don't allow update rates faster than 10 ms or slower than 1 second
         interval = float(interval)
 
@@ -227,7 +328,27 @@ class Dispatcher(object):
         elif interval > 1.0:
             interval = 1.0
 
+        if max_interval is None:
+            max_interval = interval
+        else:
+            max_interval = min(max(float(max_interval), interval), 1.0)
+
         self.m_update_rate = interval
+        self.m_max_update_rate = max_interval
+
+    def setOutgoingBudget(self, max_messages, max_bytes):
+        # python-specific
+        self.m_max_outgoing_messages = max_messages
+        self.m_max_outgoing_bytes = max_bytes
+
+    def setHandshakeLimits(self, max_handshakes, max_pending):
+        # python-specific
+        self.m_max_handshakes = max_handshakes
+        self.m_max_pending_handshakes = max_pending
+
+    def setResumeEnabled(self, enabled):
+        # python-specific
+        self.m_resume_enabled = enabled
 
     def setIdentity(self, name):
         with self.m_user_mutex:
@@ -245,9 +366,14 @@ class Dispatcher(object):
                 return
 
             self.m_last_flush = now
-            self.m_do_flush = True
 
-            self.m_flush_cv.notify()
+            engine = self.m_engine
+            if engine is None:
+                self.m_do_flush = True
+                self.m_flush_cv.notify()
+                return
+
+        engine.flush()
 
     def getConnections(self):
         conns = []
@@ -263,6 +389,21 @@ class Dispatcher(object):
 
         return conns
 
+    def getConnectionStats(self):
+        # python-specific
+        stats = []
+        if not self.m_active:
+            return stats
+
+        with self.m_user_mutex:
+            for conn in self.m_connections:
+                if conn.state != NetworkConnection.State.kActive:
+                    continue
+
+                stats.append(conn.stats())
+
+        return stats
+
     def isConnected(self):
         if self.m_active:
             with self.m_user_mutex:
@@ -304,6 +445,7 @@ class Dispatcher(object):
     def _setConnector(self, connector):
         with self.m_user_mutex:
             self.m_client_connector = self._strip_connectors(connector)
+            self.m_resume_unsupported = False
 
     def _setConnectorOverride(self, connector):
         with self.m_user_mutex:
@@ -319,17 +461,12 @@ class Dispatcher(object):
     def _dispatchThreadMain(self):
         timeout_time = time.monotonic()
 
-        save_delta_time = 1.0
-        next_save_time = timeout_time + save_delta_time
+        self.m_next_save_time = timeout_time + self.m_save_delta_time
 
-        count = 0
         is_server = self.m_networkMode & NT_NET_MODE_SERVER
-        verbose = self.m_verbose
 
         # python micro-optimizations because this is a loop
         monotonic = time.monotonic
-        kActive = NetworkConnection.State.kActive
-        kDead = NetworkConnection.State.kDead
 
         while self.m_active:
             # handle loop taking too long
@@ -341,6 +478,7 @@ class Dispatcher(object):
             timeout_time += self.m_update_rate
             with self.m_flush_mutex:
                 self.m_flush_cv.wait_for(self._dispatchWaitFor, timeout_time - start)
+                flushed = self.m_do_flush
                 self.m_do_flush = False
 
             # in case we were woken up to terminate
@@ -348,45 +486,93 @@ class Dispatcher(object):
                 break
 
             # perform periodic persistent save
-            if is_server and self.m_persist_filename and start > next_save_time:
-                next_save_time += save_delta_time
-                # handle loop taking too long
-                if start > next_save_time:
-                    next_save_time = start + save_delta_time
+            if is_server and self._isSaveDue(start):
+                self._periodicSave()
 
-                err = self.m_storage.savePersistent(self.m_persist_filename, True)
-                if err:
-                    logger.warning("periodic persistent save: %s", err)
+            self._dispatchStep(start, is_server, flushed)
 
-            with self.m_user_mutex:
-                reconnect = False
+    # python-specific: the asyncio engine saves in an executor instead of on
+    # the event loop, as saving writes and syncs a file
 
-                if verbose:
-                    count += 1
-                    if count > 10:
-                        logger.debug(
-                            "dispatch running %s connections", len(self.m_connections)
-                        )
-                        count = 0
+    def _isSaveDue(self, start):
+        if not self.m_persist_filename or start <= self.m_next_save_time:
+            return False
 
-                for conn in self.m_connections:
-                    # post outgoing messages if connection is active
-                    # only send keep-alives on client
-                    state = conn.state
-                    if state == kActive:
+        self.m_next_save_time += self.m_save_delta_time
+        # handle loop taking too long
+        if start > self.m_next_save_time:
+            self.m_next_save_time = start + self.m_save_delta_time
+        return True
+
+    def _periodicSave(self):
+        err = self.m_storage.savePersistent(self.m_persist_filename, True)
+        if err:
+            logger.warning("periodic persistent save: %s", err)
+
+    def _dispatchStep(self, start, is_server, flushed=False):
+        # python-specific: the body of the dispatch loop, also called
+        # periodically by the asyncio engine. When flushed, every connection
+        # is sent to regardless of its send interval
+
+        kActive = NetworkConnection.State.kActive
+        kDead = NetworkConnection.State.kDead
+
+        min_interval = self.m_update_rate
+        max_interval = self.m_max_update_rate
+        adaptive = max_interval > min_interval
+
+        max_messages = self.m_max_outgoing_messages
+        max_bytes = self.m_max_outgoing_bytes
+        budget = max_messages is not None or max_bytes is not None
+
+        with self.m_user_mutex:
+            reconnect = False
+
+            if self.m_verbose:
+                self.m_dispatch_count += 1
+                if self.m_dispatch_count > 10:
+                    logger.debug(
+                        "dispatch running %s connections", len(self.m_connections)
+                    )
+                    self.m_dispatch_count = 0
+
+            for conn in self.m_connections:
+                # post outgoing messages if connection is active
+                # only send keep-alives on client
+                state = conn.state
+                if state == kActive:
+                    if budget and conn.checkBackpressure(max_messages, max_bytes):
+                        # python-specific: let updates coalesce until the
+                        # connection catches up
+                        pass
+                    elif not adaptive:
                         conn.postOutgoing(not is_server)
+                    elif flushed or conn.m_scheduler.isDue(start):
+                        backlog = conn.hasWriteBacklog()
+                        conn.postOutgoing(not is_server)
+                        conn.m_scheduler.sent(
+                            start,
+                            backlog,
+                            conn.m_stream.getRoundTripTime(),
+                            min_interval,
+                            max_interval,
+                        )
 
-                    # if client, if connection died
-                    if not is_server and state == kDead:
-                        reconnect = True
+                # if client, if connection died
+                if not is_server and state == kDead:
+                    reconnect = True
 
-                # reconnect if we disconnected (and a reconnect is not in progress)
-                if reconnect and not self.m_do_reconnect:
-                    self.m_do_reconnect = True
-                    self.m_reconnect_cv.notify()
+            # reconnect if we disconnected (and a reconnect is not in progress)
+            if reconnect and not self.m_do_reconnect:
+                self.m_do_reconnect = True
+                self._notifyReconnect()
 
     def _queueOutgoing(self, msg, only, except_):
         with self.m_user_mutex:
+            # share the encoded message between connections
+            if not only and len(self.m_connections) > 1:
+                msg = CachedMessage(msg)
+
             for conn in self.m_connections:
                 if conn == except_:
                     continue
@@ -440,21 +626,124 @@ class Dispatcher(object):
                 )
 
                 conn.set_process_incoming(self.m_storage.processIncoming)
-
-                with self.m_user_mutex:
-                    # reuse dead connection slots
-                    for i in range(len(self.m_connections)):
-                        c = self.m_connections[i]
-                        if c.state == NetworkConnection.State.kDead:
-                            self.m_connections[i] = conn
-                            break
-                    else:
-                        self.m_connections.append(conn)
-
-                    conn.start()
+                self._admitServerConnection(conn)
         finally:
             self.m_networkMode = NT_NET_MODE_NONE
 
+    # python-specific
+    def _admitServerConnection(self, conn):
+        # Starts the connection if fewer than m_max_handshakes handshakes are
+        # in progress, otherwise queues it to be started when one finishes.
+        # Returns False if the queue is full and the connection was closed.
+        with self.m_handshake_mutex:
+            max_handshakes = self.m_max_handshakes
+            pending = self.m_pending_handshakes
+            max_pending = self.m_max_pending_handshakes
+
+            if max_handshakes is None or self.m_handshakes < max_handshakes:
+                self.m_handshakes += 1
+                start = True
+            elif max_pending is None or len(pending) < max_pending:
+                pending.append((conn, time.monotonic()))
+                start = False
+            else:
+                start = None
+
+        if start:
+            self._startServerConnection(conn)
+        elif start is None:
+            logger.warning("server: too many pending handshakes, closing %s", conn)
+            conn.get_stream().close()
+            return False
+        elif self.m_verbose:
+            logger.debug("server: handshake of %s is queued", conn)
+
+        return True
+
+    # python-specific
+    def _handshakeDone(self, conn):
+        # called by a server connection when its handshake finishes, starts
+        # the connection that has waited the longest in its place
+        with self.m_handshake_mutex:
+            pending = self.m_pending_handshakes
+            if not pending:
+                self.m_handshakes -= 1
+                return
+
+            conn, queued = pending.popleft()
+
+        queue_time = time.monotonic() - queued
+        if profiling.enabled:
+            profiling.histogram("dispatcher.handshake_queue").record(
+                int(queue_time * 1000000000)
+            )
+
+        conn.m_handshake_queue_time = queue_time
+        self._startServerConnection(conn)
+
+    # python-specific
+    def _startServerConnection(self, conn):
+        # Starting a connection can finish its handshake right away (an
+        # asyncio connection whose client went away while it was queued),
+        # which starts the next queued connection. Instead of recursing, the
+        # connections are started in a loop by the outermost call.
+        mutex = self.m_handshake_mutex
+        ready = self.m_ready_handshakes
+
+        with mutex:
+            ready.append(conn)
+            if self.m_starting_handshakes:
+                return
+            self.m_starting_handshakes = True
+
+        try:
+            while True:
+                with mutex:
+                    if not ready:
+                        self.m_starting_handshakes = False
+                        return
+                    conn = ready.popleft()
+
+                self._addServerConnection(conn)
+        except Exception:
+            with mutex:
+                self.m_starting_handshakes = False
+            raise
+
+    # python-specific
+    def _connectionDied(self, conn):
+        # called by a server connection when it dies (deque is thread-safe)
+        self.m_free_slots.append(conn.m_slot)
+
+    def _addServerConnection(self, conn):
+        conn.m_on_handshake_done = self._handshakeDone
+        conn.m_on_dead = self._connectionDied
+
+        kDead = NetworkConnection.State.kDead
+
+        with self.m_user_mutex:
+            # reuse dead connection slots
+            conns = self.m_connections
+            free_slots = self.m_free_slots
+            while free_slots:
+                i = free_slots.popleft()
+                # slots may have been reused or cleared since
+                if i < len(conns) and conns[i].state == kDead:
+                    conns[i] = conn
+                    break
+            else:
+                i = len(conns)
+                conns.append(conn)
+
+            conn.m_slot = i
+
+        # python-specific: started without holding the lock
+        conn.start()
+
+        # in case the dispatcher was stopped meanwhile
+        if not self.m_active:
+            conn.stop()
+
     def _clientThreadMain(self):
         try:
             tcp_connector = TcpConnector(1, self.m_verbose)
@@ -527,18 +816,47 @@ class Dispatcher(object):
             self.m_networkMode = NT_NET_MODE_NONE
 
     def _clientHandshake(self, conn, get_msg, send_msgs):
+        return _runHandshake(self._clientHandshakeSteps(conn, send_msgs), get_msg)
+
+    def _serverHandshake(self, conn, get_msg, send_msgs):
+        return _runHandshake(self._serverHandshakeSteps(conn, send_msgs), get_msg)
+
+    # python-specific: the handshakes are generators that are sent each
+    # message as it is received, so that they can be driven both by the
+    # blocking read thread and by the asyncio engine
+
+    def _clientHandshakeSteps(self, conn, send_msgs):
         # get identity
         with self.m_user_mutex:
             self_id = self.m_identity
 
+        # python-specific: ask to resume the session with the server that the
+        # entries came from. A server that doesn't support this replies that
+        # the protocol is unsupported, and the client connects again without.
+        resume = (
+            self.m_resume_enabled
+            and not self.m_resume_unsupported
+            and conn.get_proto_rev() == 0x0300
+        )
+
         # send client hello
         if self.m_verbose:
             logger.debug("client: sending hello")
 
-        send_msgs((Message.clientHello(conn.get_proto_rev(), self_id),))
+        if resume:
+            token = self.m_resume_server_token
+            state = self.m_storage.getResumeState() if token else b""
+            send_msgs(
+                (
+                    Message.clientHello(kProtoRevResume, self_id),
+                    Message.resume(token or "", state, 0),
+                )
+            )
+        else:
+            send_msgs((Message.clientHello(conn.get_proto_rev(), self_id),))
 
         # wait for response
-        msg = get_msg()
+        msg = yield
         if not msg:
             # disconnected, retry
             logger.debug("client: server disconnected before first response")
@@ -548,6 +866,10 @@ class Dispatcher(object):
             if msg.id == 0x0200:
                 logger.debug("client: connected to NT2 server, reconnecting...")
                 self._clientReconnect(0x0200)
+            elif resume and msg.id == 0x0300:
+                logger.debug("client: server can't resume, reconnecting...")
+                self.m_resume_unsupported = True
+                self._clientReconnect(0x0300)
             else:
                 logger.debug("client: connected to 0x%04x server, giving up...", msg.id)
 
@@ -564,12 +886,23 @@ class Dispatcher(object):
                 new_server = False
 
             # get the next message
-            msg = get_msg()
+            msg = yield
         else:
             remote_id = "NT2 server"
 
         conn.set_remote_id(remote_id)
 
+        # python-specific: the server says whether it resumed the session
+        resumed = False
+        if resume:
+            if not msg or msg.type != kResume:
+                return False
+
+            resumed = token == msg.str and (msg.flags & 1) != 0
+            token = msg.str
+
+            msg = yield
+
         # receive initial assignments
         incoming = []
         verbose = self.m_verbose
@@ -585,10 +918,12 @@ class Dispatcher(object):
 
             if msg.type == kKeepAlive:
                 # shouldn't receive a keep alive, but handle gracefully
-                msg = get_msg()
+                msg = yield
                 continue
 
-            if not msg.type == kEntryAssign:
+            if not msg.type == kEntryAssign and not (
+                resumed and msg.type == kEntryDelete
+            ):
                 # unexpected message
                 logger.debug(
                     "client: received message (%s) other than entry assignment during initial handshake",
@@ -608,12 +943,18 @@ class Dispatcher(object):
 
             incoming.append(msg)
             # get the next message
-            msg = get_msg()
+            msg = yield
 
         # generate outgoing assignments
         outgoing = []
 
-        self.m_storage.applyInitialAssignments(conn, incoming, new_server, outgoing)
+        if resumed:
+            self.m_storage.applyResumedAssignments(conn, incoming, state, outgoing)
+        else:
+            self.m_storage.applyInitialAssignments(conn, incoming, new_server, outgoing)
+
+        # python-specific: the ids now came from this server
+        self.m_resume_server_token = token if resume else None
 
         if conn.get_proto_rev() >= 0x0300:
             outgoing.append(Message.clientHelloDone())
@@ -627,12 +968,12 @@ class Dispatcher(object):
 
         return True
 
-    def _serverHandshake(self, conn, get_msg, send_msgs):
+    def _serverHandshakeSteps(self, conn, send_msgs):
 
         verbose = self.m_verbose
 
         # Wait for the client to send us a hello.
-        msg = get_msg()
+        msg = yield
         if not msg:
             logger.debug("server: client disconnected before sending hello")
             return False
@@ -641,8 +982,14 @@ class Dispatcher(object):
             logger.debug("server: client initial message was not client hello")
             return False
 
-        # Check that the client requested version is not too high.
+        # python-specific: a client that asks to resume a session otherwise
+        # uses protocol revision 3.0
         proto_rev = msg.id
+        resume = proto_rev == kProtoRevResume and self.m_default_proto == 0x0300
+        if resume:
+            proto_rev = 0x0300
+
+        # Check that the client requested version is not too high.
         if proto_rev > self.m_default_proto:
             logger.debug(
                 "server: client requested proto > 0x%04x", self.m_default_proto
@@ -670,8 +1017,29 @@ class Dispatcher(object):
             with self.m_user_mutex:
                 outgoing.append(Message.serverHello(0, self.m_identity))
 
-        # Get snapshot of initial assignments
-        self.m_storage.getInitialAssignments(conn, outgoing)
+        resumed = False
+        if resume:
+            # python-specific: the client's resume request follows its hello
+            msg = yield
+            if not msg or msg.type != kResume:
+                logger.debug("server: client did not send resume request")
+                return False
+
+            token = self.m_resume_token
+            changes = []
+            if msg.str == token:
+                resumed = self.m_storage.getResumedAssignments(conn, msg.value, changes)
+
+            outgoing.append(Message.resume(token, b"", 1 if resumed else 0))
+
+            if resumed:
+                if verbose:
+                    logger.debug("server: resuming client, %d changes", len(changes))
+                outgoing += changes
+
+        if not resumed:
+            # Get snapshot of initial assignments
+            self.m_storage.getInitialAssignments(conn, outgoing)
 
         # Finish with server hello done
         outgoing.append(Message.serverHelloDone())
@@ -691,7 +1059,7 @@ class Dispatcher(object):
             incoming = []
             while True:
                 # get the next message (blocks)
-                msg = get_msg()
+                msg = yield
                 if not msg:
                     # disconnected, retry
                     logger.debug("server: disconnected waiting for initial entries")
@@ -738,4 +1106,12 @@ class Dispatcher(object):
             self.m_reconnect_proto_rev = proto_rev
             self.m_do_reconnect = True
 
+            self._notifyReconnect()
+
+    def _notifyReconnect(self):
+        # must be called with the user mutex held
+        engine = self.m_engine
+        if engine is not None:
+            engine.reconnect()
+        else:
             self.m_reconnect_cv.notify()
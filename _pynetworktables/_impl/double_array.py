@@ -0,0 +1,149 @@
+# novalidate
+"""
+    Compact storage for arrays of doubles
+
+    Normally a double array value is a tuple of floats, where each element is
+    a separate float object. A DoubleArray keeps the elements in a single
+    ``array.array('d')`` instead. It is created when a double array is set
+    from an ``array.array`` or a NumPy array (or anything else that exports
+    a one dimensional buffer of doubles), so that the elements don't need to
+    be converted one at a time.
+
+    DoubleArray is an immutable sequence. It compares equal to tuples and
+    lists with the same elements, and hashes like the equivalent tuple.
+"""
+
+from array import array
+from collections.abc import Sequence
+import struct
+
+__all__ = ["DoubleArray", "fromBuffer"]
+
+
+_NAN = float("nan")
+_double = struct.Struct("d")
+
+
+def _same_element(x, y):
+    if x == y:
+        return True
+    return x != x and y != y and _double.pack(x) == _double.pack(y)
+
+
+def _copy_buffer(m, values):
+    a = array("d")
+    with m:
+        if m.format == "d" and m.ndim == 1:
+            # copied, since the caller may modify their array later
+            a.frombytes(m.cast("B") if m.c_contiguous else m.tobytes())
+        else:
+            a.extend(m.tolist() if m.ndim == 1 else values)
+    return a
+
+
+def fromBuffer(values):
+    """Returns values as a DoubleArray if it is one already, or if it is an
+    ``array.array``, a NumPy array or anything else that exports a buffer.
+    Otherwise returns None."""
+    if isinstance(values, DoubleArray):
+        return values
+
+    try:
+        m = memoryview(values)
+    except TypeError:
+        return None
+
+    da = DoubleArray.__new__(DoubleArray)
+    da.m_array = _copy_buffer(m, values)
+    return da
+
+
+class DoubleArray(Sequence):
+
+    __slots__ = ["m_array"]
+
+    def __init__(self, values=()):
+        if isinstance(values, DoubleArray):
+            # immutable, so the storage can be shared
+            self.m_array = values.m_array
+            return
+
+        try:
+            m = memoryview(values)
+        except TypeError:
+            self.m_array = array("d", values)
+        else:
+            self.m_array = _copy_buffer(m, values)
+
+    def __len__(self):
+        return len(self.m_array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            da = DoubleArray.__new__(DoubleArray)
+            da.m_array = self.m_array[index]
+            return da
+        return self.m_array[index]
+
+    def __iter__(self):
+        return iter(self.m_array)
+
+    def __contains__(self, value):
+        return value in self.m_array
+
+    def __eq__(self, other):
+        a = self.m_array
+        if isinstance(other, DoubleArray):
+            other = other.m_array
+            if a == other:
+                return True
+        elif isinstance(other, tuple):
+            if tuple(a) == other:
+                return True
+        elif isinstance(other, list):
+            if a.tolist() == other:
+                return True
+        else:
+            return NotImplemented
+
+        # A tuple treats elements that are the same object as equal before
+        # comparing them, so a tuple of NaNs can be equal to itself. The
+        # elements here aren't objects, so a NaN is treated as the same
+        # element when it has the same bits instead.
+        if a == a or len(a) != len(other):
+            return False
+        return all(_same_element(x, y) for x, y in zip(a, other))
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        if eq is NotImplemented:
+            return eq
+        return not eq
+
+    def __hash__(self):
+        a = self.m_array
+        if a == a:
+            return hash(tuple(a))
+        # each NaN float object has its own hash
+        return hash(tuple(x if x == x else _NAN for x in a))
+
+    def __repr__(self):
+        return "DoubleArray(%r)" % (self.m_array.tolist(),)
+
+    def tolist(self):
+        """Returns the elements as a list of floats"""
+        return self.m_array.tolist()
+
+    def tobytes(self):
+        """Returns the elements as doubles in native byte order"""
+        return self.m_array.tobytes()
+
+    def view(self):
+        """Returns a read-only memoryview of the elements, which can be
+        passed to ``numpy.frombuffer`` without copying them"""
+        m = memoryview(self.m_array)
+        if hasattr(m, "toreadonly"):
+            return m.toreadonly()
+
+        # python < 3.8 can't make a read-only view of a writable buffer
+        return memoryview(self.m_array.tobytes()).cast("d")
@@ -7,8 +7,9 @@
 # ----------------------------------------------------------------------------
 
 from collections import namedtuple
+from operator import itemgetter
 
-from .callback_manager import CallbackManager, CallbackThread
+from .callback_manager import BatchCallback, CallbackManager, CallbackThread
 
 from .constants import (
     NT_NOTIFY_IMMEDIATE,
@@ -37,11 +38,79 @@ _EntryNotification = namedtuple(
 _assign_both = NT_NOTIFY_UPDATE | NT_NOTIFY_FLAGS
 _immediate_local = NT_NOTIFY_IMMEDIATE | NT_NOTIFY_LOCAL
 
+_listener_uid = itemgetter(0)
+_notification_local_id = itemgetter(3)
+
+
+def _merge_notifications(prev, notification):
+    # the newest value wins, but keep the flags of the collapsed notifications
+    # so that a listener still finds out that an entry is new
+    return notification._replace(flags=prev.flags | notification.flags)
+
 
 class EntryNotifierThread(CallbackThread):
     def __init__(self):
         CallbackThread.__init__(self, "entry-notifier")
 
+        # python optimization: listeners indexed by local id, and a trie of
+        # listener prefixes (one dict per character, the listeners of a node
+        # are stored under the None key) so that a notification only needs
+        # to be checked against the listeners that can possibly match it
+        self.m_id_listeners = {}
+        self.m_prefix_trie = {}
+
+    def updateListeners(self, listeners):
+        id_listeners = {}
+        prefix_trie = {}
+
+        for item in listeners:
+            listener = item[1]
+            if listener.local_id is not None:
+                id_listeners.setdefault(listener.local_id, []).append(item)
+            else:
+                node = prefix_trie
+                for c in listener.prefix:
+                    node = node.setdefault(c, {})
+                node.setdefault(None, []).append(item)
+
+        self.m_id_listeners = id_listeners
+        self.m_prefix_trie = prefix_trie
+
+    def getListeners(self, data):
+        found = self.m_id_listeners.get(data.local_id)
+        merged = False
+
+        node = self.m_prefix_trie
+        found_prefix = node.get(None)
+        if found_prefix:
+            if found:
+                found = found + found_prefix
+                merged = True
+            else:
+                found = found_prefix
+
+        for c in data.name:
+            node = node.get(c)
+            if node is None:
+                break
+
+            found_prefix = node.get(None)
+            if found_prefix:
+                if found:
+                    found = found + found_prefix
+                    merged = True
+                else:
+                    found = found_prefix
+
+        if not found:
+            return ()
+
+        # callbacks are called in the order the listeners were added
+        if merged:
+            found.sort(key=_listener_uid)
+
+        return found
+
     def matches(self, listener, data):
         if not data.value:
             return False
@@ -109,6 +178,28 @@ class EntryNotifier(CallbackManager):
             self.m_local_notifiers = True
         return self.doAdd(_EntryListenerData(None, local_id, flags, None, poller_uid))
 
+    def addBatch(self, callback, prefix, flags, collapse=False):
+        """python-specific: callback is called with a list of the
+        notifications for prefix that were queued since the last time it was
+        called. If collapse is True, only the latest notification for each
+        entry is in the list."""
+        self.start()
+        batch = BatchCallback(
+            callback,
+            self.m_owner.m_pending_batches,
+            _notification_local_id if collapse else None,
+            _merge_notifications,
+        )
+        return self.add(batch, prefix, flags)
+
+    def createPoller(self, conflate=False, maxlen=None):
+        """python-specific: if conflate is True, the poller only keeps the
+        newest notification for each entry. If maxlen is given, the oldest
+        notifications are dropped once that many are waiting to be polled."""
+        return CallbackManager.createPoller(
+            self, _notification_local_id if conflate else None, maxlen
+        )
+
     def notifyEntry(self, local_id, name, value, flags, only_listener=None):
 
         # optimization: don't generate needless local queue entries if we have
@@ -0,0 +1,190 @@
+# novalidate
+"""
+    Buffered message decoder for the network read thread
+
+    Rather than pulling every field of every message through a separate
+    read on the socket's file object, the decoder receives whatever data is
+    available into one large buffer and parses as many complete messages
+    out of it as it can. A message that is split across two receives is
+    simply parsed again once the rest of it has arrived.
+
+    The decoder implements the same ``read`` / ``readStruct`` interface as
+    TCPStream, so Message.read and WireCodec are used unchanged.
+
+    When the data is received elsewhere (such as by an asyncio protocol), it
+    can be handed to the decoder with ``feed`` and the messages retrieved with
+    the non-blocking ``parseMessages``.
+"""
+
+from .constants import kEntryAssign
+from .message import Message
+from .support import profiling
+
+
+class _Incomplete(Exception):
+    """Raised when the buffer does not contain a complete message"""
+
+
+# python optimization: most reads are a single byte (message and value
+# types), so don't allocate a new bytes object for each of them
+_single_bytes = [bytes((i,)) for i in range(256)]
+
+
+class FrameDecoder(object):
+    def __init__(self, stream, codec, get_entry_type, bufsize=65536):
+        self.m_stream = stream
+        self.m_codec = codec
+        self.m_get_entry_type = get_entry_type
+
+        self.m_buf = bytearray(bufsize)
+        self.m_view = memoryview(self.m_buf)
+
+        # start of the first unparsed message
+        self.m_rpos = 0
+        # end of the received data
+        self.m_wpos = 0
+        # parse position within the current message
+        self.m_pos = 0
+
+        #: total number of bytes received
+        self.bytes_read = 0
+
+    #
+    # Stream interface used by Message.read and WireCodec
+    #
+
+    def read(self, size):
+        pos = self.m_pos
+        end = pos + size
+        if end > self.m_wpos:
+            raise _Incomplete()
+
+        self.m_pos = end
+        if size == 1:
+            return _single_bytes[self.m_buf[pos]]
+        return bytes(self.m_view[pos:end])
+
+    def readStruct(self, s):
+        pos = self.m_pos
+        end = pos + s.size
+        if end > self.m_wpos:
+            raise _Incomplete()
+
+        self.m_pos = end
+        return s.unpack_from(self.m_buf, pos)
+
+    #
+    # Message retrieval
+    #
+
+    def readMessage(self):
+        """Returns the next message, blocking until it has been received
+        completely"""
+        while True:
+            msg = self.parseMessage()
+            if msg is not None:
+                return msg
+
+            self._fill()
+
+    def readMessages(self):
+        """Returns all of the complete messages that are currently buffered,
+        blocking until there is at least one"""
+        while True:
+            msgs = self.parseMessages()
+            if msgs:
+                return msgs
+
+            self._fill()
+
+    def parseMessage(self):
+        """Returns the next buffered message, or None if it has not been
+        received completely yet"""
+        self.m_pos = self.m_rpos
+        try:
+            msg = Message.read(self, self.m_codec, self.m_get_entry_type)
+        except _Incomplete:
+            return None
+
+        self.m_rpos = self.m_pos
+        return msg
+
+    def parseMessages(self):
+        """Returns all of the complete messages that are currently buffered,
+        without blocking"""
+        msgs = []
+        parse = self.parseMessage
+
+        # NT2 entry updates don't carry a value type, it is looked up from
+        # the entry instead. Stop after an assignment so that it can be
+        # processed before any updates that follow it are decoded.
+        v2 = self.m_codec.proto_rev < 0x0300
+
+        profile = profiling.enabled
+        if profile:
+            start = profiling.perf_counter_ns()
+
+        while True:
+            msg = parse()
+            if msg is None:
+                break
+
+            msgs.append(msg)
+            if v2 and msg.type == kEntryAssign:
+                break
+
+        if profile and msgs:
+            profiling.histogram("wire.decode").record(
+                profiling.perf_counter_ns() - start
+            )
+
+        return msgs
+
+    def feed(self, data):
+        """Appends data received by some other means to the buffer"""
+        size = len(data)
+        self._reserve(size)
+
+        wpos = self.m_wpos
+        self.m_buf[wpos : wpos + size] = data
+        self.m_wpos = wpos + size
+        self.bytes_read += size
+
+    def _fill(self):
+        self._reserve(1)
+        wpos = self.m_wpos
+        size = self.m_stream.recv_into(self.m_view[wpos:])
+        self.m_wpos = wpos + size
+        self.bytes_read += size
+
+    def _reserve(self, size):
+        # makes room for at least size bytes at the end of the buffer
+        rpos = self.m_rpos
+        wpos = self.m_wpos
+        buflen = len(self.m_buf)
+
+        if rpos == wpos:
+            # everything has been consumed, start over at the beginning
+            rpos = wpos = 0
+
+        if wpos + size > buflen:
+            remaining = wpos - rpos
+            if remaining + size <= buflen:
+                # move the partial message to the front of the buffer
+                self.m_buf[:remaining] = self.m_buf[rpos:wpos]
+            else:
+                # the data doesn't fit in the buffer
+                while remaining + size > buflen:
+                    buflen *= 2
+
+                buf = bytearray(buflen)
+                buf[:remaining] = self.m_view[rpos:wpos]
+                self.m_view.release()
+                self.m_buf = buf
+                self.m_view = memoryview(buf)
+
+            rpos = 0
+            wpos = remaining
+
+        self.m_rpos = rpos
+        self.m_wpos = wpos
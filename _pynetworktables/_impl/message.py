@@ -17,6 +17,7 @@ from .constants import (
     kExecuteRpc,
     kRpcResponse,
     kClearAllMagic,
+    kResume,
     NT_VTYPE2RAW,
     NT_RAW2VTYPE,
 )
@@ -81,6 +82,11 @@ class Message(
     def rpcResponse(cls, rpc_id, call_uid, result):
         return cls(kRpcResponse, result, None, rpc_id, None, call_uid)
 
+    # python-specific
+    @classmethod
+    def resume(cls, token, state, flags):
+        return cls(kResume, token, state, None, flags, None)
+
     @classmethod
     def read(cls, rstream, codec, get_entry_type) -> "Message":
         msgtype = rstream.read(1)
@@ -149,6 +155,11 @@ class Message(
             msg_id, seq_num_uid = rstream.readStruct(codec.rpcResponse)
             msg_str = codec.read_string(rstream)
 
+        elif msgtype == kResume:
+            (flags,) = rstream.readStruct(codec.resume)
+            msg_str = codec.read_string(rstream)
+            value = codec.read_raw_v3(rstream)
+
         else:
             raise ValueError("Unrecognized message type %s" % msgtype)
 
@@ -224,5 +235,66 @@ class Message(
                 out += (msgtype, codec.rpcResponse.pack(self.id, self.seq_num_uid))
                 codec.write_string(self.str, out)
 
+        elif msgtype == kResume:
+            if codec.proto_rev >= 0x0300:
+                out += (msgtype, codec.resume.pack(self.flags))
+                codec.write_string(self.str, out)
+                codec.write_raw_v3(self.value, out)
+
         else:
             raise ValueError("Internal error: bad value type %s" % self.type)
+
+
+class CachedMessage(Message):
+    """
+    A message that is queued to more than one connection. The first writer
+    encodes it and keeps the bytes for that protocol revision, and the other
+    connections reuse them instead of encoding the same message again.
+    """
+
+    # Note: no __slots__, the cache is stored in the instance dict
+
+    def __new__(cls, msg):
+        self = Message.__new__(cls, *msg)
+        self.m_encoded = {}
+        return self
+
+    def write(self, out, codec):
+        proto_rev = codec.proto_rev
+        encoded = self.m_encoded.get(proto_rev)
+        if encoded is None:
+            parts = []
+            Message.write(self, parts, codec)
+            encoded = self.m_encoded[proto_rev] = b"".join(parts)
+
+        if encoded:
+            out.append(encoded)
+
+
+class EncodedAssignments(Message):
+    """
+    python-specific: the entry assignments that a server sends to a client
+    during the handshake, already encoded for one protocol revision. The
+    storage keeps one of these up to date, and every client that connects
+    with the same revision is sent the same one. It is queued as a single
+    message.
+    """
+
+    # Note: no __slots__, the encoding is stored in the instance dict
+
+    def __new__(cls, proto_rev, data, count):
+        self = Message.__new__(cls, kEntryAssign, None, None, None, None, None)
+        self.m_proto_rev = proto_rev
+        self.m_data = data
+        self.m_count = count
+        return self
+
+    def write(self, out, codec):
+        if codec.proto_rev != self.m_proto_rev:
+            raise ValueError(
+                "Internal error: assignments encoded for 0x%04x, not 0x%04x"
+                % (self.m_proto_rev, codec.proto_rev)
+            )
+
+        if self.m_data:
+            out.append(self.m_data)
@@ -7,6 +7,8 @@
 # ----------------------------------------------------------------------------
 
 import threading
+from collections import Counter
+from operator import itemgetter
 from time import monotonic
 
 try:
@@ -16,20 +18,16 @@ except ImportError:
     from queue import Queue, Empty
 
 
-from .constants import (
-    kEntryAssign,
-    kEntryUpdate,
-    kFlagsUpdate,
-    kEntryDelete,
-    kClearEntries,
-    msgtype_str,
-)
+from .constants import kEntryAssign, msgtype_str
 
-from .message import Message
-from .structs import ConnectionInfo
+from .frame_decoder import FrameDecoder
+from .message import EncodedAssignments, Message
+from .send_scheduler import SendScheduler
+from .structs import ConnectionInfo, ConnectionStats
 from .wire import WireCodec
 
-from .support.lists import Pair
+from .support import profiling
+from .support.coalescing_queue import CoalescingQueue
 from .support.safe_thread import SafeThread
 
 from .tcpsockets.tcp_stream import StreamEOF
@@ -38,7 +36,10 @@ import logging
 
 logger = logging.getLogger("nt")
 
-_empty_pair = Pair(0, 0)
+# wakes up the write thread without sending anything
+_wakeup = (0, ())
+
+_msg_type = itemgetter(0)
 
 _state_map = {
     0: "created",
@@ -87,8 +88,50 @@ class NetworkConnection(object):
         self.m_last_post = 0
 
         self.m_pending_mutex = threading.Lock()
-        self.m_pending_outgoing = []
-        self.m_pending_update = {}
+        self.m_pending = CoalescingQueue()
+
+        # python-specific: number of messages queued and number of those that
+        # were coalesced away (in the last cycle, and since connecting)
+        self.m_last_queued = 0
+        self.m_last_collapsed = 0
+        self.m_total_queued = 0
+        self.m_total_collapsed = 0
+
+        # python-specific: used by the dispatcher when adaptive send
+        # intervals are enabled
+        self.m_scheduler = SendScheduler()
+
+        # python-specific: outgoing budget bookkeeping. The number of messages
+        # handed to the write thread and written by it (protected by
+        # m_budget_mutex, as the read thread also changes them during the
+        # handshake), and the size of the data being sent right now
+        self.m_budget_mutex = threading.Lock()
+        self.m_posted_messages = 0
+        self.m_written_messages = 0
+        self.m_writing_bytes = 0
+
+        # python-specific: whether the connection is over its outgoing budget,
+        # the number of times it went over, and the number of send cycles that
+        # were held back because of it
+        self.m_backpressured = False
+        self.m_backpressure_events = 0
+        self.m_backpressure_skipped = 0
+
+        # python-specific: statistics, see stats()
+        self.m_reader = None
+        self.m_bytes_written = 0
+        self.m_read_counts = Counter()
+        self.m_write_counts = Counter()
+        self.m_last_write_latency = None
+        self.m_handshake_duration = None
+        self.m_handshake_queue_time = 0.0
+
+        # python-specific: set by the dispatcher for server connections. The
+        # connection's index in the dispatcher's connection list, and the
+        # functions called when the handshake finishes and when it dies
+        self.m_slot = None
+        self.m_on_handshake_done = None
+        self.m_on_dead = None
 
         # Condition variables for shutdown
         self.m_shutdown_mutex = threading.Lock()
@@ -118,6 +161,10 @@ class NetworkConnection(object):
         except Empty:
             pass
 
+        with self.m_budget_mutex:
+            self.m_posted_messages = 0
+            self.m_written_messages = 0
+
         # reset shutdown flags
         with self.m_shutdown_mutex:
             self.m_read_shutdown = False
@@ -147,7 +194,7 @@ class NetworkConnection(object):
         self.m_stream.close()
 
         # send an empty outgoing message set so the write thread terminates
-        self.m_outgoing.put([])
+        self.m_outgoing.put(_wakeup)
 
         # wait for threads to terminate, timeout
         self.m_write_thread.join(1)
@@ -180,6 +227,28 @@ class NetworkConnection(object):
             self.m_proto_rev,
         )
 
+    def stats(self):
+        """python-specific: returns a ConnectionStats"""
+        reader = self.m_reader
+        backlog = self._getMessageBacklog()
+        return ConnectionStats(
+            self.info(),
+            reader.bytes_read if reader else 0,
+            self.m_bytes_written,
+            {msgtype_str(k): v for k, v in dict(self.m_read_counts).items()},
+            {msgtype_str(k): v for k, v in dict(self.m_write_counts).items()},
+            len(self.m_pending) + backlog,
+            self.m_total_queued,
+            self.m_total_collapsed,
+            self.m_last_write_latency,
+            self.m_handshake_duration,
+            self.m_scheduler.interval,
+            self.m_backpressured,
+            self.m_backpressure_events,
+            self.m_backpressure_skipped,
+            self.m_handshake_queue_time,
+        )
+
     def is_connected(self):
         return self.state == self.State.kActive
 
@@ -220,6 +289,10 @@ class NetworkConnection(object):
                     info.remote_id,
                 )
 
+                on_dead = self.m_on_dead
+                if on_dead is not None:
+                    on_dead(self)
+
             if self.m_verbose:
                 logger.debug(
                     "%s: %s -> %s", self, _state_map[self.state], _state_map[state]
@@ -243,17 +316,49 @@ class NetworkConnection(object):
         return self.m_uid
 
     def _sendMessages(self, msgs):
-        self.m_outgoing.put(msgs)
+        with self.m_budget_mutex:
+            self.m_posted_messages += len(msgs)
+        self.m_outgoing.put((monotonic(), msgs))
+
+    # python-specific
+    def _handshakeFinished(self):
+        # lets the dispatcher start the next handshake, whether this one
+        # succeeded or not
+        on_done = self.m_on_handshake_done
+        if on_done is not None:
+            self.m_on_handshake_done = None
+            on_done(self)
+
+    # python-specific
+    def _sendHandshakeMessages(self, msgs):
+        # a server queues its initial assignments as a single message (see
+        # Storage.getInitialAssignments), but they are counted as the
+        # messages that they contain. This is only checked in the handshake,
+        # so that other messages aren't slowed down.
+        for msg in msgs:
+            if isinstance(msg, EncodedAssignments):
+                extra = msg.m_count - 1
+                with self.m_budget_mutex:
+                    self.m_posted_messages += extra
+                    self.m_written_messages += extra
+                self.m_write_counts[kEntryAssign] += extra
+
+        self._sendMessages(msgs)
 
     def _readThreadMain(self):
         decoder = WireCodec(self.m_proto_rev)
+        reader = FrameDecoder(self.m_stream, decoder, self.m_get_entry_type)
+        self.m_reader = reader
 
         verbose = self.m_verbose
+        read_counts = self.m_read_counts
 
         def _getMessage():
             decoder.set_proto_rev(self.m_proto_rev)
             try:
-                return Message.read(self.m_stream, decoder, self.m_get_entry_type)
+                msg = reader.readMessage()
+                read_counts[msg.type] += 1
+                return msg
             except IOError as e:
                 logger.warning("read error in handshake: %s", e)
 
@@ -263,17 +368,23 @@ class NetworkConnection(object):
                 return None
 
         self.set_state(self.State.kHandshake)
+        handshake_start = monotonic()
 
         try:
-            handshake_success = self.m_handshake(self, _getMessage, self._sendMessages)
+            handshake_success = self.m_handshake(
+                self, _getMessage, self._sendHandshakeMessages
+            )
         except Exception:
             logger.exception("Unhandled exception during handshake")
             handshake_success = False
 
+        self._handshakeFinished()
+
         if not handshake_success:
             self.set_state(self.State.kDead)
             self.m_active = False
         else:
+            self.m_handshake_duration = monotonic() - handshake_start
             self.set_state(self.State.kActive)
 
             try:
@@ -284,9 +395,7 @@ class NetworkConnection(object):
                     decoder.set_proto_rev(self.m_proto_rev)
 
                     try:
-                        msg = Message.read(
-                            self.m_stream, decoder, self.m_get_entry_type
-                        )
+                        msgs = reader.readMessages()
                     except Exception as e:
                         if not isinstance(e, StreamEOF):
                             if verbose:
@@ -299,19 +408,28 @@ class NetworkConnection(object):
 
                         break
 
-                    if verbose:
-                        logger.debug(
-                            "%s received type=%s with str=%s id=%s seq_num=%s value=%s",
-                            self.m_stream.sock_type,
-                            msgtype_str(msg.type),
-                            msg.str,
-                            msg.id,
-                            msg.seq_num_uid,
-                            msg.value,
+                    self.m_last_update = monotonic()
+                    read_counts.update(map(_msg_type, msgs))
+
+                    process_incoming = self.m_process_incoming
+                    if profiling.enabled:
+                        process_incoming = profiling.timed(
+                            process_incoming, "storage.process_incoming"
                         )
 
-                    self.m_last_update = monotonic()
-                    self.m_process_incoming(msg, self)
+                    for msg in msgs:
+                        if verbose:
+                            logger.debug(
+                                "%s received type=%s with str=%s id=%s seq_num=%s value=%s",
+                                self.m_stream.sock_type,
+                                msgtype_str(msg.type),
+                                msg.str,
+                                msg.id,
+                                msg.seq_num_uid,
+                                msg.value,
+                            )
+
+                        process_incoming(msg, self)
             except IOError as e:
                 # connection died probably
                 logger.debug("IOError in read thread: %s", e)
@@ -322,7 +440,7 @@ class NetworkConnection(object):
             self.m_active = False
 
         # also kill write thread
-        self.m_outgoing.put([])
+        self.m_outgoing.put(_wakeup)
 
         with self.m_shutdown_mutex:
             self.m_read_shutdown = True
@@ -331,11 +449,12 @@ class NetworkConnection(object):
         encoder = WireCodec(self.m_proto_rev)
 
         verbose = self.m_verbose
+        write_counts = self.m_write_counts
         out = []
 
         try:
             while self.m_active:
-                msgs = self.m_outgoing.get()
+                posted, msgs = self.m_outgoing.get()
 
                 if verbose:
                     logger.debug("write thread woke up")
@@ -349,35 +468,53 @@ class NetworkConnection(object):
 
                 encoder.set_proto_rev(self.m_proto_rev)
 
+                profile = profiling.enabled
+                if profile:
+                    encode_start = profiling.perf_counter_ns()
+
                 # python-optimization: checking verbose causes extra overhead
                 if verbose:
                     for msg in msgs:
-                        if msg:
-                            logger.debug(
-                                "%s sending type=%s with str=%s id=%s seq_num=%s value=%s",
-                                self.m_stream.sock_type,
-                                msgtype_str(msg.type),
-                                msg.str,
-                                msg.id,
-                                msg.seq_num_uid,
-                                msg.value,
-                            )
-                            msg.write(out, encoder)
+                        logger.debug(
+                            "%s sending type=%s with str=%s id=%s seq_num=%s value=%s",
+                            self.m_stream.sock_type,
+                            msgtype_str(msg.type),
+                            msg.str,
+                            msg.id,
+                            msg.seq_num_uid,
+                            msg.value,
+                        )
+                        msg.write(out, encoder)
                 else:
                     for msg in msgs:
-                        if msg:
-                            msg.write(out, encoder)
+                        msg.write(out, encoder)
+
+                if profile:
+                    profiling.histogram("wire.encode").record(
+                        profiling.perf_counter_ns() - encode_start
+                    )
 
                 if not self.m_stream:
                     break
 
                 if not out:
+                    with self.m_budget_mutex:
+                        self.m_written_messages += len(msgs)
                     continue
 
-                self.m_stream.send(b"".join(out))
-
+                data = b"".join(out)
                 del out[:]
 
+                self.m_writing_bytes = len(data)
+                self.m_stream.send(data)
+                self.m_writing_bytes = 0
+                with self.m_budget_mutex:
+                    self.m_written_messages += len(msgs)
+
+                self.m_last_write_latency = monotonic() - posted
+                self.m_bytes_written += len(data)
+                write_counts.update(map(_msg_type, msgs))
+
                 # if verbose:
                 #    logger.debug('send %s bytes', encoder.size())
         except IOError as e:
@@ -394,111 +531,65 @@ class NetworkConnection(object):
         with self.m_shutdown_mutex:
             self.m_write_shutdown = True
 
-    def queueOutgoing(self, msg):
-        with self.m_pending_mutex:
-
-            # Merge with previous.  One case we don't combine: delete/assign loop.
-            msgtype = msg.type
-            if msgtype in [kEntryAssign, kEntryUpdate]:
-
-                # don't do this for unassigned id's
-                msg_id = msg.id
-                if msg_id == 0xFFFF:
-                    self.m_pending_outgoing.append(msg)
-                    return
-
-                mpend = self.m_pending_update.get(msg_id)
-                if mpend is not None and mpend.first != 0:
-                    # overwrite the previous one for this id
-                    oldidx = mpend.first - 1
-                    oldmsg = self.m_pending_outgoing[oldidx]
-                    if (
-                        oldmsg
-                        and oldmsg.type == kEntryAssign
-                        and msgtype == kEntryUpdate
-                    ):
-                        # need to update assignment with seq_num and value
-                        oldmsg = Message.entryAssign(
-                            oldmsg.str, msg_id, msg.seq_num_uid, msg.value, oldmsg.flags
-                        )
-
-                    else:
-                        oldmsg = msg  # easy update
-
-                    self.m_pending_outgoing[oldidx] = oldmsg
-
-                else:
-                    # new, remember it
-                    pos = len(self.m_pending_outgoing)
-                    self.m_pending_outgoing.append(msg)
-                    self.m_pending_update[msg_id] = Pair(pos + 1, 0)
-
-            elif msgtype == kEntryDelete:
-                # don't do this for unassigned id's
-                msg_id = msg.id
-                if msg_id == 0xFFFF:
-                    self.m_pending_outgoing.append(msg)
-                    return
-
-                # clear previous updates
-                mpend = self.m_pending_update.get(msg_id)
-                if mpend is not None:
-                    if mpend.first != 0:
-                        self.m_pending_outgoing[mpend.first - 1] = None
-
-                    if mpend.second != 0:
-                        self.m_pending_outgoing[mpend.second - 1] = None
-
-                    self.m_pending_update[msg_id] = _empty_pair
-
-                # add deletion
-                self.m_pending_outgoing.append(msg)
-
-            elif msgtype == kFlagsUpdate:
-                # don't do this for unassigned id's
-                msg_id = msg.id
-                if id == 0xFFFF:
-                    self.m_pending_outgoing.append(msg)
-                    return
+    def _getMessageBacklog(self):
+        # python-specific: number of posted messages not written yet
+        with self.m_budget_mutex:
+            return self.m_posted_messages - self.m_written_messages
+
+    def hasWriteBacklog(self):
+        """python-specific: True if messages that were posted earlier haven't
+        been written to the socket or acknowledged by the remote end yet"""
+        if self.m_outgoing.qsize():
+            return True
+        return bool(self.m_stream.getSendBacklog())
+
+    def checkBackpressure(self, max_messages, max_bytes):
+        """python-specific: True if more than max_messages messages or
+        max_bytes bytes that were posted earlier are still waiting to be
+        written or acknowledged (None disables either limit).
+
+        While that is the case the dispatcher doesn't post to the connection,
+        so its updates keep being coalesced in the pending queue instead of
+        piling up in the write queue.
+        """
+        over = max_messages is not None and self._getMessageBacklog() > max_messages
+        if not over and max_bytes is not None:
+            backlog = self.m_writing_bytes + (self.m_stream.getSendBacklog() or 0)
+            over = backlog > max_bytes
+
+        if over:
+            self.m_backpressure_skipped += 1
+
+        if over != self.m_backpressured:
+            self.m_backpressured = over
+            info = self.info()
+            if over:
+                self.m_backpressure_events += 1
+                logger.info(
+                    "BACKPRESSURE %s port %s (%s): holding back updates",
+                    info.remote_ip,
+                    info.remote_port,
+                    info.remote_id,
+                )
+            elif self.m_verbose:
+                logger.debug("%s: backpressure released", self)
 
-                mpend = self.m_pending_update.get(msg_id)
-                if mpend is not None and mpend.second != 0:
-                    # overwrite the previous one for this id
-                    self.m_pending_outgoing[mpend.second - 1] = msg
+            self.m_notifier.notifyBackpressure(over, info)
 
-                else:
-                    # new, remember it
-                    pos = len(self.m_pending_outgoing)
-                    self.m_pending_outgoing.append(msg)
-                    self.m_pending_update[msg_id] = Pair(0, pos + 1)
-
-            elif msgtype == kClearEntries:
-                # knock out all previous assigns/updates!
-                for i, m in enumerate(self.m_pending_outgoing):
-                    if not m:
-                        continue
-
-                    t = m.type
-                    if t in [
-                        kEntryAssign,
-                        kEntryUpdate,
-                        kFlagsUpdate,
-                        kEntryDelete,
-                        kClearEntries,
-                    ]:
-                        self.m_pending_outgoing[i] = None
-
-                self.m_pending_update.clear()
-                self.m_pending_outgoing.append(msg)
+        return over
 
-            else:
-                self.m_pending_outgoing.append(msg)
+    def queueOutgoing(self, msg):
+        with self.m_pending_mutex:
+            # Merge with previous.  One case we don't combine: delete/assign loop.
+            # -> python-specific: see CoalescingQueue
+            self.m_pending.push(msg)
 
     def postOutgoing(self, keep_alive):
         with self.m_pending_mutex:
             # optimization: don't call monotonic unless needed
             # now = monotonic()
-            if not self.m_pending_outgoing:
+            pending = self.m_pending
+            if not pending:
                 if not keep_alive:
                     return
 
@@ -507,13 +598,24 @@ class NetworkConnection(object):
                 if (now - self.m_last_post) < 1.0:
                     return
 
-                self.m_outgoing.put((Message.keepAlive(),))
+                self._sendMessages((Message.keepAlive(),))
 
             else:
                 now = monotonic()
-                self.m_outgoing.put(self.m_pending_outgoing)
-
-                self.m_pending_outgoing = []
-                self.m_pending_update.clear()
+                self._sendMessages(pending.drain())
+
+                # python-specific: keep track of how well updates coalesce
+                self.m_last_queued = pending.queued
+                self.m_last_collapsed = pending.collapsed
+                self.m_total_queued += pending.queued
+                self.m_total_collapsed += pending.collapsed
+                if self.m_verbose:
+                    logger.debug(
+                        "%s: sent %d of %d queued messages",
+                        self,
+                        pending.queued - pending.collapsed,
+                        pending.queued,
+                    )
+                pending.resetCounts()
 
             self.m_last_post = now
@@ -0,0 +1,70 @@
+# novalidate
+"""
+    Helpers for the bulk numeric functions
+
+    NumPy is optional, and is only imported the first time a function that
+    returns a NumPy array is called. Functions that only accept arrays work
+    without it, since NumPy arrays (and ``array.array``) are converted with
+    their ``tolist`` method.
+"""
+
+from .constants import NT_DOUBLE
+from .double_array import DoubleArray
+from .value import Value
+
+__all__ = ["get_numpy", "make_doubles", "doubles_to_ndarray", "array_view"]
+
+_numpy = None
+
+
+def get_numpy():
+    """Returns the numpy module, importing it the first time"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required for this function") from None
+        _numpy = numpy
+    return _numpy
+
+
+def make_doubles(values, count):
+    """Returns a list of double Values for a sequence or array of count
+    numbers"""
+    if hasattr(values, "tolist"):
+        # python optimization: converts all of the elements at once
+        values = values.tolist()
+
+    if len(values) != count:
+        raise ValueError("%d values were given for %d keys" % (len(values), count))
+
+    make = Value.makeDouble
+    return [make(v) for v in values]
+
+
+def doubles_to_ndarray(values, defaultValue):
+    """Returns a float64 NumPy array of the values that are doubles, with
+    defaultValue in place of anything else"""
+    np = get_numpy()
+    return np.array(
+        [
+            v.value if v is not None and v.type == NT_DOUBLE else defaultValue
+            for v in values
+        ],
+        dtype=np.float64,
+    )
+
+
+def array_view(value):
+    """Returns the elements of a double array value as a read-only float64
+    NumPy array. A compact array is viewed without being copied."""
+    np = get_numpy()
+
+    a = value.value
+    if isinstance(a, DoubleArray):
+        return np.frombuffer(a.view(), dtype=np.float64)
+
+    arr = np.array(a, dtype=np.float64)
+    arr.flags.writeable = False
+    return arr
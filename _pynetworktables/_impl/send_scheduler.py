@@ -0,0 +1,62 @@
+# novalidate
+"""
+    Per-connection send scheduling
+
+    By default the dispatcher posts the outgoing messages of every
+    connection each time it wakes up. When a maximum update interval is
+    configured that is larger than the update rate, each connection gets a
+    SendScheduler instead, which picks how often that connection is sent to:
+
+    * The interval is never shorter than the update rate, and never shorter
+      than the round trip time of the connection (if the platform reports
+      it), since the remote end can't acknowledge data any faster than that.
+    * If data sent in a previous cycle still hasn't been written or
+      acknowledged when the connection is due again, the connection is
+      congested and the interval is doubled, up to the maximum interval.
+    * Otherwise the interval shrinks by a quarter each cycle, back towards
+      the update rate.
+
+    While a connection waits, the updates queued for it keep being
+    coalesced, so a slow connection receives fewer, conflated updates
+    instead of an ever growing queue.
+"""
+
+_backoff = 2.0
+_recover = 0.75
+
+
+class SendScheduler(object):
+    def __init__(self):
+        #: current send interval, 0 until the first send
+        self.interval = 0.0
+        self.m_next_send = 0.0
+
+    def isDue(self, now):
+        return now >= self.m_next_send
+
+    def sent(self, now, backlog, rtt, min_interval, max_interval):
+        """Called after the connection was sent to, chooses when it is due
+        next.
+
+        :param backlog: True if data from earlier cycles was still waiting
+                        to be written or acknowledged when this cycle started
+        :param rtt: round trip time in seconds, or None if unknown
+        """
+        floor = min_interval
+        if rtt is not None and rtt > floor:
+            floor = min(rtt, max_interval)
+
+        if backlog:
+            interval = max(self.interval, floor) * _backoff
+        else:
+            interval = self.interval * _recover
+
+        if interval > max_interval:
+            interval = max_interval
+        elif interval < floor:
+            interval = floor
+
+        self.interval = interval
+
+        # the dispatcher wakes up every min_interval, allow for some jitter
+        self.m_next_send = now + interval - min_interval * 0.5
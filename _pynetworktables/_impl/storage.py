@@ -6,18 +6,26 @@
 # the project.
 # ----------------------------------------------------------------------------
 
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
 import os
+import struct
 import threading
 from time import monotonic
+import zlib
 
-from .message import Message
+from .message import EncodedAssignments, Message
 from .network_connection import NetworkConnection
 from .storage_load import load_entries
+from .storage_log import PersistentLog, is_log_filename
 from .storage_save import save_entries
 from .structs import EntryInfo, ConnectionInfo
 from .value import Value
+from .wire import WireCodec
 
+from .support import profiling
 from .support.lists import ensure_id_exists
+from .support.snapshot_dict import SnapshotDict
 
 from .constants import (
     kEntryAssign,
@@ -92,6 +100,7 @@ class _Entry(object):
 
         # python-specific: User-visible entry for optimized value retrieval
         # -> user_entry._value must always be set when self.value is set
+        # -> update_info must be called when the type or flags change
         self.user_entry = user_entry
 
         # python-specific: this is checked often, so don't recompute it
@@ -109,6 +118,16 @@ class _Entry(object):
     #     self._value = value
     #     self.user_entry._value = value
 
+    # python-specific
+    def update_info(self):
+        # the user entry's type and flags are read without the lock, so they
+        # are kept in an immutable record that is replaced when either changes
+        value = self.value
+        vtype = NT_UNASSIGNED if value is None else value.type
+        info = self.user_entry._info
+        if info.type != vtype or info.flags != self.flags:
+            self.user_entry._info = EntryInfo(self.name, vtype, self.flags)
+
     def increment_seqnum(self):
         self.seq_num += 1
         self.seq_num &= 0xFFFF
@@ -154,6 +173,31 @@ class _Entry(object):
         )
 
 
+# python-specific: read-only copies of the entries, used for bulk reads
+_SnapshotEntry = namedtuple(
+    "SnapshotEntry", ["name", "id", "seq_num", "value", "flags"]
+)
+_Snapshot = namedtuple("Snapshot", ["entries", "names"])
+
+# python-specific: the initial assignments encoded for a snapshot, and the
+# encoded assignment of each entry in it (by name)
+_Assignments = namedtuple("Assignments", ["snapshot", "parts", "message"])
+
+# python-specific: the (id, seq_num, flags, value hash) of an entry in the
+# state that a resuming client sends to the server
+_resumeState = struct.Struct(">HHBI")
+
+
+def _valueHash(value, codec):
+    # python-specific: a checksum of the type and wire encoding of a value.
+    # An assignment with the same sequence number but a different value is
+    # still accepted, so the sequence number alone doesn't tell whether a
+    # resuming client has the value that the server has.
+    out = []
+    codec.write_value(value, out)
+    return zlib.crc32(b"".join(out), ord(value.type))
+
+
 class Storage(object):
     def __init__(self, entry_notifier, rpc_server, user_entry_creator):
         self.m_notifier = entry_notifier
@@ -162,8 +206,30 @@ class Storage(object):
         # python-specific
         self.m_user_entry_creator = user_entry_creator
 
+        # python-specific: lock-free reads. Changes are made while holding
+        # m_mutex, but reads that only touch a single entry (its value,
+        # flags or name) don't take it. This is safe because entries are
+        # never removed from m_entries or m_localmap, and each attribute of
+        # an entry is replaced by a single assignment (values are immutable),
+        # so a reader sees either the old or the new state of an attribute.
         self.m_mutex = threading.Lock()
         self.m_entries = {}
+        # python-specific: sorted names of m_entries, for prefix queries
+        self.m_names = []
+        # python-specific: immutable copy of the entries for bulk reads. The
+        # entries changed while m_mutex is held are collected in m_changed,
+        # and handed to m_unpublished when it is released. A reader folds
+        # those into a new snapshot when it needs one, without taking
+        # m_mutex (see _getSnapshot).
+        self.m_snapshot = _Snapshot(SnapshotDict(), ())
+        self.m_changed = set()
+        self.m_unpublished = deque()
+        self.m_snapshot_mutex = threading.Lock()
+        # python-specific: encoded initial assignments for each protocol
+        # revision (see _getEncodedAssignments). This has its own lock, so
+        # that they aren't encoded while m_mutex is held.
+        self.m_assignments = {}
+        self.m_assignments_mutex = threading.Lock()
         self.m_idmap = []
         self.m_localmap = []
         self.m_rpc_results = {}
@@ -172,10 +238,17 @@ class Storage(object):
         # If any persistent values have changed
         self.m_persistent_dirty = False
 
+        # python-specific: binary log that persistent values are saved to,
+        # when the persistent filename is a log
+        self.m_persistent_log = None
+
         # condition variable and termination flag for blocking on a RPC result
         self.m_terminating = False
         self.m_rpc_results_cond = threading.Condition(self.m_mutex)
 
+        # python-specific
+        profiling.register_lock(self, "m_mutex", "storage.lock_wait")
+
         # configured by dispatcher at startup
         self.m_dispatcher = None
         self.m_server = True
@@ -235,6 +308,12 @@ class Storage(object):
         return outgoing
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        # python-specific: entries are only changed in here. They are queued
+        # for the next snapshot once all changes to them have been made.
+        changed = self.m_changed
+        if changed:
+            self.m_unpublished.extend(changed)
+            changed.clear()
         self.m_mutex.release()
         if exc_type is None:
             queue_outgoing = self.m_dispatcher_queue_outgoing
@@ -270,6 +349,7 @@ class Storage(object):
                 entry.flags = msg.flags
                 entry.isPersistent = (msg.flags & NT_PERSISTENT) != 0
                 entry.seq_num = msg.seq_num_uid
+                entry.update_info()
                 self._setEntryValueImpl(entry, msg.value, outgoing, False)
                 return
 
@@ -294,6 +374,7 @@ class Storage(object):
                 entry = self._getOrNew(name)
                 entry.id = msg_id
                 self.m_idmap[msg_id] = entry
+                self.m_changed.add(entry)
                 if entry.value is None:
                     # didn't exist at all (rather than just being a response to a
                     # id assignment request)
@@ -301,6 +382,7 @@ class Storage(object):
                     entry.flags = msg.flags
                     entry.isPersistent = (msg.flags & NT_PERSISTENT) != 0
                     entry.seq_num = msg.seq_num_uid
+                    entry.update_info()
 
                     # notify
                     self.m_notifier.notifyEntry(
@@ -359,6 +441,8 @@ class Storage(object):
         # update local
         entry.value = entry.user_entry._value = msg.value
         entry.seq_num = seq_num
+        entry.update_info()
+        self.m_changed.add(entry)
 
         # notify
         self.m_notifier.notifyEntry(entry.local_id, name, entry.value, notify_flags)
@@ -387,8 +471,14 @@ class Storage(object):
             return
 
         # update local
-        entry.value = entry.user_entry._value = msg.value
+        old_value = entry.value
+        value = entry.value = entry.user_entry._value = msg.value
         entry.seq_num = seq_num
+        self.m_changed.add(entry)
+
+        # python optimization: the type hardly ever changes in an update
+        if old_value is None or old_value.type != value.type:
+            entry.update_info()
 
         # update persistent dirty flag if it's a persistent value
         if entry.isPersistent:
@@ -494,14 +584,90 @@ class Storage(object):
     def getInitialAssignments(self, conn, msgs):
         with self.m_mutex:
             conn.set_state(NetworkConnection.State.kSynchronized)
-            for entry in self.m_entries.values():
-                if entry.value is None:
-                    continue
-                msgs.append(
-                    Message.entryAssign(
-                        entry.name, entry.id, entry.seq_num, entry.value, entry.flags
+            snapshot = self._getSnapshot()
+
+        # python-specific: the snapshot is consistent with the state change,
+        # so the messages can be encoded without holding the lock
+        if snapshot.entries:
+            msgs.append(self._getEncodedAssignments(snapshot, conn.get_proto_rev()))
+
+    # python-specific
+    def getResumedAssignments(self, conn, state, msgs):
+        """Like getInitialAssignments, but for a client that already has the
+        entries in `state` (see getResumeState): only entries that are new or
+        different are assigned, and entries in the state that no longer exist
+        are deleted. Returns False without doing anything if the state is
+        invalid."""
+        if len(state) % _resumeState.size:
+            return False
+
+        known = {
+            msg_id: (seq_num, flags, value_hash)
+            for msg_id, seq_num, flags, value_hash in _resumeState.iter_unpack(state)
+        }
+
+        with self.m_mutex:
+            conn.set_state(NetworkConnection.State.kSynchronized)
+            snapshot = self._getSnapshot()
+
+        codec = WireCodec(0x0300)
+        entryAssign = Message.entryAssign
+        assigns = []
+        for name, e in snapshot.entries.items():
+            k = known.pop(e.id, None)
+            if (
+                k is None
+                or k[0] != e.seq_num
+                or k[1] != e.flags
+                or k[2] != _valueHash(e.value, codec)
+            ):
+                assigns.append(entryAssign(name, e.id, e.seq_num, e.value, e.flags))
+
+        # ids are never reused, so the deletes can be sent before the assigns
+        for msg_id in sorted(known):
+            msgs.append(Message.entryDelete(msg_id))
+
+        msgs += assigns
+        return True
+
+    # python-specific
+    def _getEncodedAssignments(self, snapshot, proto_rev):
+        # Clients that connect with the same protocol revision are sent the
+        # same encoded assignments, until an entry changes. Then only the
+        # entries that changed are encoded again: entries that didn't change
+        # are the same objects in both snapshots.
+        with self.m_assignments_mutex:
+            cached = self.m_assignments.get(proto_rev)
+            if cached is not None:
+                if cached.snapshot is snapshot:
+                    return cached.message
+                parts = cached.parts
+                old_entries = cached.snapshot.entries
+            else:
+                parts = {}
+                old_entries = {}
+
+            entries = snapshot.entries
+            codec = WireCodec(proto_rev)
+            entryAssign = Message.entryAssign
+
+            for name in old_entries.keys() - entries.keys():
+                del parts[name]
+
+            for name, e in entries.items():
+                if old_entries.get(name) is not e:
+                    out = []
+                    entryAssign(name, e.id, e.seq_num, e.value, e.flags).write(
+                        out, codec
                     )
-                )
+                    parts[name] = b"".join(out)
+
+            # the previous message keeps its own bytes, so parts can be reused
+            message = EncodedAssignments(
+                proto_rev, b"".join(parts.values()), len(parts)
+            )
+            self.m_assignments[proto_rev] = _Assignments(snapshot, parts, message)
+            return message
 
     def applyInitialAssignments(self, conn, msgs, new_server, out_msgs):
         with self as update_msgs:
@@ -513,102 +679,208 @@ class Storage(object):
             # clear existing id's
             for entry in self.m_entries.values():
                 entry.id = 0xFFFF
+            self.m_changed.update(self.m_entries.values())
 
             # clear existing idmap
             del self.m_idmap[:]
 
             # apply assignments
+            self._applyAssignments(conn, msgs, update_msgs)
+
+            # delete or generate assign messages for unassigned local entries
+            self._deleteUnassignedEntries(out_msgs)
+
+    # python-specific
+    def applyResumedAssignments(self, conn, msgs, state, out_msgs):
+        """Like applyInitialAssignments, but the server only sent the entries
+        that are different from `state` (see getResumeState), and deletes for
+        the entries in it that it no longer has. The other entries keep their
+        ids and values, and aren't notified."""
+        with self as update_msgs:
+            if self.m_server:
+                return  # should not do this on server
+
+            conn.set_state(NetworkConnection.State.kSynchronized)
+
+            idmap = self.m_idmap
+            received = set()
+            assigns = []
+
             for msg in msgs:
-                if msg.type != kEntryAssign:
-                    logger.debug("client: received non-entry assignment request?")
+                if msg.type == kEntryDelete:
+                    msg_id = msg.id
+                    received.add(msg_id)
+                    if msg_id < len(idmap) and idmap[msg_id]:
+                        self._deleteEntryImpl(idmap[msg_id], None, False)
+                else:
+                    received.add(msg.id)
+                    assigns.append(msg)
+
+            self._applyAssignments(conn, assigns, update_msgs)
+
+            # The server has the rest of the entries in the state, but changes
+            # made to them here after the state was taken weren't sent to it
+            for msg_id, seq_num, flags, _ in _resumeState.iter_unpack(state):
+                if msg_id in received:
                     continue
+                received.add(msg_id)
 
-                msg_id = msg.id
-                if msg_id == 0xFFFF:
-                    logger.debug("client: received entry assignment request?")
+                entry = idmap[msg_id] if msg_id < len(idmap) else None
+                if entry is None:
+                    update_msgs.append((Message.entryDelete(msg_id), None, None))
                     continue
 
-                seq_num = msg.seq_num_uid
-                name = msg.str
+                if entry.seq_num != seq_num:
+                    update_msgs.append(
+                        (
+                            Message.entryUpdate(msg_id, entry.seq_num, entry.value),
+                            None,
+                            None,
+                        )
+                    )
+                if entry.flags != flags:
+                    update_msgs.append(
+                        (Message.flagsUpdate(msg_id, entry.flags), None, None)
+                    )
 
-                entry = self._getOrNew(name)
-                entry.seq_num = seq_num
-                entry.id = msg_id
+            # Entries written locally aren't in the state, so the server always
+            # sends them. If it didn't, it no longer has them.
+            for entry in idmap:
+                if entry is not None and entry.id not in received:
+                    idmap[entry.id] = None
+                    entry.id = 0xFFFF
 
-                if entry.value is None:
+            # delete or generate assign messages for unassigned local entries
+            self._deleteUnassignedEntries(out_msgs)
+
+    # python-specific
+    def getResumeState(self):
+        """Returns the (id, seq_num, flags, value hash) of each entry that was
+        assigned by the server and not written locally, packed for a kResume
+        message. If the server still has an entry with the same sequence
+        number, flags and value, it doesn't need to send it again when the
+        client reconnects."""
+        with self.m_mutex:
+            entries = [
+                (entry.id, entry.seq_num, entry.flags, entry.value)
+                for entry in self.m_idmap
+                if entry is not None
+                and not entry.local_write
+                and entry.value is not None
+            ]
+
+        # the values are hashed without holding the lock
+        codec = WireCodec(0x0300)
+        pack = _resumeState.pack
+        return b"".join(
+            [
+                pack(msg_id, seq_num, flags, _valueHash(value, codec))
+                for msg_id, seq_num, flags, value in entries
+            ]
+        )
+
+    def _applyAssignments(self, conn, msgs, update_msgs):
+        for msg in msgs:
+            if msg.type != kEntryAssign:
+                logger.debug("client: received non-entry assignment request?")
+                continue
+
+            msg_id = msg.id
+            if msg_id == 0xFFFF:
+                logger.debug("client: received entry assignment request?")
+                continue
+
+            seq_num = msg.seq_num_uid
+            name = msg.str
+
+            entry = self._getOrNew(name)
+
+            # python-specific: when resuming, the entry may have had another id
+            old_id = entry.id
+            if old_id != msg_id and old_id < len(self.m_idmap):
+                self.m_idmap[old_id] = None
+
+            entry.seq_num = seq_num
+            entry.id = msg_id
+            self.m_changed.add(entry)
+
+            if entry.value is None:
+                entry.value = entry.user_entry._value = msg.value
+                entry.flags = msg.flags
+                entry.isPersistent = (msg.flags & NT_PERSISTENT) != 0
+                entry.update_info()
+
+                # notify
+                self.m_notifier.notifyEntry(
+                    entry.local_id, name, entry.value, NT_NOTIFY_NEW
+                )
+            else:
+                # if we have written the value locally and the value is not persistent,
+                # then we don't update the local value and instead send it back to the
+                # server as an update message
+                if entry.local_write and not entry.isPersistent:
+                    entry.increment_seqnum()
+                    update_msgs.append(
+                        (
+                            Message.entryUpdate(entry.id, entry.seq_num, entry.value),
+                            None,
+                            None,
+                        )
+                    )
+                else:
                     entry.value = entry.user_entry._value = msg.value
-                    entry.flags = msg.flags
-                    entry.isPersistent = (msg.flags & NT_PERSISTENT) != 0
+                    notify_flags = NT_NOTIFY_UPDATE
+                    # don't update flags from a <3.0 remote (not part of message)
+                    if conn.get_proto_rev() >= 0x0300:
+                        if entry.flags != msg.flags:
+                            notify_flags |= NT_NOTIFY_FLAGS
+
+                        entry.flags = msg.flags
+                        entry.isPersistent = (msg.flags & NT_PERSISTENT) != 0
+
+                    entry.update_info()
 
                     # notify
                     self.m_notifier.notifyEntry(
-                        entry.local_id, name, entry.value, NT_NOTIFY_NEW
+                        entry.local_id, name, entry.value, notify_flags
                     )
-                else:
-                    # if we have written the value locally and the value is not persistent,
-                    # then we don't update the local value and instead send it back to the
-                    # server as an update message
-                    if entry.local_write and not entry.isPersistent:
-                        entry.increment_seqnum()
-                        update_msgs.append(
-                            (
-                                Message.entryUpdate(
-                                    entry.id, entry.seq_num, entry.value
-                                ),
-                                None,
-                                None,
-                            )
-                        )
-                    else:
-                        entry.value = entry.user_entry._value = msg.value
-                        notify_flags = NT_NOTIFY_UPDATE
-                        # don't update flags from a <3.0 remote (not part of message)
-                        if conn.get_proto_rev() >= 0x0300:
-                            if entry.flags != msg.flags:
-                                notify_flags |= NT_NOTIFY_FLAGS
-
-                            entry.flags = msg.flags
-                            entry.isPersistent = (msg.flags & NT_PERSISTENT) != 0
-
-                        # notify
-                        self.m_notifier.notifyEntry(
-                            entry.local_id, name, entry.value, notify_flags
-                        )
 
-                # save to idmap
-                ensure_id_exists(self.m_idmap, msg_id)
-                self.m_idmap[msg_id] = entry
+            # save to idmap
+            ensure_id_exists(self.m_idmap, msg_id)
+            self.m_idmap[msg_id] = entry
 
-            # delete or generate assign messages for unassigned local entries
-            def _shouldDelete(entry):
-                #  was assigned by the server, don't delete
-                if entry.id != 0xFFFF:
-                    return False
+    def _deleteUnassignedEntries(self, out_msgs):
+        def _shouldDelete(entry):
+            #  was assigned by the server, don't delete
+            if entry.id != 0xFFFF:
+                return False
 
-                # if we have written the value locally, we send an assign message to the
-                # server instead of deleting
-                if entry.local_write:
-                    out_msgs.append(
-                        Message.entryAssign(
-                            entry.name,
-                            entry.id,
-                            entry.seq_num,
-                            entry.value,
-                            entry.flags,
-                        )
+            # if we have written the value locally, we send an assign message to the
+            # server instead of deleting
+            if entry.local_write:
+                out_msgs.append(
+                    Message.entryAssign(
+                        entry.name, entry.id, entry.seq_num, entry.value, entry.flags
                     )
-                    return False
+                )
+                return False
 
-                # otherwise delete
-                return True
+            # otherwise delete
+            return True
 
-            self._deleteAllEntriesImpl(False, _shouldDelete)
+        self._deleteAllEntriesImpl(False, _shouldDelete)
 
     def getEntryValue(self, name):
+        # python-specific: lock-free
+        e = self.m_entries.get(name)
+        if e:
+            return e.value
+
+    def getEntryValuesByName(self, names):
+        # python-specific: gets several values while only taking the lock once
         with self.m_mutex:
-            e = self.m_entries.get(name)
-            if e:
-                return e.value
+            get = self.m_entries.get
+            return [e.value if e else None for e in map(get, names)]
 
     def setDefaultEntryValue(self, name, value):
         if not name:
@@ -674,6 +946,27 @@ class Storage(object):
             self._setEntryValueImpl(entry, value, outgoing, True)
             return True
 
+    def setEntryValuesByName(self, names, values):
+        # python-specific: sets several entries while only taking the lock
+        # once. Entries that have a different type are skipped.
+        ok = True
+        with self as outgoing:
+            getOrNew = self._getOrNew
+            setImpl = self._setEntryValueImpl
+
+            for name, value in zip(names, values):
+                if not name or value is None:
+                    continue
+
+                entry = getOrNew(name)
+                if entry.value is not None and entry.value.type != value.type:
+                    ok = False  # error on type mismatch
+                    continue
+
+                setImpl(entry, value, outgoing, True)
+
+        return ok
+
     def _setEntryValueImpl(self, entry, value, outgoing, local):
 
         if value is None:
@@ -681,6 +974,12 @@ class Storage(object):
 
         old_value = entry.value
         entry.value = entry.user_entry._value = value
+        self.m_changed.add(entry)
+
+        # python optimization: the type only changes when the entry is new
+        # (or when it is forced)
+        if old_value is None or old_value.type != value.type:
+            entry.update_info()
 
         # if we're the server, assign an id if it doesn't have one
         if self.m_server and entry.id == 0xFFFF:
@@ -777,6 +1076,8 @@ class Storage(object):
 
         entry.flags = flags
         entry.isPersistent = (flags & NT_PERSISTENT) != 0
+        entry.update_info()
+        self.m_changed.add(entry)
 
         # notify
         self.m_notifier.notifyEntry(
@@ -797,18 +1098,18 @@ class Storage(object):
             outgoing.append((Message.flagsUpdate(entry_id, flags), None, None))
 
     def getEntryFlags(self, name):
-        with self.m_mutex:
-            entry = self.m_entries.get(name)
-            return entry.flags if entry else 0
+        # python-specific: lock-free
+        entry = self.m_entries.get(name)
+        return entry.flags if entry else 0
 
     def getEntryFlagsById(self, local_id):
-        with self.m_mutex:
-            try:
-                entry = self.m_localmap[local_id]
-            except IndexError:
-                return 0
-            else:
-                return entry.flags
+        # python-specific: lock-free
+        try:
+            entry = self.m_localmap[local_id]
+        except IndexError:
+            return 0
+        else:
+            return entry.flags
 
     def deleteEntry(self, name):
         if not name:
@@ -842,6 +1143,7 @@ class Storage(object):
         entry.value = entry.user_entry._value = None
         entry.id = 0xFFFF
         entry.local_write = False
+        self.m_changed.add(entry)
 
         # Remove RPC if there was one
         if entry.rpc_uid is not None:
@@ -855,6 +1157,7 @@ class Storage(object):
         # reset flags
         entry.flags = 0
         entry.isPersistent = False
+        entry.update_info()
 
         if old_value is None:
             return  # was not previously assigned
@@ -896,6 +1199,8 @@ class Storage(object):
                 entry.id = 0xFFFF
                 entry.local_write = False
                 entry.value = entry.user_entry._value = None
+                entry.update_info()
+                self.m_changed.add(entry)
 
                 deleted = True
 
@@ -914,11 +1219,69 @@ class Storage(object):
         if not entry:
             local_id = len(self.m_localmap)
             user_entry = self.m_user_entry_creator(name, local_id)
+            user_entry._info = EntryInfo(name, NT_UNASSIGNED, 0)
             entry = _Entry(name, local_id, user_entry)
             self.m_entries[name] = entry
             self.m_localmap.append(entry)
+            insort(self.m_names, name)
         return entry
 
+    # python-specific
+    def _prefixEntries(self, prefix):
+        # entries are never removed from m_entries, so the sorted name
+        # index only needs to be updated when an entry is created. The names
+        # that start with prefix are a contiguous run of the index.
+        names = self.m_names
+        entries = self.m_entries
+        for i in range(bisect_left(names, prefix), len(names)):
+            name = names[i]
+            if not name.startswith(prefix):
+                break
+            yield entries[name]
+
+    # python-specific
+    def _getSnapshot(self):
+        # Returns a snapshot with every change made before the last time
+        # m_mutex was released. Writers only queue the entries that they
+        # changed, so a snapshot is made once for all of the changes since
+        # the last read, and only the entries that changed are copied out of
+        # storage. The rest are shared with the previous snapshot (which is
+        # never modified, as readers may still be using it).
+        #
+        # The entries are read without m_mutex, so a record may mix the old
+        # and new state of an entry that is being changed right now. That
+        # entry is queued again when the change is done, so a snapshot taken
+        # while holding m_mutex is always consistent.
+        unpublished = self.m_unpublished
+        if not unpublished:
+            return self.m_snapshot
+
+        with self.m_snapshot_mutex:
+            changes = {}
+            popleft = unpublished.popleft
+            for _ in range(len(unpublished)):
+                entry = popleft()
+                value = entry.value
+                if value is None:
+                    changes[entry.name] = None
+                else:
+                    changes[entry.name] = _SnapshotEntry(
+                        entry.name, entry.id, entry.seq_num, value, entry.flags
+                    )
+
+            snapshot = self.m_snapshot
+            entries = snapshot.entries.updated(changes)
+
+            # entries are never removed, so the names only change when one is
+            # added. The names are read after the queue, so they include all
+            # of the entries that were taken from it.
+            names = snapshot.names
+            if len(names) != len(self.m_names):
+                names = tuple(self.m_names)
+
+            self.m_snapshot = snapshot = _Snapshot(entries, names)
+            return snapshot
+
     # ntcore: getEntry
     def getEntryId(self, name):
         if name:
@@ -938,8 +1301,8 @@ class Storage(object):
         with self.m_mutex:
             entries = []
             types = types if isinstance(types, int) else ord(types)
-            for k, entry in self.m_entries.items():
-                if entry.value is None or not k.startswith(prefix):
+            for entry in self._prefixEntries(prefix):
+                if entry.value is None:
                     continue
                 if types != 0 and ((types & ord(entry.value.type)) == 0):
                     continue
@@ -947,41 +1310,41 @@ class Storage(object):
         return entries
 
     def getEntryInfoById(self, local_id):
-        with self.m_mutex:
-            try:
-                entry = self.m_localmap[local_id]
-            except IndexError:
-                return EntryInfo(None, NT_UNASSIGNED, 0)
-            else:
-                return EntryInfo(entry.name, entry.value.type, entry.flags)
+        # python-specific: lock-free, the record is replaced on every change
+        try:
+            entry = self.m_localmap[local_id]
+        except IndexError:
+            return EntryInfo(None, NT_UNASSIGNED, 0)
+        else:
+            return entry.user_entry._info
 
     def getEntryNameById(self, local_id):
-        with self.m_mutex:
-            try:
-                entry = self.m_localmap[local_id]
-            except IndexError:
-                return None
-            else:
-                return entry.name
+        # python-specific: lock-free
+        try:
+            entry = self.m_localmap[local_id]
+        except IndexError:
+            return None
+        else:
+            return entry.name
 
     def getEntryTypeById(self, local_id):
-        with self.m_mutex:
-            try:
-                entry = self.m_localmap[local_id]
-            except IndexError:
+        # python-specific: lock-free, the value is only read once
+        try:
+            value = self.m_localmap[local_id].value
+        except IndexError:
+            return NT_UNASSIGNED
+        else:
+            if value is None:
                 return NT_UNASSIGNED
-            else:
-                if entry.value is None:
-                    return NT_UNASSIGNED
-                return entry.value.type
+            return value.type
 
     def getEntryInfo(self, prefix, types):
         with self.m_mutex:
             infos = []
             types = types if isinstance(types, int) else ord(types)
-            for k, entry in self.m_entries.items():
+            for entry in self._prefixEntries(prefix):
                 value = entry.value
-                if value is None or not k.startswith(prefix):
+                if value is None:
                     continue
 
                 if types != 0 and (types & ord(value.type)) == 0:
@@ -997,12 +1360,29 @@ class Storage(object):
             uid = self.m_notifier.add(callback, prefix, flags)
             # perform immediate notifications
             if (flags & NT_NOTIFY_IMMEDIATE) != 0 and (flags & NT_NOTIFY_NEW) != 0:
-                for k, entry in self.m_entries.items():
-                    if entry.value is None or not k.startswith(prefix):
+                for entry in self._prefixEntries(prefix):
+                    if entry.value is None:
                         continue
                     self.m_notifier.notifyEntry(
                         entry.local_id,
-                        k,
+                        entry.name,
+                        entry.value,
+                        NT_NOTIFY_IMMEDIATE | NT_NOTIFY_NEW,
+                        uid,
+                    )
+        return uid
+
+    def addListenerBatch(self, prefix, callback, flags, collapse):
+        with self.m_mutex:
+            uid = self.m_notifier.addBatch(callback, prefix, flags, collapse)
+            # perform immediate notifications
+            if (flags & NT_NOTIFY_IMMEDIATE) != 0 and (flags & NT_NOTIFY_NEW) != 0:
+                for entry in self._prefixEntries(prefix):
+                    if entry.value is None:
+                        continue
+                    self.m_notifier.notifyEntry(
+                        entry.local_id,
+                        entry.name,
                         entry.value,
                         NT_NOTIFY_IMMEDIATE | NT_NOTIFY_NEW,
                         uid,
@@ -1035,12 +1415,12 @@ class Storage(object):
             uid = self.m_notifier.addPolled(poller_uid, prefix, flags)
             # perform immediate notifications
             if (flags & NT_NOTIFY_IMMEDIATE) != 0 and (flags & NT_NOTIFY_NEW) != 0:
-                for k, entry in self.m_entries.items():
-                    if entry.value is None or not k.startswith(prefix):
+                for entry in self._prefixEntries(prefix):
+                    if entry.value is None:
                         continue
                     self.m_notifier.notifyEntry(
                         entry.local_id,
-                        k,
+                        entry.name,
                         entry.value,
                         NT_NOTIFY_IMMEDIATE | NT_NOTIFY_NEW,
                         uid,
@@ -1069,18 +1449,18 @@ class Storage(object):
         return uid
 
     def _getPersistentEntries(self, periodic):
-        # copy values out of storage as quickly as possible so lock isn't held
         with self.m_mutex:
             if periodic and not self.m_persistent_dirty:
                 return False
 
             self.m_persistent_dirty = False
 
-            entries = [
-                (entry.name, entry.value)
-                for entry in self.m_entries.values()
-                if entry.value is not None and entry.isPersistent
-            ]
+        # python-specific: read from the snapshot so the lock isn't held
+        entries = [
+            (e.name, e.value)
+            for e in self._getSnapshot().entries.values()
+            if e.flags & NT_PERSISTENT
+        ]
 
         # sort in name order
         entries.sort()
@@ -1088,17 +1468,22 @@ class Storage(object):
 
     # ntcore: called getEntries
     def getEntryValues(self, prefix):
-        # copy values out of storage as quickly as possible so lock isn't held
-        with self.m_mutex:
-            entries = [
-                (entry.name, entry.value)
-                for entry in self.m_entries.values()
-                if entry.value is not None and entry.name.startswith(prefix)
-            ]
-
-        # sort in name order
-        entries.sort()
-        return entries
+        # python-specific: read from the snapshot so the lock isn't held
+        snapshot = self._getSnapshot()
+        names = snapshot.names
+        entries = snapshot.entries
+
+        values = []
+        for i in range(bisect_left(names, prefix), len(names)):
+            name = names[i]
+            if not name.startswith(prefix):
+                break
+            e = entries.get(name)
+            if e is not None:
+                values.append((name, e.value))
+
+        # already in name order
+        return values
 
     def createRpc(self, local_id, defn, rpc_uid):
         with self as outgoing:
@@ -1110,6 +1495,8 @@ class Storage(object):
             old_value = entry.value
             value = Value.makeRpc(defn)
             entry.value = entry.user_entry._value = value
+            entry.update_info()
+            self.m_changed.add(entry)
 
             # set up the RPC info
             entry.rpc_uid = rpc_uid
@@ -1234,7 +1621,17 @@ class Storage(object):
 
     def _loadFromFile(self, persistent, prefix, filename, fp):
         try:
-            if fp:
+            if not fp and is_log_filename(filename):
+                log = PersistentLog(filename)
+                entries = [
+                    (name, value)
+                    for name, value in log.load()
+                    if name.startswith(prefix)
+                ]
+                if persistent:
+                    # later saves append to this log
+                    self.m_persistent_log = log
+            elif fp:
                 entries = load_entries(fp, filename if filename else "<string>", prefix)
             else:
                 with open(filename, "r") as fp:
@@ -1254,10 +1651,12 @@ class Storage(object):
                 entry = self._getOrNew(name)
                 old_value = entry.value
                 entry.value = entry.user_entry._value = value
+                self.m_changed.add(entry)
                 was_persist = entry.isPersistent
                 if not was_persist and persistent:
                     entry.flags |= NT_PERSISTENT
                     entry.isPersistent = True
+                entry.update_info()
 
                 # if we're the server, an id if it doesn't have one
                 if self.m_server and entry.id == 0xFFFF:
@@ -1323,13 +1722,22 @@ class Storage(object):
         if entries == False:
             return
 
-        err = self._saveEntries(entries, filename, fp)
+        if not fp and is_log_filename(filename):
+            log = self.m_persistent_log
+            if log is None or log.m_filename != filename:
+                log = self.m_persistent_log = PersistentLog(filename)
+            err = log.save(entries)
+        else:
+            err = self._saveEntries(entries, filename, fp)
+
         if err and periodic:
             self.m_persistent_dirty = True
         return err
 
     def saveEntries(self, prefix, filename=None, fp=None):
         entries = self.getEntryValues(prefix)
+        if not fp and is_log_filename(filename):
+            return PersistentLog(filename).save(entries)
         return self._saveEntries(entries, filename, fp)
 
     def _saveEntries(self, entries, filename, fp):
@@ -0,0 +1,327 @@
+# novalidate
+"""
+    Binary persistent storage
+
+    Instead of rewriting the whole INI file each time a persistent value
+    changes, the values are kept in an append-only log. Each save appends
+    a record for every persistent entry that changed since the previous
+    save. Once the log holds many more records than there are entries,
+    it is compacted by writing a new log that holds only the current
+    values.
+
+    Layout of the file::
+
+        header:  magic (8 bytes)
+        record:  payload length (uint32 LE), crc32 of payload (uint32 LE), payload
+
+        payload: op (1 byte), name (uleb128 length + utf-8)
+                 op 's': value type (raw wire type, 1 byte), value
+                 op 'd': no value, the entry is no longer persistent
+
+    Values are encoded as they are on the wire (NT 3.0), except that the
+    length of arrays is stored as a uleb128 so that arrays with more than
+    255 elements are not truncated.
+
+    A record that was only partly written (e.g. power was lost during a
+    save) fails its length or checksum test. Loading stops there, and the
+    next save overwrites it.
+
+    Logs are used for any persistent filename that ends with LOG_EXTENSION.
+    INI files are still used for everything else.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from .constants import (
+    NT_BOOLEAN_ARRAY,
+    NT_DOUBLE_ARRAY,
+    NT_STRING_ARRAY,
+    NT_RAW2VTYPE,
+    NT_VTYPE2RAW,
+)
+from .support import leb128
+from .value import Value
+from .wire import WireCodec, _bool_arrays, _double_arrays, _pack_doubles
+
+import logging
+
+logger = logging.getLogger("nt")
+
+
+LOG_EXTENSION = ".ntlog"
+LOG_MAGIC = b"NTLOG\x00\x01\n"
+
+_record_header = struct.Struct("<II")
+
+_op_set = b"s"
+_op_delete = b"d"
+
+# a log is compacted once it holds this many more records than entries
+_COMPACT_SLACK = 256
+
+_codec = WireCodec(0x0300)
+
+
+class LogFormatError(IOError):
+    pass
+
+
+def is_log_filename(filename):
+    return filename is not None and filename.endswith(LOG_EXTENSION)
+
+
+class _Reader(object):
+    # implements the stream interface used by WireCodec, on top of a buffer
+
+    def __init__(self, buf):
+        self.m_buf = buf
+        self.m_pos = 0
+
+    def read(self, size):
+        pos = self.m_pos
+        end = pos + size
+        if end > len(self.m_buf):
+            raise LogFormatError("truncated record")
+        self.m_pos = end
+        return bytes(self.m_buf[pos:end])
+
+    def readStruct(self, s):
+        pos = self.m_pos
+        if pos + s.size > len(self.m_buf):
+            raise LogFormatError("truncated record")
+        self.m_pos = pos + s.size
+        return s.unpack_from(self.m_buf, pos)
+
+
+def _encode_value(value, out):
+    vtype = value.type
+    out.append(NT_VTYPE2RAW[vtype])
+
+    if vtype == NT_BOOLEAN_ARRAY:
+        a = value.value
+        out += (leb128.encode_uleb128(len(a)), _bool_arrays[len(a)].pack(*a))
+    elif vtype == NT_DOUBLE_ARRAY:
+        a = value.value
+        out += (leb128.encode_uleb128(len(a)), _pack_doubles(a, len(a)))
+    elif vtype == NT_STRING_ARRAY:
+        a = value.value
+        out.append(leb128.encode_uleb128(len(a)))
+        for s in a:
+            _codec.write_string(s, out)
+    else:
+        _codec.write_value(value, out)
+
+
+def _decode_value(rd):
+    vtype = NT_RAW2VTYPE.get(rd.read(1))
+    if vtype is None:
+        raise LogFormatError("invalid value type")
+
+    if vtype == NT_BOOLEAN_ARRAY:
+        alen = leb128.read_uleb128(rd)
+        return Value(vtype, rd.readStruct(_bool_arrays[alen]))
+    elif vtype == NT_DOUBLE_ARRAY:
+        alen = leb128.read_uleb128(rd)
+        return Value(vtype, rd.readStruct(_double_arrays[alen]))
+    elif vtype == NT_STRING_ARRAY:
+        alen = leb128.read_uleb128(rd)
+        return Value(vtype, tuple([_codec.read_string(rd) for _ in range(alen)]))
+    else:
+        return _codec.read_value(vtype, rd)
+
+
+def _encode_record(op, name, value, out):
+    payload = [op]
+    _codec.write_string(name, payload)
+    if value is not None:
+        _encode_value(value, payload)
+
+    payload = b"".join(payload)
+    out += (_record_header.pack(len(payload), zlib.crc32(payload)), payload)
+
+
+class PersistentLog(object):
+    def __init__(self, filename):
+        self.m_filename = filename
+
+        # the values that are currently stored in the log, and the encoded
+        # record of each one, which is reused when the log is compacted
+        self.m_values = {}
+        self.m_records_data = {}
+        # number of records in the log
+        self.m_records = 0
+        # end of the last valid record, None if the file must be rewritten
+        self.m_size = None
+
+        # saves can come from the dispatch thread and from the user
+        self.m_mutex = threading.Lock()
+
+    def load(self):
+        """Reads the log, returns a list of (name, Value) in name order.
+        Raises IOError if the file cannot be read"""
+        values = {}
+
+        with open(self.m_filename, "rb") as fp:
+            try:
+                buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be mapped
+                buf = b""
+
+            try:
+                if buf[: len(LOG_MAGIC)] != LOG_MAGIC:
+                    raise LogFormatError(
+                        "%s is not a NetworkTables log" % self.m_filename
+                    )
+
+                buflen = len(buf)
+                view = memoryview(buf)
+                try:
+                    records, size = self._loadRecords(view, values)
+                finally:
+                    view.release()
+            finally:
+                if isinstance(buf, mmap.mmap):
+                    buf.close()
+
+        if size != buflen:
+            logger.warning(
+                "%s: ignoring %d bytes of incomplete data at end of file",
+                self.m_filename,
+                buflen - size,
+            )
+
+        self.m_values = values
+        self.m_records = records
+        self.m_size = size
+
+        return sorted(values.items())
+
+    def _loadRecords(self, view, values):
+        # returns (number of records, end of the last valid record)
+        hsize = _record_header.size
+        end = len(view)
+        pos = len(LOG_MAGIC)
+        records = 0
+
+        while pos + hsize <= end:
+            plen, crc = _record_header.unpack_from(view, pos)
+            start = pos + hsize
+            if start + plen > end:
+                break
+
+            payload = view[start : start + plen]
+            if zlib.crc32(payload) != crc:
+                break
+
+            rd = _Reader(payload)
+            try:
+                op = rd.read(1)
+                name = _codec.read_string(rd)
+                if op == _op_set:
+                    values[name] = _decode_value(rd)
+                elif op == _op_delete:
+                    values.pop(name, None)
+                else:
+                    raise LogFormatError("invalid record type")
+            except (LogFormatError, struct.error, ValueError):
+                break
+
+            pos = start + plen
+            records += 1
+
+        return records, pos
+
+    def save(self, entries):
+        """Writes the changes between entries (a list of (name, Value)) and
+        the log. Returns an error string on failure"""
+        with self.m_mutex:
+            return self._save(entries)
+
+    def _save(self, entries):
+        values = self.m_values
+        records_data = self.m_records_data
+        current = dict(entries)
+        current_data = {}
+
+        out = []
+        changed = 0
+        for name, value in entries:
+            is_changed = values.get(name) != value
+
+            # values read by load() don't have their record kept yet
+            record = None if is_changed else records_data.get(name)
+            if record is None:
+                record = []
+                _encode_record(_op_set, name, value, record)
+                record = b"".join(record)
+
+            if is_changed:
+                out.append(record)
+                changed += 1
+            current_data[name] = record
+        for name in values:
+            if name not in current:
+                _encode_record(_op_delete, name, None, out)
+                changed += 1
+
+        if not changed and self.m_size is not None:
+            return
+
+        records = self.m_records + changed
+        if self.m_size is None or records > len(current) * 2 + _COMPACT_SLACK:
+            err = self._compact(entries, current_data)
+        else:
+            err = self._append(b"".join(out))
+            if not err:
+                self.m_records = records
+
+        if not err:
+            self.m_values = current
+            self.m_records_data = current_data
+        return err
+
+    def _append(self, data):
+        try:
+            with open(self.m_filename, "r+b") as fp:
+                # overwrite any incomplete record left by an earlier save
+                fp.seek(self.m_size)
+                fp.write(data)
+                fp.truncate()
+                fp.flush()
+                os.fsync(fp.fileno())
+        except IOError as e:
+            # unknown state, rewrite the file next time
+            self.m_size = None
+            return "Error writing file: %s" % e
+
+        self.m_size += len(data)
+
+    def _compact(self, entries, records_data):
+        out = [LOG_MAGIC]
+        for name, _ in entries:
+            out.append(records_data[name])
+        data = b"".join(out)
+
+        # same approach as the INI file: write a temporary file and
+        # rename it over the log
+        tmp = "%s.tmp" % self.m_filename
+        try:
+            with open(tmp, "wb") as fp:
+                fp.write(data)
+                fp.flush()
+                os.fsync(fp.fileno())
+        except IOError as e:
+            return "Error writing file: %s" % e
+
+        try:
+            os.replace(tmp, self.m_filename)
+        except OSError as e:
+            return "Could not rename temp file to real file: %s" % e
+
+        self.m_records = len(entries)
+        self.m_size = len(data)
@@ -29,6 +29,50 @@ ConnectionInfo = namedtuple('ConnectionInfo', [
 ])
 
 
+#: NetworkTables Connection Statistics (python-specific)
+ConnectionStats = namedtuple('ConnectionStats', [
+    # ConnectionInfo of the connection
+    'conn_info',
+
+    # Bytes received from and sent to the remote end
+    'bytes_read',
+    'bytes_written',
+
+    # Number of messages received and sent, dict keyed by message type name
+    'messages_read',
+    'messages_written',
+
+    # Number of messages waiting to be sent
+    'queue_depth',
+
+    # Number of messages queued to be sent, and the number of those that
+    # were replaced by a newer update to the same entry before being sent
+    'queued',
+    'coalesced',
+
+    # Seconds between posting the last batch of messages to the write
+    # thread and the write finishing (None if unknown)
+    'last_write_latency',
+
+    # Seconds it took to complete the handshake (None until complete)
+    'handshake_duration',
+
+    # Current send interval of the connection, 0 unless adaptive update
+    # rates are enabled
+    'send_interval',
+
+    # Whether the connection is over its outgoing budget, how many times
+    # it went over, and how many send cycles were held back because of it
+    'backpressured',
+    'backpressure_events',
+    'backpressure_skipped',
+
+    # Seconds the connection waited for its handshake to be started, because
+    # too many other handshakes were in progress (0 if it didn't wait)
+    'handshake_queue_time',
+])
+
+
 #: NetworkTables RPC Parameter Definition
 RpcParamDef = namedtuple('RpcParamDef', [
     'name',
@@ -0,0 +1,143 @@
+# novalidate
+
+from collections import OrderedDict
+
+from ..constants import (
+    kEntryAssign,
+    kEntryUpdate,
+    kFlagsUpdate,
+    kEntryDelete,
+    kClearEntries,
+)
+from ..message import Message
+
+
+# bits of a slot key that hold the entry id and the slot type
+_ID_BITS = 17
+
+
+class CoalescingQueue(object):
+    """
+    Outgoing messages of a connection that haven't been sent yet.
+
+    Assignments/updates and flags updates to the same entry id replace the
+    pending message for that id instead of being queued again, so only the
+    newest value of an entry is sent each cycle. Messages are kept in an
+    OrderedDict, so a replaced message keeps its original position:
+
+    * value messages are keyed by ``generation << 17 | id << 1``
+    * flags updates are keyed by ``generation << 17 | id << 1 | 1``
+    * other entry messages (deletes, clears, messages for unassigned ids) are
+      keyed by ``(generation, n)``
+    * all other messages are keyed by ``(None, n)``
+
+    A clear knocks out every pending entry message by starting a new
+    generation, and the messages of older generations are skipped when the
+    queue is drained.
+    """
+
+    def __init__(self):
+        self.m_pending = OrderedDict()
+        self.m_generation = 0
+        self.m_generation_base = 0
+        self.m_count = 0
+
+        #: number of messages queued in the cycle that was last drained
+        self.queued = 0
+        #: number of messages replaced or dropped in the current cycle
+        self.collapsed = 0
+
+    def __len__(self):
+        return len(self.m_pending)
+
+    def push(self, msg):
+        pending = self.m_pending
+        msgtype = msg.type
+
+        if msgtype == kEntryUpdate or msgtype == kEntryAssign:
+            msg_id = msg.id
+
+            # don't do this for unassigned id's
+            if msg_id != 0xFFFF:
+                key = (self.m_generation << _ID_BITS) | (msg_id << 1)
+                oldmsg = pending.get(key)
+                if oldmsg is not None:
+                    self.collapsed += 1
+                    if oldmsg.type == kEntryAssign and msgtype == kEntryUpdate:
+                        # need to update assignment with seq_num and value
+                        msg = Message.entryAssign(
+                            oldmsg.str,
+                            msg_id,
+                            msg.seq_num_uid,
+                            msg.value,
+                            oldmsg.flags,
+                        )
+
+                pending[key] = msg
+                return
+
+        elif msgtype == kFlagsUpdate:
+            msg_id = msg.id
+
+            # don't do this for unassigned id's
+            if msg_id != 0xFFFF:
+                key = (self.m_generation << _ID_BITS) | (msg_id << 1) | 1
+                if key in pending:
+                    self.collapsed += 1
+
+                pending[key] = msg
+                return
+
+        elif msgtype == kEntryDelete:
+            msg_id = msg.id
+
+            # clear previous updates
+            if msg_id != 0xFFFF:
+                key = (self.m_generation << _ID_BITS) | (msg_id << 1)
+                if pending.pop(key, None) is not None:
+                    self.collapsed += 1
+                if pending.pop(key | 1, None) is not None:
+                    self.collapsed += 1
+
+        elif msgtype == kClearEntries:
+            # knock out all previous assigns/updates!
+            self.m_generation += 1
+
+        else:
+            self.m_count += 1
+            pending[(None, self.m_count)] = msg
+            return
+
+        self.m_count += 1
+        pending[(self.m_generation, self.m_count)] = msg
+
+    def drain(self):
+        """Returns the pending messages in order, and empties the queue"""
+        pending = self.m_pending
+        generation = self.m_generation
+
+        if generation == self.m_generation_base:
+            msgs = list(pending.values())
+        else:
+            msgs = []
+            for key, msg in pending.items():
+                if key.__class__ is int:
+                    g = key >> _ID_BITS
+                else:
+                    g = key[0]
+
+                if g is None or g == generation:
+                    msgs.append(msg)
+                else:
+                    self.collapsed += 1
+            self.m_generation_base = generation
+
+        pending.clear()
+
+        # each message that was queued was either sent or collapsed
+        self.queued = len(msgs) + self.collapsed
+        return msgs
+
+    def resetCounts(self):
+        self.queued = 0
+        self.collapsed = 0
@@ -0,0 +1,218 @@
+# novalidate
+"""
+    Lightweight timing of the hot paths
+
+    Profiling is disabled by default. While it is enabled, the time spent
+    in the following places is recorded in histograms with power of two
+    buckets (in nanoseconds):
+
+    =========================== ============================================
+    storage.process_incoming    Storage.processIncoming, per message
+    storage.lock_wait           waiting to acquire Storage.m_mutex
+    dispatcher.lock_wait        waiting to acquire Dispatcher.m_user_mutex
+    dispatcher.handshake_queue  a server connection waiting for its turn to
+                                start the handshake (see setHandshakeLimits)
+    callback.<thread>           user callbacks run by a notifier thread
+    wire.encode                 encoding a batch of outgoing messages
+    wire.decode                 decoding a batch of incoming messages
+    =========================== ============================================
+
+    The histograms are shared by every NetworkTables instance in the
+    process. When profiling is disabled, the hot paths only check a flag
+    once per batch of messages or per notification, and the locks are
+    only wrapped while it is enabled.
+
+    Histograms are updated without a lock, so under heavy contention a
+    few samples may be lost.
+"""
+
+import threading
+import weakref
+
+try:
+    from time import perf_counter_ns
+except ImportError:
+    from time import perf_counter
+
+    def perf_counter_ns():
+        return int(perf_counter() * 1000000000)
+
+
+__all__ = [
+    "enabled",
+    "enable",
+    "histogram",
+    "timed",
+    "register_lock",
+    "get_stats",
+    "to_prometheus",
+    "reset",
+]
+
+#: True while profiling is enabled, checked by the hot paths
+enabled = False
+
+# bucket i holds the samples that are shorter than 2**i ns
+_NUM_BUCKETS = 64
+
+_histograms = {}
+_locks = []
+_mutex = threading.RLock()
+
+
+class Histogram(object):
+    __slots__ = ["counts", "count", "total", "max"]
+
+    def __init__(self):
+        self.counts = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        self.counts[ns.bit_length()] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+
+class _TimedLock(object):
+    # wraps a lock so that the time spent waiting for it is recorded
+
+    def __init__(self, lock, hist):
+        self.m_lock = lock
+        self.m_hist = hist
+        self.release = lock.release
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = perf_counter_ns()
+        rv = self.m_lock.acquire(blocking, timeout)
+        self.m_hist.record(perf_counter_ns() - start)
+        return rv
+
+    __enter__ = acquire
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.m_lock.release()
+
+
+def histogram(name):
+    """Returns the histogram called name, creating it if needed"""
+    hist = _histograms.get(name)
+    if hist is None:
+        with _mutex:
+            hist = _histograms.setdefault(name, Histogram())
+    return hist
+
+
+def timed(fn, name):
+    """Returns a function that calls fn and records how long it took"""
+    hist = histogram(name)
+
+    def _timed(*args):
+        start = perf_counter_ns()
+        try:
+            return fn(*args)
+        finally:
+            hist.record(perf_counter_ns() - start)
+
+    return _timed
+
+
+def _wrap_lock(owner, attr, name):
+    lock = getattr(owner, attr)
+    if not isinstance(lock, _TimedLock):
+        setattr(owner, attr, _TimedLock(lock, histogram(name)))
+
+
+def _unwrap_lock(owner, attr):
+    lock = getattr(owner, attr)
+    if isinstance(lock, _TimedLock):
+        setattr(owner, attr, lock.m_lock)
+
+
+def register_lock(owner, attr, name):
+    """Records the wait time of the lock stored in owner.attr in the
+    histogram called name, whenever profiling is enabled.
+
+    Swapping the attribute is safe while the lock is in use, since the
+    wrapper acquires and releases the same lock.
+    """
+    with _mutex:
+        _locks.append((weakref.ref(owner), attr, name))
+        if enabled:
+            _wrap_lock(owner, attr, name)
+
+
+def enable(on=True):
+    """Enables or disables profiling"""
+    global enabled
+
+    with _mutex:
+        enabled = on
+
+        alive = []
+        for ref, attr, name in _locks:
+            owner = ref()
+            if owner is None:
+                continue
+
+            alive.append((ref, attr, name))
+            if on:
+                _wrap_lock(owner, attr, name)
+            else:
+                _unwrap_lock(owner, attr)
+
+        _locks[:] = alive
+
+
+def reset():
+    """Throws away everything that was recorded so far"""
+    with _mutex:
+        for hist in _histograms.values():
+            hist.__init__()
+
+
+def get_stats():
+    """Returns a dict of histogram name to a dict with the number of
+    samples (count), their total and maximum (total_ns, max_ns), and the
+    number of samples in each bucket (buckets: a dict of bucket upper
+    bound in ns to count, empty buckets are left out)"""
+    stats = {}
+    for name, hist in sorted(_histograms.items()):
+        stats[name] = {
+            "count": hist.count,
+            "total_ns": hist.total,
+            "max_ns": hist.max,
+            "buckets": {1 << i: n for i, n in enumerate(hist.counts) if n},
+        }
+    return stats
+
+
+def to_prometheus(prefix="networktables"):
+    """Returns the histograms in the Prometheus text exposition format, as
+    a single metric with a ``path`` label per histogram"""
+    metric = "%s_duration_seconds" % prefix
+    lines = [
+        "# HELP %s Time spent in NetworkTables hot paths" % metric,
+        "# TYPE %s histogram" % metric,
+    ]
+
+    for name, hist in sorted(_histograms.items()):
+        counts = hist.counts
+        last = max([i for i, n in enumerate(counts) if n] or [0])
+
+        cumulative = 0
+        for i in range(last + 1):
+            cumulative += counts[i]
+            lines.append(
+                '%s_bucket{path="%s",le="%g"} %d'
+                % (metric, name, (1 << i) / 1e9, cumulative)
+            )
+
+        lines.append('%s_bucket{path="%s",le="+Inf"} %d' % (metric, name, hist.count))
+        lines.append('%s_sum{path="%s"} %.9f' % (metric, name, hist.total / 1e9))
+        lines.append('%s_count{path="%s"} %d' % (metric, name, hist.count))
+
+    return "\n".join(lines) + "\n"
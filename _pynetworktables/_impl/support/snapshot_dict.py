@@ -0,0 +1,93 @@
+# novalidate
+
+from collections.abc import Mapping
+
+
+class SnapshotDict(Mapping):
+    """
+    An immutable mapping that can be changed cheaply into a new one.
+
+    The items are spread over buckets by the hash of their key, and updated()
+    only copies the buckets that have a changed key in them. All of the other
+    buckets are shared with the old mapping, which is left as it was, so it
+    can still be read without a lock. The number of buckets grows with the
+    square root of the number of items, so a change costs O(sqrt(n)) instead
+    of the O(n) of copying a dict.
+    """
+
+    __slots__ = ("m_buckets", "m_mask", "m_len")
+
+    def __init__(self, items=()):
+        items = dict(items)
+        nbuckets = 1
+        while nbuckets * nbuckets < len(items):
+            nbuckets *= 2
+
+        buckets = [{} for _ in range(nbuckets)]
+        mask = nbuckets - 1
+        for key, value in items.items():
+            buckets[hash(key) & mask][key] = value
+
+        self.m_buckets = tuple(buckets)
+        self.m_mask = mask
+        self.m_len = len(items)
+
+    def __getitem__(self, key):
+        return self.m_buckets[hash(key) & self.m_mask][key]
+
+    def get(self, key, default=None):
+        return self.m_buckets[hash(key) & self.m_mask].get(key, default)
+
+    def __contains__(self, key):
+        return key in self.m_buckets[hash(key) & self.m_mask]
+
+    def __iter__(self):
+        for bucket in self.m_buckets:
+            yield from bucket
+
+    def __len__(self):
+        return self.m_len
+
+    def items(self):
+        for bucket in self.m_buckets:
+            yield from bucket.items()
+
+    def values(self):
+        for bucket in self.m_buckets:
+            yield from bucket.values()
+
+    def updated(self, changes):
+        """Returns a new SnapshotDict with the keys in the changes dict set to
+        their values, or removed if their value is None"""
+        if not changes:
+            return self
+
+        mask = self.m_mask
+        n = self.m_len
+        shared = self.m_buckets
+        buckets = list(shared)
+
+        for key, value in changes.items():
+            i = hash(key) & mask
+            bucket = buckets[i]
+            if bucket is shared[i]:
+                buckets[i] = bucket = bucket.copy()
+
+            if value is None:
+                if bucket.pop(key, None) is not None:
+                    n -= 1
+            else:
+                if key not in bucket:
+                    n += 1
+                bucket[key] = value
+
+        # rebuilding doubles the buckets, so it only happens every time the
+        # number of items has grown fourfold
+        if n > len(buckets) * len(buckets):
+            return SnapshotDict(item for b in buckets for item in b.items())
+
+        d = SnapshotDict.__new__(SnapshotDict)
+        d.m_buckets = tuple(buckets)
+        d.m_mask = mask
+        d.m_len = n
+        return d
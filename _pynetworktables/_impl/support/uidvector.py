@@ -8,11 +8,22 @@ class UidVector(dict):
         self.idx = 0
         self.lock = threading.Lock()
 
+        # python-specific: changes whenever an item is added or removed, so
+        # readers can tell when a cached copy is out of date
+        self.version = 0
+
     def add(self, item):
         """Only use this method to add to the UidVector"""
         with self.lock:
             idx = self.idx
             self.idx += 1
 
-        self[idx] = item
+            self[idx] = item
+            self.version += 1
         return idx
+
+    def pop(self, *args):
+        with self.lock:
+            item = dict.pop(self, *args)
+            self.version += 1
+        return item
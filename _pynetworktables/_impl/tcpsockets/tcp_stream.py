@@ -2,13 +2,56 @@
 
 import select
 import socket
+import struct
 import threading
 
+try:
+    import fcntl
+    import termios
+
+    _TIOCOUTQ = termios.TIOCOUTQ
+except (ImportError, AttributeError):
+    _TIOCOUTQ = None
+
+# Linux only: struct tcp_info, tcpi_rtt is in microseconds
+_TCP_INFO = getattr(socket, "TCP_INFO", None)
+_tcpi_rtt = struct.Struct("I")
+_tcpi_rtt_offset = 68
+_tcp_info_size = 104
+
+_outq = struct.Struct("i")
+
 
 class StreamEOF(IOError):
     pass
 
 
+def get_send_backlog(sd):
+    """Returns the number of bytes in the socket's send queue that the remote
+    end hasn't acknowledged yet, or None if the platform can't tell"""
+    if _TIOCOUTQ is None:
+        return None
+    try:
+        buf = fcntl.ioctl(sd.fileno(), _TIOCOUTQ, b"\0" * _outq.size)
+    except (OSError, ValueError):
+        return None
+    return _outq.unpack(buf)[0]
+
+
+def get_round_trip_time(sd):
+    """Returns the kernel's smoothed round trip time estimate of the socket
+    in seconds, or None if the platform can't tell"""
+    if _TCP_INFO is None:
+        return None
+    try:
+        info = sd.getsockopt(socket.IPPROTO_TCP, _TCP_INFO, _tcp_info_size)
+    except (OSError, ValueError):
+        return None
+    if len(info) < _tcpi_rtt_offset + _tcpi_rtt.size:
+        return None
+    return _tcpi_rtt.unpack_from(info, _tcpi_rtt_offset)[0] / 1000000.0
+
+
 class TCPStream(object):
     def __init__(self, sd, peer_ip, peer_port, sock_type):
 
@@ -43,6 +86,12 @@ class TCPStream(object):
             raise StreamEOF("end of file")
         return s.unpack(data)
 
+    def recv_into(self, buf):
+        n = self.m_sd.recv_into(buf)
+        if n == 0:
+            raise StreamEOF("end of file")
+        return n
+
     def send(self, contents):
         self.m_wrsock.write(contents)
         self.m_wrsock.flush()
@@ -67,6 +116,12 @@ class TCPStream(object):
     def setNoDelay(self):
         self.m_sd.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
+    def getSendBacklog(self):
+        return get_send_backlog(self.m_sd)
+
+    def getRoundTripTime(self):
+        return get_round_trip_time(self.m_sd)
+
     def _waitForReadEvent(self, timeout):
         r, _, _ = select.select((self.m_sd,), (), (), timeout)
         return len(r) > 0
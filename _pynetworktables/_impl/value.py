@@ -11,6 +11,7 @@
     more efficient.
 """
 
+from array import array
 from collections import namedtuple
 from .constants import (
     NT_BOOLEAN,
@@ -22,6 +23,7 @@ from .constants import (
     NT_STRING_ARRAY,
     NT_RPC,
 )
+from .double_array import DoubleArray, fromBuffer
 
 
 class Value(namedtuple("Value", ["type", "value"])):
@@ -54,6 +56,13 @@ class Value(namedtuple("Value", ["type", "value"])):
 
     @classmethod
     def makeDoubleArray(cls, value):
+        # python-specific: array.array and numpy arrays are stored compactly,
+        # without converting each element to a float object
+        if not isinstance(value, (tuple, list)):
+            compact = fromBuffer(value)
+            if compact is not None:
+                return cls(NT_DOUBLE_ARRAY, compact)
+
         return cls(NT_DOUBLE_ARRAY, tuple(float(v) for v in value))
 
     @classmethod
@@ -74,6 +83,8 @@ class Value(namedtuple("Value", ["type", "value"])):
             return cls.makeString
         elif isinstance(value, (bytes, bytearray)):
             return cls.makeRaw
+        elif isinstance(value, (array, DoubleArray)):
+            return cls.makeDoubleArray
 
         # Do best effort for arrays, but can't catch all cases
         # .. if you run into an error here, use a less generic type
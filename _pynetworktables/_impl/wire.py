@@ -19,6 +19,7 @@
 
 import logging
 import struct
+import sys
 
 from .constants import (
     NT_BOOLEAN,
@@ -31,6 +32,7 @@ from .constants import (
     NT_RPC,
 )
 
+from .double_array import DoubleArray
 from .support import leb128
 from .value import Value
 
@@ -48,6 +50,37 @@ _entryDelete = struct.Struct(">H")
 _clearEntries = struct.Struct(">I")
 _executeRpc = struct.Struct(">HH")
 _rpcResponse = struct.Struct(">HH")
+_resume = struct.Struct("B")
+
+
+class _ArrayStructs(dict):
+    """Caches a struct for each array length, so that entire arrays can be
+    packed and unpacked in a single call instead of per element"""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+
+    def __missing__(self, alen):
+        s = self[alen] = struct.Struct(self.fmt % alen)
+        return s
+
+
+_bool_arrays = _ArrayStructs("%d?")
+_double_arrays = _ArrayStructs(">%dd")
+
+_byteswap = sys.byteorder == "little"
+
+
+def _pack_doubles(a, alen):
+    # python optimization: the elements of a compact array are converted to
+    # network byte order all at once, instead of one at a time
+    if a.__class__ is DoubleArray:
+        b = a.m_array[:alen]
+        if _byteswap:
+            b.byteswap()
+        return b.tobytes()
+
+    return _double_arrays[alen].pack(*a[:alen])
 
 
 class WireCodec(object):
@@ -86,6 +119,7 @@ class WireCodec(object):
             self._del("clearEntries")
             self._del("executeRpc")
             self._del("rpcResponse")
+            self._del("resume")
 
         elif proto_rev == 0x0300:
             self.read_arraylen = self.read_arraylen_v2_v3
@@ -101,6 +135,7 @@ class WireCodec(object):
             self.clearEntries = _clearEntries
             self.executeRpc = _executeRpc
             self.rpcResponse = _rpcResponse
+            self.resume = _resume
 
         else:
             raise ValueError("Unsupported protocol")
@@ -119,17 +154,16 @@ class WireCodec(object):
         elif vtype == NT_STRING:
             return Value.makeString(self.read_string(rstream))
 
+        # python optimization: unpacked arrays are already tuples of the
+        # correct type, so bypass the per-element conversion in Value.make*
+
         elif vtype == NT_BOOLEAN_ARRAY:
             alen = self.read_arraylen(rstream)
-            return Value.makeBooleanArray(
-                [rstream.readStruct(self._bool_fmt)[0] for _ in range(alen)]
-            )
+            return Value(NT_BOOLEAN_ARRAY, rstream.readStruct(_bool_arrays[alen]))
 
         elif vtype == NT_DOUBLE_ARRAY:
             alen = self.read_arraylen(rstream)
-            return Value.makeDoubleArray(
-                [rstream.readStruct(self._double_fmt)[0] for _ in range(alen)]
-            )
+            return Value(NT_DOUBLE_ARRAY, rstream.readStruct(_double_arrays[alen]))
 
         elif vtype == NT_STRING_ARRAY:
             alen = self.read_arraylen(rstream)
@@ -163,13 +197,15 @@ class WireCodec(object):
             return
 
         elif vtype == NT_BOOLEAN_ARRAY:
-            alen = self.write_arraylen(v.value, out)
-            out += (self._bool_fmt.pack(v) for v in v.value[:alen])
+            a = v.value
+            alen = self.write_arraylen(a, out)
+            out.append(_bool_arrays[alen].pack(*a[:alen]))
             return
 
         elif vtype == NT_DOUBLE_ARRAY:
-            alen = self.write_arraylen(v.value, out)
-            out += (self._double_fmt.pack(v) for v in v.value[:alen])
+            a = v.value
+            alen = self.write_arraylen(a, out)
+            out.append(_pack_doubles(a, alen))
             return
 
         elif vtype == NT_STRING_ARRAY:
@@ -237,3 +273,12 @@ class WireCodec(object):
     def write_string_v3(self, s, out):
         s = s.encode("utf-8")
         out += (leb128.encode_uleb128(len(s)), s)
+
+    # python-specific: raw bytes, encoded like a raw value
+
+    def read_raw_v3(self, rstream):
+        slen = leb128.read_uleb128(rstream)
+        return rstream.read(slen)
+
+    def write_raw_v3(self, b, out):
+        out += (leb128.encode_uleb128(len(b)), b)
@@ -9,8 +9,10 @@ from ._impl.constants import (
     NT_DOUBLE_ARRAY,
     NT_STRING_ARRAY,
     NT_PERSISTENT,
+    NT_UNASSIGNED,
 )
 
+from ._impl.structs import EntryInfo
 from ._impl.value import Value
 
 __all__ = ["NetworkTableEntry"]
@@ -31,7 +33,7 @@ class NetworkTableEntry:
     .. versionadded:: 2018.0.0
     """
 
-    __slots__ = ["__api", "_local_id", "key", "_value"]
+    __slots__ = ["__api", "_local_id", "key", "_value", "_info"]
 
     def __init__(self, api, local_id, key):
         self.__api = api
@@ -40,13 +42,17 @@ class NetworkTableEntry:
         self.key = key
         self._value = None
 
+        # python-specific: the storage replaces this whenever the type or
+        # flags change, so the getters below don't need to lock it
+        self._info = EntryInfo(key, NT_UNASSIGNED, 0)
+
     def getHandle(self):
         """Gets the native handle for the entry"""
         return self._local_id
 
     def exists(self) -> bool:
         """Determines if the entry currently exists"""
-        return self.__api.getEntryTypeById(self._local_id) != 0
+        return self._info.type != NT_UNASSIGNED
 
     def getName(self) -> str:
         """Gets the name of the entry (the key)"""
@@ -57,14 +63,14 @@ class NetworkTableEntry:
 
         :rtype: :class:`.NetworkTablesInstance.EntryTypes`
         """
-        return self.__api.getEntryTypeById(self._local_id)
+        return self._info.type
 
     def getFlags(self) -> int:
         """Returns the flags.
 
         :returns: the flags (bitmask)
         """
-        return self.__api.getEntryFlagsById(self._local_id)
+        return self._info.flags
 
     def getInfo(self) -> tuple:
         """Gets combined information about the entry.
@@ -72,7 +78,7 @@ class NetworkTableEntry:
         :returns: Entry information
         :rtype: tuple of (name, type, flags)
         """
-        return self.__api.getEntryInfoById(self._local_id)
+        return self._info
 
     @property
     def value(self):
@@ -5,6 +5,7 @@ from weakref import WeakSet
 
 from ._impl import constants
 from ._impl.api import NtCoreApi
+from ._impl.numpy_support import array_view, doubles_to_ndarray, make_doubles
 
 from .entry import NetworkTableEntry
 from .table import NetworkTable
@@ -261,6 +262,50 @@ class NetworkTablesInstance:
     # Deprecated alias
     globalDeleteAll = deleteAllEntries
 
+    #
+    # Bulk numeric access (python-specific)
+    #
+
+    def putNumbers(self, keys: Sequence[str], values) -> bool:
+        """Sets several number entries at once, which is faster than setting
+        them one at a time.
+
+        :param keys: absolute paths of the keys
+        :param values: a sequence of numbers, ``array.array`` or NumPy array,
+                       with one value for each key
+        :returns: False if any of the keys exists with a different type (those
+                  keys are left unchanged)
+        """
+        values = make_doubles(values, len(keys))
+        return self._api.setEntryValuesByName(keys, values)
+
+    def getNumbers(self, keys: Sequence[str], defaultValue: float = float("nan")):
+        """Gets the values of several number entries at once. Requires NumPy.
+
+        :param keys: absolute paths of the keys
+        :param defaultValue: the value used for keys that don't exist or
+                             that aren't numbers
+        :returns: a NumPy array of float64, with one value for each key
+        """
+        values = self._api.getEntryValuesByName(keys)
+        return doubles_to_ndarray(values, defaultValue)
+
+    def getNumberArrayView(self, key: str, defaultValue=None):
+        """Gets the value of a number array entry as a read-only NumPy array.
+        Requires NumPy.
+
+        If the value was set from an ``array.array`` or a NumPy array, the
+        returned array shares its memory instead of copying it.
+
+        :param key: absolute path of the key
+        :param defaultValue: returned if the key doesn't exist or isn't a
+                             number array
+        """
+        value = self._api.getEntryValue(key)
+        if not value or value.type != constants.NT_DOUBLE_ARRAY:
+            return defaultValue
+        return array_view(value)
+
     def addEntryListener(
         self,
         listener: Callable[[str, Any, int], None],
@@ -341,14 +386,48 @@ class NetworkTablesInstance:
     addGlobalListener = addEntryListener
     addGlobalListenerEx = addEntryListenerEx
 
+    def addEntryListenerBatch(
+        self,
+        listener: Callable[[List[Tuple[str, Any, int]]], None],
+        flags: int,
+        prefix: str = "/",
+        collapse: bool = False,
+    ) -> None:
+        """Adds a listener that is called with a list of the changes to keys
+        starting with `prefix`, instead of once for each change. A list is
+        delivered each time the notifier thread has caught up with the
+        notifications that are queued, so a slow listener receives fewer,
+        larger lists instead of falling behind.
+
+        The listener is called from the NetworkTables I/O thread, and should
+        return as quickly as possible.
+
+        :param listener: A callable that has this signature: `callable(changes)`,
+                         where changes is a list of `(key, value, flags)`
+        :param flags: Bitmask of flags that indicate the types of notifications you wish to receive
+        :type flags: :class:`.NotifyFlags`
+        :param prefix: Only keys that start with this prefix are reported
+        :param collapse: If True, only the latest change to each key is in the
+                         list (the flags of the collapsed changes are combined)
+        """
+
+        def callback(items):
+            listener([(item[0], item[1].value, item[2]) for item in items])
+
+        uid = self._api.addEntryListenerBatch(prefix, callback, flags, collapse)
+        self._entry_listeners.setdefault(listener, []).append(uid)
+
     def removeEntryListener(self, listener: Callable[[str, Any, int], None]) -> None:
-        """Remove an entry listener.
+        """Remove an entry listener, including listeners added by
+        :meth:`addEntryListenerBatch`.
 
         :param listener: Listener to remove
 
         .. versionadded:: 2018.0.0
 
         """
+        for uid in self._entry_listeners.pop(listener, []):
+            self._api.removeEntryListener(uid)
         self.getTable("/").removeEntryListener(listener)
 
     # Deprecated alias
@@ -392,6 +471,24 @@ class NetworkTablesInstance:
         listener_id = self._api.addConnectionListener(cb, immediateNotify)
         self._conn_listeners.setdefault(listener, []).append(listener_id)
 
+    def addConnectionBackpressureListener(self, listener: Callable):
+        """Adds a listener that will be notified when a connection goes over
+        its outgoing budget (see :meth:`setOutgoingBudget`), and when it
+        catches up again.
+
+        The listener is called from a NetworkTables owned thread and should
+        return as quickly as possible.
+
+        :param listener: A function that will be called with two parameters
+        :type listener: fn(bool, ConnectionInfo)
+
+        Remove the listener with :meth:`removeConnectionListener`.
+        """
+        assert callable(listener)
+        cb = lambda info: listener(info.backpressured, info.conn_info)
+        listener_id = self._api.addConnectionBackpressureListener(cb)
+        self._conn_listeners.setdefault(listener, []).append(listener_id)
+
     def removeConnectionListener(self, listener: Callable):
         """Removes a connection listener
 
@@ -445,17 +542,25 @@ class NetworkTablesInstance:
         persistFilename: str = "networktables.ini",
         listenAddress: str = "",
         port: int = constants.NT_DEFAULT_PORT,
+        useAsyncio: bool = False,
     ):
         """Starts a server using the specified filename, listening address, and port.
 
-        :param persistFilename: the name of the persist file to use
+        :param persistFilename: the name of the persist file to use. If it
+                                ends with ``.ntlog``, persistent values are
+                                stored in a compact binary log that only
+                                has changes appended to it, instead of
+                                rewriting an INI file each time
         :param listenAddress: the address to listen on, or empty to listen on any
                               address
         :param port: port to communicate over
+        :param useAsyncio: if True, run all of the networking on a single asyncio
+                           event loop thread instead of using two threads per
+                           connection
 
         .. versionadded:: 2018.0.0
         """
-        return self._api.startServer(persistFilename, listenAddress, port)
+        return self._api.startServer(persistFilename, listenAddress, port, useAsyncio)
 
     def stopServer(self) -> None:
         """Stops the server if it is running.
@@ -467,29 +572,39 @@ class NetworkTablesInstance:
     def startClient(
         self,
         server_or_servers: Union[str, ServerPortPair, List[ServerPortPair], List[str]],
+        useAsyncio: bool = False,
     ):
         """Sets server addresses and port for client (without restarting client).
         The client will attempt to connect to each server in round robin fashion.
 
         :param server_or_servers: a string, a tuple of (server, port), array of
                                   (server, port), or an array of strings
+        :param useAsyncio: if True, run all of the networking on a single asyncio
+                           event loop thread
 
         .. versionadded:: 2018.0.0
         """
         self.setServer(server_or_servers)
-        return self._api.startClient()
+        return self._api.startClient(useAsyncio)
 
-    def startClientTeam(self, team: int, port: int = constants.NT_DEFAULT_PORT):
+    def startClientTeam(
+        self,
+        team: int,
+        port: int = constants.NT_DEFAULT_PORT,
+        useAsyncio: bool = False,
+    ):
         """Starts a client using commonly known robot addresses for the specified
         team.
 
         :param team: team number
         :param port: port to communicate over
+        :param useAsyncio: if True, run all of the networking on a single asyncio
+                           event loop thread
 
         .. versionadded:: 2018.0.0
         """
         self.setServerTeam(team, port)
-        return self._api.startClient()
+        return self._api.startClient(useAsyncio)
 
     def stopClient(self) -> None:
         """Stops the client if it is running.
@@ -546,7 +661,9 @@ class NetworkTablesInstance:
 
     setDashboardMode = startDSClient
 
-    def setUpdateRate(self, interval: float) -> None:
+    def setUpdateRate(
+        self, interval: float, maxInterval: Optional[float] = None
+    ) -> None:
         """Sets the period of time between writes to the network.
 
         WPILib's networktables and SmartDashboard default to 100ms, we have
@@ -554,15 +671,87 @@ class NetworkTablesInstance:
         this value too low, as it could potentially increase the volume of
         data sent over the network.
 
+        If `maxInterval` is larger than `interval`, each connection adapts
+        its own write period between the two: connections that can't keep
+        up (their earlier writes are still unacknowledged, or their round
+        trip time is longer than `interval`) are written to less often and
+        receive only the latest value of each key, while fast connections
+        keep being written to every `interval`.
+
         :param interval: Write flush period in seconds (default is 0.050,
                          or 50ms)
+        :param maxInterval: Longest write flush period in seconds that a
+                            slow connection may be given (default is
+                            `interval`, which disables adapting)
 
         .. warning:: If you don't know what this setting affects, don't mess
                      with it!
 
         .. versionadded:: 2017.0.0
         """
-        self._api.setUpdateRate(interval)
+        self._api.setUpdateRate(interval, maxInterval)
+
+    def setOutgoingBudget(
+        self, maxMessages: Optional[int] = 8192, maxBytes: Optional[int] = 1 << 20
+    ) -> None:
+        """Limits how much data may be waiting to be written to a single
+        connection.
+
+        When a remote end stops reading (or its network link can't keep up),
+        the updates sent to it are held back once more than `maxMessages`
+        messages or `maxBytes` bytes sent earlier are still waiting to be
+        written or acknowledged. Until the connection catches up, updates to
+        the same key replace each other, so the remote end receives only the
+        latest value of each key and memory use stays bounded.
+
+        :param maxMessages: Message limit, or None for no limit
+        :param maxBytes: Byte limit, or None for no limit
+
+        .. note:: The byte limit counts data in the operating system's send
+                  buffer only on Linux
+        """
+        self._api.setOutgoingBudget(maxMessages, maxBytes)
+
+    def setHandshakeLimits(
+        self, maxHandshakes: Optional[int] = 16, maxPending: Optional[int] = 256
+    ) -> None:
+        """Limits how many clients a server connects at the same time.
+
+        When many clients connect at once (for example, after the network
+        drops out), only `maxHandshakes` of them are sent the initial
+        entries at a time. The next `maxPending` clients wait in the order
+        that they connected, and any more are disconnected (they will try
+        to connect again). This keeps the server responsive to the clients
+        that are already connected.
+
+        The time that a client waited is reported in
+        :meth:`getConnectionStats` as ``handshake_queue_time``.
+
+        :param maxHandshakes: Number of handshakes in progress at once, or
+                              None for no limit
+        :param maxPending: Number of clients that may wait, or None for no
+                           limit
+
+        .. note:: Only used by servers
+        """
+        self._api.setHandshakeLimits(maxHandshakes, maxPending)
+
+    def enableResume(self, enabled: bool = True) -> None:
+        """Enables or disables resuming the session when a client reconnects.
+
+        Normally a client that reconnects is sent every entry again, and
+        notifies listeners of all of them. With this enabled, a client that
+        reconnects to the same pynetworktables server tells it which entries
+        it already has, and the server only sends the entries that were
+        added, changed or deleted while the client was disconnected.
+
+        Servers that aren't pynetworktables (or are an older version) don't
+        support this, and the client connects to them normally.
+
+        .. note:: Only used by clients. pynetworktables servers always
+                  support it.
+        """
+        self._api.setResumeEnabled(enabled)
 
     def flush(self) -> None:
         """Flushes all updated values immediately to the network.
@@ -586,6 +775,19 @@ class NetworkTablesInstance:
         """
         return self._api.getConnections()
 
+    def getConnectionStats(self) -> Sequence:
+        """Gets statistics of the currently established network connections,
+        such as the number of bytes and messages sent and received, and how
+        many messages are waiting to be sent. Useful for finding out which
+        connection is saturating the network.
+
+        The statistics are always kept, this only copies them.
+
+        :returns: list of ConnectionStats namedtuples
+        :rtype: list
+        """
+        return self._api.getConnectionStats()
+
     def getRemoteAddress(self) -> Optional[str]:
         """
         Only returns a valid address if connected to the server. If
@@ -607,7 +809,9 @@ class NetworkTablesInstance:
     def savePersistent(self, filename: str):
         """Saves persistent keys to a file. The server does this automatically.
 
-        :param filename: Name of file to save keys to
+        :param filename: Name of file to save keys to. Files ending with
+                         ``.ntlog`` use the binary log format, all others
+                         are INI files
 
         :returns: None if success, or a string describing the error on failure
 
@@ -713,6 +917,40 @@ class NetworkTablesInstance:
         """
         self._api.setVerboseLogging(True)
 
+    def enableProfiling(self, enabled: bool = True) -> None:
+        """Enables or disables timing of the NetworkTables hot paths: storage
+        updates from the network, waiting for the storage and dispatcher
+        locks, listener callbacks, and message encoding/decoding.
+
+        Unlike verbose logging, profiling is cheap enough to turn on in a
+        running robot to see where time is spent. It can be switched on and
+        off at any time.
+
+        .. note:: The profile is shared by all NetworkTables instances in
+                  the process
+        """
+        self._api.setProfiling(enabled)
+
+    def getProfile(self) -> dict:
+        """Returns what was recorded while profiling was enabled.
+
+        :returns: dict of hot path name to a dict with the number of samples
+                  (``count``), their total and maximum duration in
+                  nanoseconds (``total_ns``, ``max_ns``), and a histogram
+                  of the durations (``buckets``, a dict of bucket upper
+                  bound in nanoseconds to number of samples)
+        """
+        return self._api.getProfile()
+
+    def getProfileText(self) -> str:
+        """Returns what was recorded while profiling was enabled, as
+        Prometheus-style histograms (text exposition format)"""
+        return self._api.getProfileText()
+
+    def resetProfile(self) -> None:
+        """Throws away everything that was recorded while profiling"""
+        self._api.resetProfile()
+
     def getGlobalTable(self) -> NetworkTable:
         """Returns an object that allows you to write values to absolute
         NetworkTable keys (which are paths with / separators).
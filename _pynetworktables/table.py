@@ -619,6 +619,45 @@ class NetworkTable:
 
         return value.value
 
+    def putNumbers(self, keys: Sequence[str], values) -> bool:
+        """Puts several numbers in the table at once, which is faster than
+        putting them one at a time.
+
+        :param keys: the keys to be assigned to
+        :param values: a sequence of numbers, ``array.array`` or NumPy array,
+                       with one value for each key
+
+        :returns: False if any of the keys already exists with a different
+                  type (those keys are left unchanged)
+        """
+        path = self._path
+        return self._inst.putNumbers([path + key for key in keys], values)
+
+    def getNumbers(self, keys: Sequence[str], defaultValue: float = float("nan")):
+        """Gets several numbers from the table at once. Requires NumPy.
+
+        :param keys: the keys to look up
+        :param defaultValue: the value used for keys that don't exist or that
+                             aren't numbers
+
+        :returns: a NumPy array of float64, with one value for each key
+        """
+        path = self._path
+        return self._inst.getNumbers([path + key for key in keys], defaultValue)
+
+    def getNumberArrayView(self, key: str, defaultValue=None):
+        """Returns the number array the key maps to as a read-only NumPy
+        array. If the key does not exist or is of different type, it will
+        return the default value. Requires NumPy.
+
+        If the value was put from an ``array.array`` or a NumPy array, the
+        returned array shares its memory instead of copying it.
+
+        :param key: the key to look up
+        :param defaultValue: the value to be returned if no value is found
+        """
+        return self._inst.getNumberArrayView(self._path + key, defaultValue)
+
     def putStringArray(self, key: str, value: Sequence[str]) -> bool:
         """Put a string array in the table
 
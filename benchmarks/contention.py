@@ -0,0 +1,72 @@
+"""
+    Benchmarks of user threads reading entries while the storage is busy
+"""
+
+import threading
+import time
+
+from harness import benchmark, live, rate
+
+
+@benchmark("read_contention")
+def read_contention(config):
+    """A server reading the type, flags and value of many entries in a loop
+    (as robot code does), while a client floods it with updates to the same
+    entries. 'reads' counts entries read, 'lock' is how often the storage
+    lock was taken and how long was spent waiting for it, per second"""
+    duration = config.scale(5.0, 1.0)
+    keys = ["/bench/contention/%d" % i for i in range(200)]
+
+    with live(config) as (server, (client,)):
+        centries = [client.getEntry(key) for key in keys]
+        for entry in centries:
+            entry.setDouble(0)
+        client.flush()
+
+        sentries = [server.getEntry(key) for key in keys]
+        deadline = time.monotonic() + 10
+        while not all(entry.exists() for entry in sentries):
+            if time.monotonic() > deadline:
+                raise RuntimeError("timed out")
+            time.sleep(0.01)
+
+        stop = threading.Event()
+
+        def _write():
+            value = 0
+            while not stop.is_set():
+                value += 1
+                for entry in centries:
+                    entry.setDouble(value)
+                client.flush()
+                # leave the GIL to the other threads now and then
+                time.sleep(0.001)
+
+        writer = threading.Thread(target=_write, name="contention-writer")
+        writer.start()
+
+        server.resetProfile()
+        server.enableProfiling()
+        try:
+            reads = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < duration:
+                for entry in sentries:
+                    entry.getType()
+                    entry.getFlags()
+                    entry.value
+                reads += len(sentries)
+            elapsed = time.perf_counter() - start
+        finally:
+            server.enableProfiling(False)
+            stop.set()
+            writer.join()
+
+        lock = server.getProfile().get("storage.lock_wait", {})
+        server.resetProfile()
+
+    return {
+        "reads": rate(reads, elapsed, "entries/s"),
+        "lock": rate(lock.get("count", 0), elapsed, "acquisitions/s"),
+        "lock_wait": rate(lock.get("total_ns", 0) / 1e9, elapsed, "s/s"),
+    }
@@ -0,0 +1,167 @@
+"""
+    Shared helpers for the benchmark suite: starting servers and clients
+    over loopback in the current process, waiting for values to arrive,
+    and summarizing timings.
+"""
+
+import contextlib
+import os
+import sys
+import threading
+import time
+
+# allow running from a source checkout without installing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _pynetworktables import NetworkTablesInstance  # noqa: E402
+
+#: benchmark name -> function(config) returning a dict of results
+BENCHMARKS = {}
+
+
+class Config(object):
+    """Options that every benchmark receives"""
+
+    def __init__(self, quick=False, use_asyncio=False, tmpdir=None):
+        #: run fewer iterations and smaller tables
+        self.quick = quick
+        #: use the asyncio network engine instead of threads
+        self.use_asyncio = use_asyncio
+        #: where benchmarks may create files
+        self.tmpdir = tmpdir
+
+    def scale(self, full, quick):
+        return quick if self.quick else full
+
+
+def benchmark(name):
+    """Registers a benchmark function"""
+
+    def _register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+
+    return _register
+
+
+def summarize(samples, unit="s"):
+    """Returns the statistics of a list of timings"""
+    samples = sorted(samples)
+    n = len(samples)
+
+    def _pct(p):
+        return samples[min(n - 1, int(p * n))]
+
+    return {
+        "unit": unit,
+        "samples": n,
+        "min": samples[0],
+        "mean": sum(samples) / n,
+        "median": _pct(0.5),
+        "p90": _pct(0.9),
+        "p99": _pct(0.99),
+        "max": samples[-1],
+    }
+
+
+def rate(count, elapsed, unit):
+    return {"unit": unit, "value": count / elapsed, "count": count, "elapsed": elapsed}
+
+
+def start_server(config, persist_filename=None, update_rate=0.01):
+    server = NetworkTablesInstance.create()
+    server.setUpdateRate(update_rate)
+    server.startServer(
+        persistFilename=persist_filename,
+        listenAddress="127.0.0.1",
+        port=0,
+        useAsyncio=config.use_asyncio,
+    )
+
+    if not server._api.dispatcher.m_server_acceptor.waitForStart(timeout=5):
+        raise RuntimeError("server did not start")
+
+    return server
+
+
+def server_port(server):
+    return server._api.dispatcher.m_server_acceptor.m_port
+
+
+def start_client(config, server, identity="bench", update_rate=0.01, wait=True):
+    """Starts a client connected to server. If wait is True, returns once
+    the client is connected (that is, once the initial entries have been
+    received)"""
+    client = NetworkTablesInstance.create()
+    client.setUpdateRate(update_rate)
+    client.setNetworkIdentity(identity)
+
+    connected = threading.Event()
+    client.addConnectionListener(
+        lambda is_connected, info: is_connected and connected.set(),
+        immediateNotify=True,
+    )
+
+    server_addr = ("127.0.0.1", server_port(server))
+    client.startClient(server_addr, useAsyncio=config.use_asyncio)
+    if wait and not connected.wait(30):
+        raise RuntimeError("client did not connect")
+
+    return client
+
+
+@contextlib.contextmanager
+def live(config, clients=1, **kwargs):
+    """Yields a server and a list of connected clients, and shuts them all
+    down afterwards"""
+    server = start_server(config, **kwargs)
+    started = [server]
+    try:
+        conns = []
+        for i in range(clients):
+            conns.append(start_client(config, server, "bench%d" % i))
+            started.append(conns[-1])
+        yield server, conns
+    finally:
+        for inst in reversed(started):
+            inst.shutdown()
+
+
+class ValueWaiter(object):
+    """Counts the updates to a key on an instance, and lets the caller
+    wait for a particular value to arrive"""
+
+    def __init__(self, inst, key):
+        self.m_cond = threading.Condition()
+        self.value = None
+        self.updates = 0
+
+        inst.getEntry(key).addListener(
+            self._on_update,
+            NetworkTablesInstance.NotifyFlags.NEW
+            | NetworkTablesInstance.NotifyFlags.UPDATE,
+        )
+
+    def _on_update(self, entry, key, value, param):
+        with self.m_cond:
+            self.value = value
+            self.updates += 1
+            self.m_cond.notify_all()
+
+    def wait(self, value, timeout=10):
+        with self.m_cond:
+            if not self.m_cond.wait_for(lambda: self.value == value, timeout):
+                raise RuntimeError("timed out waiting for %r" % (value,))
+
+
+def flush(inst, last_flush):
+    """Flushes inst, first waiting long enough that the dispatcher doesn't
+    ignore the flush (flushes are limited to one every 10 ms). last_flush
+    is the time returned by the previous call"""
+    delay = last_flush + 0.011 - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+    start = time.perf_counter()
+    inst.flush()
+    return start
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+    Microbenchmarks of the wire codec: Message, WireCodec, Value and leb128
+
+    Encodes and decodes synthetic streams of every message type and value
+    type at protocol revisions 0x0200 and 0x0300, and reports the time and
+    allocations per message. Nothing touches the network.
+
+    Save the results of the code before a change as the baseline::
+
+        python3 benchmarks/micro.py --save-baseline
+
+    Then run them again after the change and compare against the baseline,
+    exiting with status 1 if anything regressed past the thresholds::
+
+        python3 benchmarks/micro.py
+
+    Timings are the best of several repeats. Allocations are the memory
+    blocks that are still alive when an operation returns, counted with
+    tracemalloc (the encoded parts or the decoded messages); temporaries
+    that are freed during the operation are not counted. Timings depend on
+    the machine, so the baseline (benchmarks/micro_baseline.json by default)
+    is ignored by git and has to be saved on the machine that runs the
+    comparison.
+"""
+
+import argparse
+from array import array
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import harness  # noqa: F401 (sets up sys.path)
+
+from _pynetworktables._impl.constants import (
+    NT_BOOLEAN,
+    NT_DOUBLE,
+    NT_STRING,
+    NT_RAW,
+    NT_BOOLEAN_ARRAY,
+    NT_DOUBLE_ARRAY,
+    NT_STRING_ARRAY,
+    NT_RPC,
+)
+from _pynetworktables._impl.frame_decoder import FrameDecoder
+from _pynetworktables._impl.message import Message
+from _pynetworktables._impl.support import leb128
+from _pynetworktables._impl.value import Value
+from _pynetworktables._impl.wire import WireCodec
+
+BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json"
+)
+
+#: a result regresses if its time per message grows by more than this ratio
+DEFAULT_TIME_THRESHOLD = 1.3
+
+#: ... or if it allocates more than this many extra blocks per message
+DEFAULT_ALLOC_THRESHOLD = 0.5
+
+# value type -> (name, function(i) returning a value), and the first
+# protocol revision that supports the type
+_VALUES = [
+    (NT_BOOLEAN, "boolean", lambda i: Value.makeBoolean(i & 1), 0x0200),
+    (NT_DOUBLE, "double", lambda i: Value.makeDouble(i * 0.5), 0x0200),
+    (NT_STRING, "string", lambda i: Value.makeString("value-%d" % i), 0x0200),
+    (
+        NT_BOOLEAN_ARRAY,
+        "boolean_array",
+        lambda i: Value.makeBooleanArray([(i + j) & 1 for j in range(16)]),
+        0x0200,
+    ),
+    (
+        NT_DOUBLE_ARRAY,
+        "double_array",
+        lambda i: Value.makeDoubleArray([i + j for j in range(16)]),
+        0x0200,
+    ),
+    (
+        NT_DOUBLE_ARRAY,
+        "double_array_compact",
+        lambda i: Value.makeDoubleArray(array("d", range(i, i + 16))),
+        0x0200,
+    ),
+    (
+        NT_STRING_ARRAY,
+        "string_array",
+        lambda i: Value.makeStringArray(["s%d-%d" % (i, j) for j in range(16)]),
+        0x0200,
+    ),
+    (NT_RAW, "raw", lambda i: Value.makeRaw(b"raw-%d" % i * 4), 0x0300),
+    (NT_RPC, "rpc", lambda i: Value.makeRpc("rpc-definition-%d" % i), 0x0300),
+]
+
+# name -> (function(i) returning a message, first protocol revision that
+# supports the message type)
+_MESSAGES = [
+    ("keepAlive", lambda i: Message.keepAlive(), 0x0200),
+    ("clientHello", None, 0x0200),
+    ("protoUnsup", lambda i: Message.protoUnsup(0x0300), 0x0200),
+    ("serverHelloDone", lambda i: Message.serverHelloDone(), 0x0200),
+    ("clientHelloDone", lambda i: Message.clientHelloDone(), 0x0200),
+    ("serverHello", lambda i: Message.serverHello(1, "server-%d" % i), 0x0300),
+    ("flagsUpdate", lambda i: Message.flagsUpdate(i, 1), 0x0300),
+    ("entryDelete", lambda i: Message.entryDelete(i), 0x0300),
+    ("clearEntries", lambda i: Message.clearEntries(), 0x0300),
+    ("executeRpc", lambda i: Message.executeRpc(i, i, "params-%d" % i), 0x0300),
+    ("rpcResponse", lambda i: Message.rpcResponse(i, i, "result-%d" % i), 0x0300),
+]
+
+
+class Case(object):
+    """A stream of messages of a single kind, at one protocol revision"""
+
+    def __init__(self, name, proto_rev, msgs, entry_type=None):
+        self.name = name
+        self.proto_rev = proto_rev
+        self.msgs = msgs
+        # NT2 entry updates are decoded using the type of the entry
+        self.get_entry_type = lambda msg_id: entry_type
+
+        self.data = b"".join(self.encode())
+
+    def encode(self):
+        # returns the parts written by the messages, which the network
+        # writers join once per batch
+        out = []
+        codec = WireCodec(self.proto_rev)
+        for msg in self.msgs:
+            msg.write(out, codec)
+        return out
+
+    def decode(self):
+        count = len(self.msgs)
+        decoder = FrameDecoder(
+            None,
+            WireCodec(self.proto_rev),
+            self.get_entry_type,
+            bufsize=len(self.data),
+        )
+        decoder.feed(self.data)
+
+        msgs = decoder.parseMessages()
+        while len(msgs) < count:
+            msgs += decoder.parseMessages()
+        return msgs
+
+
+def _message_cases(proto_rev, count):
+    for name, make, min_rev in _MESSAGES:
+        if proto_rev < min_rev:
+            continue
+
+        if name == "clientHello":
+            msgs = [
+                Message.clientHello(proto_rev, "client-%d" % i) for i in range(count)
+            ]
+        else:
+            msgs = [make(i) for i in range(count)]
+        yield Case(name, proto_rev, msgs)
+
+    for vtype, vname, make, min_rev in _VALUES:
+        if proto_rev < min_rev:
+            continue
+
+        values = [make(i) for i in range(count)]
+        yield Case(
+            "entryAssign.%s" % vname,
+            proto_rev,
+            [
+                Message.entryAssign("/bench/entry/%d" % i, i, 1, value, 0)
+                for i, value in enumerate(values)
+            ],
+        )
+
+        if vtype != NT_RPC:
+            yield Case(
+                "entryUpdate.%s" % vname,
+                proto_rev,
+                [Message.entryUpdate(i, 2, value) for i, value in enumerate(values)],
+                vtype,
+            )
+
+
+def _value_ops(count):
+    # yields (name, function that performs count operations)
+    inputs = {
+        "makeBoolean": (Value.makeBoolean, [bool(i & 1) for i in range(count)]),
+        "makeDouble": (Value.makeDouble, [i * 0.5 for i in range(count)]),
+        "makeString": (Value.makeString, ["value-%d" % i for i in range(count)]),
+        "makeRaw": (Value.makeRaw, [b"raw-%d" % i for i in range(count)]),
+        "makeBooleanArray": (
+            Value.makeBooleanArray,
+            [[(i + j) & 1 == 1 for j in range(16)] for i in range(count)],
+        ),
+        "makeDoubleArray": (
+            Value.makeDoubleArray,
+            [[float(i + j) for j in range(16)] for i in range(count)],
+        ),
+        "makeDoubleArrayCompact": (
+            Value.makeDoubleArray,
+            [array("d", range(i, i + 16)) for i in range(count)],
+        ),
+        "makeStringArray": (
+            Value.makeStringArray,
+            [["s%d-%d" % (i, j) for j in range(16)] for i in range(count)],
+        ),
+        "makeRpc": (Value.makeRpc, ["rpc-%d" % i for i in range(count)]),
+    }
+
+    for name, (make, args) in sorted(inputs.items()):
+        yield "value." + name, lambda make=make, args=args: [make(a) for a in args]
+
+
+def _leb128_ops(count):
+    for label, value in (("1byte", 0x7F), ("2byte", 0x3FFF), ("4byte", 0xFFFFFFF)):
+        values = [value] * count
+        data = b"".join(leb128.encode_uleb128(v) for v in values)
+
+        def _read(data=data):
+            decoder = FrameDecoder(None, None, None, bufsize=len(data))
+            decoder.feed(data)
+            return [leb128.read_uleb128(decoder) for _ in range(count)]
+
+        yield "leb128.size.%s" % label, lambda values=values: [
+            leb128.size_uleb128(v) for v in values
+        ]
+        yield "leb128.encode.%s" % label, lambda values=values: [
+            leb128.encode_uleb128(v) for v in values
+        ]
+        yield "leb128.read.%s" % label, _read
+
+
+def _time(fn, repeat):
+    # best of repeat runs, in ns
+    best = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        gc.enable()
+    return best * 1e9
+
+
+_tracemalloc_filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def _allocs(fn):
+    # returns the number of blocks allocated by fn that are still alive
+    # afterwards, and the peak traced memory while it ran
+    fn()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(_tracemalloc_filters)
+        if hasattr(tracemalloc, "reset_peak"):
+            # python 3.9+, otherwise the peak includes the snapshot
+            tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(_tracemalloc_filters)
+    finally:
+        tracemalloc.stop()
+
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename"))
+    del result
+    return blocks, peak
+
+
+def run(quick=False, names=None):
+    """Returns a dict of benchmark name to a dict with the time (ns),
+    allocated blocks (allocs) and peak traced memory (peak_bytes) per
+    message or operation"""
+    count = 200 if quick else 1000
+    repeat = 3 if quick else 5
+    rounds = 2 if quick else 10
+
+    ops = []
+    for proto_rev in (0x0200, 0x0300):
+        for case in _message_cases(proto_rev, count):
+            prefix = "%04x." % proto_rev
+            ops.append((prefix + "encode." + case.name, case.encode))
+            ops.append((prefix + "decode." + case.name, case.decode))
+
+    ops.extend(_value_ops(count))
+    ops.extend(_leb128_ops(count))
+
+    if names:
+        ops = [op for op in ops if any(op[0].startswith(n) for n in names)]
+
+    results = {}
+    for name, fn in ops:
+        # also warms up any caches (such as the array structs)
+        blocks, peak = _allocs(fn)
+        results[name] = {
+            "ns": None,
+            "allocs": blocks / count,
+            "peak_bytes": peak / count,
+        }
+
+    # the timings are taken in rounds over all of the benchmarks, so that
+    # a slow period of the machine doesn't skew just one of them
+    for _ in range(rounds):
+        for name, fn in ops:
+            ns = _time(fn, repeat) / count
+            result = results[name]
+            if result["ns"] is None or ns < result["ns"]:
+                result["ns"] = ns
+
+    return results
+
+
+def compare(baseline, results, time_threshold, alloc_threshold):
+    """Returns the lines of the comparison, and the names that regressed"""
+    lines = []
+    regressed = []
+
+    for name, new in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            lines.append(
+                "%-44s %10.1f ns %7.2f allocs (new)" % (name, new["ns"], new["allocs"])
+            )
+            continue
+
+        ratio = new["ns"] / old["ns"] if old["ns"] else 1.0
+        extra = new["allocs"] - old["allocs"]
+
+        flags = []
+        if ratio > time_threshold:
+            flags.append("SLOWER")
+        if extra > alloc_threshold:
+            flags.append("MORE ALLOCS")
+        if flags:
+            regressed.append(name)
+
+        lines.append(
+            "%-44s %10.1f ns %6.2fx %7.2f allocs %+6.2f %s"
+            % (name, new["ns"], ratio, new["allocs"], extra, " ".join(flags))
+        )
+
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "names", nargs="*", help="only run benchmarks starting with these names"
+    )
+    parser.add_argument("-o", "--output", help="write the JSON results here")
+    parser.add_argument(
+        "--quick", action="store_true", help="fewer messages and repeats"
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE, help="baseline file (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="write the results to the baseline file instead of comparing",
+    )
+    parser.add_argument(
+        "--time-threshold",
+        type=float,
+        help="maximum ratio of new to baseline time per message (default: "
+        "from the baseline file, or %s)" % DEFAULT_TIME_THRESHOLD,
+    )
+    parser.add_argument(
+        "--alloc-threshold",
+        type=float,
+        help="maximum extra blocks allocated per message (default: from the "
+        "baseline file, or %s)" % DEFAULT_ALLOC_THRESHOLD,
+    )
+    args = parser.parse_args()
+
+    results = run(args.quick, args.names)
+
+    output = {
+        "meta": {
+            "python": sys.version,
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(output, fp, indent=2, sort_keys=True)
+            fp.write("\n")
+
+    if args.save_baseline:
+        output["thresholds"] = {
+            "time": args.time_threshold or DEFAULT_TIME_THRESHOLD,
+            "allocs": args.alloc_threshold or DEFAULT_ALLOC_THRESHOLD,
+        }
+        with open(args.baseline, "w") as fp:
+            json.dump(output, fp, indent=2, sort_keys=True)
+            fp.write("\n")
+        print("saved %d results to %s" % (len(results), args.baseline))
+        return 0
+
+    baseline = {"results": {}, "thresholds": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+    else:
+        print("no baseline at %s, nothing to compare" % args.baseline)
+
+    if baseline.get("meta", {}).get("quick", args.quick) != args.quick:
+        print("warning: the baseline was saved with a different --quick setting")
+
+    thresholds = baseline.get("thresholds", {})
+    time_threshold = args.time_threshold or thresholds.get(
+        "time", DEFAULT_TIME_THRESHOLD
+    )
+    alloc_threshold = args.alloc_threshold
+    if alloc_threshold is None:
+        alloc_threshold = thresholds.get("allocs", DEFAULT_ALLOC_THRESHOLD)
+
+    lines, regressed = compare(
+        baseline["results"], results, time_threshold, alloc_threshold
+    )
+    print("\n".join(lines))
+
+    if regressed:
+        print(
+            "\n%d regressed past the thresholds (time %.2fx, allocs +%.2f):"
+            % (len(regressed), time_threshold, alloc_threshold)
+        )
+        for name in regressed:
+            print("  " + name)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+    Benchmarks of values travelling between a server and its clients
+"""
+
+import threading
+import time
+
+from harness import (
+    ValueWaiter,
+    benchmark,
+    flush,
+    live,
+    rate,
+    server_port,
+    start_client,
+    start_server,
+    summarize,
+)
+
+
+def _latency(config, put, values, key):
+    # time from a put on the server until the client's listener sees it
+    with live(config) as (server, (client,)):
+        waiter = ValueWaiter(client, key)
+        entry = server.getEntry(key)
+
+        # the first value creates the entry on the client
+        put(entry, values[0])
+        last_flush = flush(server, 0)
+        waiter.wait(values[0])
+
+        samples = []
+        for value in values[1:]:
+            # don't let the flush be rate limited
+            time.sleep(max(0, last_flush + 0.011 - time.perf_counter()))
+
+            start = time.perf_counter()
+            put(entry, value)
+            last_flush = flush(server, last_flush)
+            waiter.wait(value)
+            samples.append(time.perf_counter() - start)
+
+    return summarize(samples)
+
+
+@benchmark("update_latency")
+def update_latency(config):
+    """Single double key: put on the server and flush, until the client's
+    listener is called"""
+    n = config.scale(500, 50)
+    return _latency(
+        config,
+        lambda entry, value: entry.setDouble(value),
+        [float(i) for i in range(n)],
+        "/bench/latency",
+    )
+
+
+@benchmark("multi_key_throughput")
+def multi_key_throughput(config):
+    """Many keys updated in rounds on the server without flushing, until
+    the client has the final value of every key. Intermediate values may
+    be coalesced, so both the puts and the updates that reached the
+    client's listeners are reported"""
+    keys = config.scale(1000, 200)
+    rounds = config.scale(50, 10)
+    final = float(rounds)
+
+    with live(config) as (server, (client,)):
+        cond = threading.Condition()
+        state = {"received": 0, "final": 0}
+
+        def _on_update(source, key, value, is_new):
+            with cond:
+                state["received"] += 1
+                if value == final:
+                    state["final"] += 1
+                cond.notify_all()
+
+        client.getTable("/bench/multi").addEntryListener(_on_update)
+
+        entries = [server.getEntry("/bench/multi/k%d" % i) for i in range(keys)]
+        for entry in entries:
+            entry.setDouble(0)
+
+        # wait for the new entries, so only updates are measured
+        with cond:
+            if not cond.wait_for(lambda: state["received"] == keys, 60):
+                raise RuntimeError("timed out")
+            state["received"] = 0
+
+        start = time.perf_counter()
+        for r in range(1, rounds + 1):
+            value = float(r)
+            for entry in entries:
+                entry.setDouble(value)
+
+        with cond:
+            if not cond.wait_for(lambda: state["final"] == keys, 60):
+                raise RuntimeError("timed out")
+            elapsed = time.perf_counter() - start
+            received = state["received"]
+
+    return {
+        "puts": rate(keys * rounds, elapsed, "puts/s"),
+        "received": rate(received, elapsed, "updates/s"),
+    }
+
+
+@benchmark("fanout_latency")
+def fanout_latency(config):
+    """One key updated on the server, until every client has it"""
+    results = {}
+    iterations = config.scale(100, 20)
+    key = "/bench/fanout"
+
+    for nclients in config.scale((1, 4, 16), (1, 4)):
+        with live(config, clients=nclients) as (server, clients):
+            waiters = [ValueWaiter(client, key) for client in clients]
+            entry = server.getEntry(key)
+
+            entry.setDouble(-1)
+            last_flush = flush(server, 0)
+            for waiter in waiters:
+                waiter.wait(-1)
+
+            samples = []
+            for i in range(iterations):
+                time.sleep(max(0, last_flush + 0.011 - time.perf_counter()))
+
+                start = time.perf_counter()
+                entry.setDouble(i)
+                last_flush = flush(server, last_flush)
+                for waiter in waiters:
+                    waiter.wait(i)
+                samples.append(time.perf_counter() - start)
+
+        results["clients_%d" % nclients] = summarize(samples)
+
+    return results
+
+
+@benchmark("handshake")
+def handshake(config):
+    """A client connecting to a server that has many entries, until the
+    client has received all of them. 'connect' is the time from starting
+    the client (which includes its connect retry delay), 'handshake' is
+    the time from the TCP connection being made"""
+    results = {}
+
+    for count in config.scale((1000, 10000, 50000), (1000, 5000)):
+        server = start_server(config)
+        try:
+            for i in range(count):
+                server.getEntry("/bench/hs/%d" % i).setDouble(i)
+
+            connect = []
+            hs = []
+            for _ in range(config.scale(3, 1)):
+                start = time.perf_counter()
+                client = start_client(config, server)
+                connect.append(time.perf_counter() - start)
+
+                (stats,) = client.getConnectionStats()
+                hs.append(stats.handshake_duration)
+
+                got = len(client.getEntries("/bench/hs/"))
+                client.shutdown()
+                if got != count:
+                    raise RuntimeError("received %d of %d entries" % (got, count))
+        finally:
+            server.shutdown()
+
+        results["entries_%d" % count] = {
+            "connect": summarize(connect),
+            "handshake": summarize(hs),
+        }
+
+    return results
+
+
+@benchmark("reconnect_storm")
+def reconnect_storm(config):
+    """Many clients connecting to a server with many entries at the same
+    time, as dashboards do after the network drops out. 'all_connected' is
+    the time until every client has received all of the entries,
+    'handshake' and 'queued' are the handshake duration of each client and
+    the time it waited for its turn, and 'established' is the latency of
+    updates to a client that was already connected, during the storm"""
+    count = config.scale(5000, 1000)
+    nclients = config.scale(30, 5)
+
+    server = start_server(config)
+    established = None
+    clients = []
+    try:
+        for i in range(count):
+            server.getEntry("/bench/storm/%d" % i).setDouble(i)
+
+        established = start_client(config, server, "established")
+        waiter = ValueWaiter(established, "/bench/storm/latency")
+        entry = server.getEntry("/bench/storm/latency")
+
+        stop = threading.Event()
+        latency = []
+
+        def _measure():
+            i = 0
+            last_flush = 0
+            while not stop.is_set():
+                i += 1
+                start = time.perf_counter()
+                entry.setDouble(i)
+                last_flush = flush(server, last_flush)
+                waiter.wait(i, timeout=60)
+                latency.append(time.perf_counter() - start)
+
+        measure = threading.Thread(target=_measure, name="storm-latency")
+        measure.start()
+
+        try:
+            start = time.perf_counter()
+            for i in range(nclients):
+                clients.append(start_client(config, server, "storm%d" % i, wait=False))
+
+            deadline = time.monotonic() + 60
+            while not all(client.isConnected() for client in clients):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("clients did not connect")
+                time.sleep(0.001)
+            all_connected = time.perf_counter() - start
+        finally:
+            stop.set()
+            measure.join()
+
+        hs = []
+        for client in clients:
+            (stats,) = client.getConnectionStats()
+            hs.append(stats.handshake_duration)
+
+            got = len(client.getEntries("/bench/storm/"))
+            if got < count:
+                raise RuntimeError("received %d of %d entries" % (got, count))
+
+        queued = [
+            stats.handshake_queue_time
+            for stats in server.getConnectionStats()
+            if stats.conn_info.remote_id.startswith("storm")
+        ]
+    finally:
+        for client in clients:
+            client.shutdown()
+        if established is not None:
+            established.shutdown()
+        server.shutdown()
+
+    return {
+        "all_connected": summarize([all_connected]),
+        "handshake": summarize(hs),
+        "queued": summarize(queued),
+        "established": summarize(latency),
+    }
+
+
+@benchmark("reconnect_resume")
+def reconnect_resume(config):
+    """A client reconnecting to a server that has many entries, after a few
+    of them changed, with and without resuming its session (see
+    enableResume). 'handshake' is the handshake duration of each reconnect,
+    and 'bytes_read' is how much the client received during it"""
+    count = config.scale(10000, 1000)
+    changed = 10
+    results = {}
+
+    server = start_server(config)
+    try:
+        for i in range(count):
+            server.getEntry("/bench/resume/%d" % i).setDouble(i)
+
+        server_addr = ("127.0.0.1", server_port(server))
+
+        def _reconnect(client, value):
+            client.stopClient()
+            for i in range(changed):
+                server.getEntry("/bench/resume/%d" % i).setDouble(value)
+
+            client.startClient(server_addr, useAsyncio=config.use_asyncio)
+            deadline = time.monotonic() + 30
+            while not client.isConnected():
+                if time.monotonic() > deadline:
+                    raise RuntimeError("client did not reconnect")
+                time.sleep(0.001)
+
+            got = client.getEntry("/bench/resume/0").getDouble(None)
+            if got != value:
+                raise RuntimeError("received %r instead of %r" % (got, value))
+
+            (stats,) = client.getConnectionStats()
+            return stats
+
+        value = count
+        for resume in (False, True):
+            client = start_client(config, server, "resume")
+            try:
+                # the first reconnect starts the session that is resumed
+                client.enableResume(resume)
+                value += 1
+                _reconnect(client, value)
+
+                hs = []
+                received = []
+                for _ in range(config.scale(10, 3)):
+                    value += 1
+                    stats = _reconnect(client, value)
+                    hs.append(stats.handshake_duration)
+                    received.append(stats.bytes_read)
+            finally:
+                client.shutdown()
+
+            results["resume" if resume else "full"] = {
+                "handshake": summarize(hs),
+                "bytes_read": summarize(received, "bytes"),
+            }
+    finally:
+        server.shutdown()
+
+    return results
+
+
+@benchmark("large_arrays")
+def large_arrays(config):
+    """Latency of the largest arrays NT3 can carry (255 elements), and of
+    a large raw value"""
+    n = config.scale(200, 30)
+
+    return {
+        "double_array_255": _latency(
+            config,
+            lambda entry, value: entry.setDoubleArray(value),
+            [tuple(float(i + j) for j in range(255)) for i in range(n)],
+            "/bench/da",
+        ),
+        "string_array_255": _latency(
+            config,
+            lambda entry, value: entry.setStringArray(value),
+            [tuple("s%d-%d" % (i, j) for j in range(255)) for i in range(n)],
+            "/bench/sa",
+        ),
+        "raw_64k": _latency(
+            config,
+            lambda entry, value: entry.setRaw(value),
+            [bytes([i % 256]) * 65536 for i in range(n)],
+            "/bench/raw",
+        ),
+    }
@@ -0,0 +1,77 @@
+"""
+    Benchmarks of saving and loading persistent values
+"""
+
+import os
+import time
+
+from harness import NetworkTablesInstance, benchmark, summarize
+
+
+def _make_instance(count):
+    inst = NetworkTablesInstance.create()
+    for i in range(count):
+        entry = inst.getEntry("/bench/persist/%d" % i)
+        if i % 3 == 0:
+            entry.setDouble(i)
+        elif i % 3 == 1:
+            entry.setString("value %d" % i)
+        else:
+            entry.setDoubleArray((i, i + 0.5, i + 1))
+        entry.setPersistent()
+    return inst
+
+
+@benchmark("persistent_save_load")
+def persistent_save_load(config):
+    """Saving and loading many persistent values, in each file format.
+    'resave' is a save after changing a single value"""
+    results = {}
+    iterations = config.scale(5, 2)
+
+    for count in config.scale((1000, 10000), (1000,)):
+        for ext in ("ini", "ntlog"):
+            inst = _make_instance(count)
+
+            save = []
+            resave = []
+            for i in range(iterations):
+                # a new file each time, so that the first save isn't an
+                # append to an existing log
+                name = "bench-%d-%d.%s" % (count, i, ext)
+                filename = os.path.join(config.tmpdir, name)
+
+                start = time.perf_counter()
+                err = inst.savePersistent(filename)
+                save.append(time.perf_counter() - start)
+                if err:
+                    raise RuntimeError(err)
+
+                inst.getEntry("/bench/persist/0").setDouble(-i - 1)
+                start = time.perf_counter()
+                err = inst.savePersistent(filename)
+                resave.append(time.perf_counter() - start)
+                if err:
+                    raise RuntimeError(err)
+
+            load = []
+            for _ in range(iterations):
+                loaded = NetworkTablesInstance.create()
+                start = time.perf_counter()
+                err = loaded.loadPersistent(filename)
+                load.append(time.perf_counter() - start)
+                if err:
+                    raise RuntimeError(err)
+
+                got = len(loaded.getEntries("/bench/persist/"))
+                if got != count:
+                    raise RuntimeError("loaded %d of %d entries" % (got, count))
+
+            results["%s_%d" % (ext, count)] = {
+                "save": summarize(save),
+                "resave": summarize(resave),
+                "load": summarize(load),
+                "file_size": os.path.getsize(filename),
+            }
+
+    return results
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+    Runs the NetworkTables benchmarks in a single process over loopback,
+    and writes the results as JSON so that they can be compared between
+    commits.
+
+    Run all benchmarks::
+
+        python3 benchmarks/run.py -o results.json
+
+    Run some of them, with fewer iterations::
+
+        python3 benchmarks/run.py --quick update_latency handshake
+
+    Compare two result files (ratios above 1 mean the second one took
+    longer, or for rates, was faster)::
+
+        python3 benchmarks/run.py --compare old.json new.json
+
+    The microbenchmarks of the wire codec are run separately, by micro.py.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+import harness
+
+# the modules register their benchmarks when imported
+import contention  # noqa: F401
+import network  # noqa: F401
+import persistence  # noqa: F401
+
+from _pynetworktables import __version__
+
+
+def _git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, config):
+    results = {}
+    for name in names:
+        print("running %s..." % name, file=sys.stderr)
+        gc.collect()
+        results[name] = harness.BENCHMARKS[name](config)
+    return results
+
+
+def _flatten(results, prefix=""):
+    # yields (path, stats) for each summary/rate in the results
+    for key, value in sorted(results.items()):
+        path = prefix + key
+        if isinstance(value, dict):
+            if "unit" in value:
+                yield path, value
+            else:
+                for item in _flatten(value, path + "."):
+                    yield item
+
+
+def compare(old, new):
+    old = dict(_flatten(old["results"]))
+    lines = []
+    for path, stats in _flatten(new["results"]):
+        prev = old.get(path)
+        if prev is None:
+            continue
+
+        # timings compare the median, rates compare the value
+        field = "median" if "median" in stats else "value"
+        if not prev[field]:
+            continue
+
+        ratio = stats[field] / prev[field]
+        lines.append(
+            "%-50s %12.6g %12.6g %7.2fx %s"
+            % (path, prev[field], stats[field], ratio, stats["unit"])
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default all)")
+    parser.add_argument("-o", "--output", help="write the JSON results here")
+    parser.add_argument(
+        "--quick", action="store_true", help="fewer iterations and smaller tables"
+    )
+    parser.add_argument(
+        "--asyncio", action="store_true", help="use the asyncio network engine"
+    )
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    parser.add_argument(
+        "--compare", nargs=2, metavar="JSON", help="compare two result files"
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        for name, fn in sorted(harness.BENCHMARKS.items()):
+            print("%-24s %s" % (name, " ".join(fn.__doc__.split())))
+        return
+
+    if args.compare:
+        with open(args.compare[0]) as fp:
+            old = json.load(fp)
+        with open(args.compare[1]) as fp:
+            new = json.load(fp)
+        print(compare(old, new))
+        return
+
+    names = args.names or sorted(harness.BENCHMARKS)
+    for name in names:
+        if name not in harness.BENCHMARKS:
+            parser.error("unknown benchmark %s" % name)
+
+    # NetworkTables logs connects and disconnects at INFO
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = harness.Config(args.quick, args.asyncio, tmpdir)
+        results = run(names, config)
+
+    output = {
+        "meta": {
+            "commit": _git_commit(),
+            "version": __version__,
+            "python": sys.version,
+            "platform": platform.platform(),
+            "time": datetime.datetime.utcnow().isoformat() + "Z",
+            "quick": args.quick,
+            "asyncio": args.asyncio,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(output, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
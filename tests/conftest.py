@@ -72,6 +72,7 @@ class NtTestBase(NetworkTablesInstance):
 
     _wait_lock = None
     _testing_verbose_logging = True
+    _use_asyncio = False
 
     def shutdown(self):
         logger.info("shutting down %s", self.__class__.__name__)
@@ -170,7 +171,9 @@ def nt_server(request, verbose_logging):
             if verbose_logging:
                 self.enableVerboseLogging()
 
-            self.startServer(listenAddress="127.0.0.1", port=self.port)
+            self.startServer(
+                listenAddress="127.0.0.1", port=self.port, useAsyncio=self._use_asyncio
+            )
 
             assert self._api.dispatcher.m_server_acceptor.waitForStart(timeout=1)
             self.port = self._api.dispatcher.m_server_acceptor.m_port
@@ -193,7 +196,9 @@ def nt_client(request, nt_server, verbose_logging):
                 self.enableVerboseLogging()
             self.setNetworkIdentity("C1")
             self._api.dispatcher.setDefaultProtoRev(request.param)
-            self.startClient(("127.0.0.1", nt_server.port))
+            self.startClient(
+                ("127.0.0.1", nt_server.port), useAsyncio=self._use_asyncio
+            )
 
     client = NtClient()
     client._init_client(request.param)
@@ -9,6 +9,9 @@ from __future__ import print_function
 import pytest
 
 import logging
+import time
+
+from _pynetworktables import NetworkTablesInstance
 
 logger = logging.getLogger("test")
 
@@ -176,3 +179,92 @@ def test_reconnect(nt_live):
 
     st = nt_server.getTable("t")
     assert st.getBoolean("foo", None) == True
+
+
+def test_adaptive_update_rate(nt_live):
+
+    nt_server, nt_client = nt_live
+
+    nt_server.setUpdateRate(0.01, 0.5)
+    nt_client.setUpdateRate(0.01, 0.5)
+
+    # server -> client
+    do(nt_server, nt_client, "server2client")
+
+    # client -> server
+    do(nt_client, nt_server, "client2server")
+
+    dispatcher = nt_server._api.dispatcher
+    schedulers = [conn.m_scheduler for conn in dispatcher.m_connections]
+    assert schedulers
+    for sched in schedulers:
+        assert 0.01 <= sched.interval <= 0.5
+
+    # once idle, a connection is no longer congested and goes back to being
+    # sent to at the fastest rate. The dispatchers are stopped first, so that
+    # the schedulers can be driven with a fake clock instead of waiting.
+    nt_client.disconnect()
+    nt_server.disconnect()
+
+    for sched in schedulers:
+        now = sched.m_next_send
+        for _ in range(20):
+            assert sched.isDue(now)
+            sched.sent(now, False, None, 0.01, 0.5)
+            now += sched.interval
+
+        assert sched.interval == 0.01
+
+
+def test_connection_stats(nt_live):
+
+    nt_server, nt_client = nt_live
+
+    do(nt_server, nt_client, "server2client")
+
+    (info,) = nt_server.getConnections()
+    (stats,) = nt_server.getConnectionStats()
+    assert stats.conn_info.remote_port == info.remote_port
+
+    assert stats.bytes_read > 0
+    assert stats.bytes_written > 0
+    assert stats.messages_written["kEntryAssign"] >= 14
+    assert stats.messages_read["kClientHello"] == 1
+    assert stats.queued >= stats.coalesced
+    assert stats.handshake_duration is not None
+    assert not stats.backpressured
+
+    (stats,) = nt_client.getConnectionStats()
+    assert stats.messages_read["kEntryAssign"] >= 14
+
+
+@pytest.mark.parametrize("use_asyncio", [False, True])
+def test_handshake_limits(nt_server, use_asyncio):
+    nt_server._use_asyncio = use_asyncio
+    nt_server.setHandshakeLimits(1, None)
+    nt_server.start_test()
+
+    for i in range(20):
+        nt_server.getEntry("/k%d" % i).setDouble(i)
+
+    # clients that connect at the same time take turns, but all connect
+    clients = [NetworkTablesInstance.create() for _ in range(4)]
+    try:
+        for client in clients:
+            client.startClient(("127.0.0.1", nt_server.port))
+
+        # the server marks a connection active after the client does
+        deadline = time.monotonic() + 10
+        while len(nt_server.getConnections()) < 4 or not all(
+            client.isConnected() and len(client.getEntries("/")) == 20
+            for client in clients
+        ):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        stats = nt_server.getConnectionStats()
+        assert len(stats) == 4
+        assert all(s.handshake_queue_time >= 0 for s in stats)
+    finally:
+        for client in clients:
+            client.shutdown()
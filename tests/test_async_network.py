@@ -0,0 +1,139 @@
+#
+# These tests run a live client and server where one or both of them
+# use the asyncio network engine
+#
+
+import os
+import threading
+import time
+
+import pytest
+
+from _pynetworktables import NetworkTablesInstance
+
+
+@pytest.fixture(params=["server", "client", "both"])
+def nt_async(request, nt_server, nt_client):
+    nt_server._use_asyncio = request.param in ("server", "both")
+    nt_client._use_asyncio = request.param in ("client", "both")
+    return nt_server, nt_client
+
+
+def test_async_values(nt_async):
+    nt_server, nt_client = nt_async
+
+    ct = nt_client.getTable("table")
+    st = nt_server.getTable("table")
+
+    st.putString("foo", "1")
+
+    with nt_client.expect_changes(1):
+        nt_server.start_test()
+        nt_client.start_test()
+
+    assert ct.getString("foo", None) == "1"
+
+    with nt_client.expect_changes(1):
+        st.putString("foo", "2")
+        nt_server.flush()
+
+    assert ct.getString("foo", None) == "2"
+
+    with nt_server.expect_changes(1):
+        ct.putNumber("bar", 3)
+
+    assert st.getNumber("bar", None) == 3
+
+    assert nt_server.isConnected()
+    assert nt_client.isConnected()
+
+
+def test_async_reconnect(nt_async):
+    nt_server, nt_client = nt_async
+
+    ct = nt_client.getTable("table")
+    st = nt_server.getTable("table")
+
+    with nt_client.expect_changes(1):
+        nt_server.start_test()
+        nt_client.start_test()
+        st.putString("foo", "1")
+
+    nt_client.disconnect()
+    st.putString("foo", "2")
+
+    with nt_client.expect_changes(1):
+        nt_client.start_test()
+
+    assert ct.getString("foo", None) == "2"
+
+
+def test_async_server_restart(nt_async):
+    nt_server, nt_client = nt_async
+
+    ct = nt_client.getTable("table")
+    st = nt_server.getTable("table")
+
+    with nt_server.expect_changes(1):
+        nt_server.start_test()
+        nt_client.start_test()
+        ct.putString("foo", "1")
+
+    # the client notices the server going away and reconnects by itself
+    nt_server.disconnect()
+    ct.putString("foo", "2")
+
+    with nt_server.expect_changes(1):
+        nt_server.start_test()
+
+    assert st.getString("foo", None) == "2"
+
+
+def test_async_no_connection_threads(nt_server, nt_client):
+    nt_server._use_asyncio = True
+    nt_client._use_asyncio = True
+
+    with nt_client.expect_changes(1):
+        nt_server.start_test()
+        nt_client.start_test()
+        nt_server.getTable("table").putBoolean("foo", True)
+
+    names = [th.name for th in threading.enumerate()]
+    assert not [name for name in names if name.startswith("nt-net-")]
+    assert not [name for name in names if name.startswith("nt-dispatch-thread")]
+
+
+def test_async_persistent_save(tmp_path):
+    server = NetworkTablesInstance.create()
+    dispatcher = server._api.dispatcher
+    storage = dispatcher.m_storage
+    dispatcher.m_save_delta_time = 0.05
+
+    # the periodic save writes a file, so it doesn't run on the event loop
+    save_threads = []
+    save = storage.savePersistent
+
+    def _savePersistent(*args, **kwargs):
+        save_threads.append(threading.current_thread().name)
+        return save(*args, **kwargs)
+
+    storage.savePersistent = _savePersistent
+
+    filename = str(tmp_path / "persist.ini")
+    try:
+        server.startServer(
+            persistFilename=filename, listenAddress="127.0.0.1", port=0, useAsyncio=True
+        )
+        entry = server.getEntry("/foo")
+        entry.setDouble(1)
+        entry.setPersistent()
+
+        deadline = time.monotonic() + 5
+        while not os.path.exists(filename):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        server.shutdown()
+
+    assert save_threads
+    assert not [name for name in save_threads if name.startswith("nt-asyncio")]
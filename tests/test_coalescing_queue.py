@@ -0,0 +1,91 @@
+#
+# Tests for the per-connection outgoing message queue
+#
+
+from _pynetworktables._impl.message import Message
+from _pynetworktables._impl.support.coalescing_queue import CoalescingQueue
+from _pynetworktables._impl.value import Value
+
+
+def _v(v):
+    return Value.makeDouble(v)
+
+
+def test_coalesce_updates():
+    q = CoalescingQueue()
+    q.push(Message.entryAssign("a", 1, 1, _v(1), 0))
+    q.push(Message.entryUpdate(2, 1, _v(1)))
+    q.push(Message.entryUpdate(1, 2, _v(2)))
+    q.push(Message.entryUpdate(2, 2, _v(3)))
+    q.push(Message.flagsUpdate(1, 1))
+    q.push(Message.flagsUpdate(1, 0))
+
+    # an update to a pending assignment is merged into it, and messages keep
+    # their original position
+    assert q.drain() == [
+        Message.entryAssign("a", 1, 2, _v(2), 0),
+        Message.entryUpdate(2, 2, _v(3)),
+        Message.flagsUpdate(1, 0),
+    ]
+    assert q.queued == 6
+    assert q.collapsed == 3
+
+    q.resetCounts()
+    assert len(q) == 0
+    assert q.drain() == []
+
+
+def test_unassigned_not_coalesced():
+    q = CoalescingQueue()
+    msgs = [
+        Message.entryAssign("a", 0xFFFF, 1, _v(1), 0),
+        Message.entryAssign("a", 0xFFFF, 2, _v(2), 0),
+        Message.flagsUpdate(0xFFFF, 1),
+        Message.flagsUpdate(0xFFFF, 0),
+    ]
+    for msg in msgs:
+        q.push(msg)
+
+    assert q.drain() == msgs
+    assert q.collapsed == 0
+
+
+def test_delete():
+    q = CoalescingQueue()
+    q.push(Message.entryAssign("a", 1, 1, _v(1), 0))
+    q.push(Message.flagsUpdate(1, 1))
+    q.push(Message.entryUpdate(2, 1, _v(1)))
+    q.push(Message.entryDelete(1))
+    q.push(Message.entryAssign("a", 1, 2, _v(2), 0))
+
+    # the delete drops pending messages for the id, and an assignment that
+    # comes after it is sent after it
+    assert q.drain() == [
+        Message.entryUpdate(2, 1, _v(1)),
+        Message.entryDelete(1),
+        Message.entryAssign("a", 1, 2, _v(2), 0),
+    ]
+    assert q.collapsed == 2
+
+
+def test_clear():
+    q = CoalescingQueue()
+    q.push(Message.entryAssign("a", 1, 1, _v(1), 0))
+    q.push(Message.executeRpc(3, 1, "x"))
+    q.push(Message.entryDelete(2))
+    q.push(Message.clearEntries())
+    q.push(Message.entryUpdate(1, 2, _v(2)))
+    q.push(Message.clearEntries())
+    q.push(Message.entryUpdate(1, 3, _v(3)))
+
+    # entry messages before the last clear are dropped, others are kept
+    assert q.drain() == [
+        Message.executeRpc(3, 1, "x"),
+        Message.clearEntries(),
+        Message.entryUpdate(1, 3, _v(3)),
+    ]
+    assert q.collapsed == 4
+
+    # the next cycle isn't affected by the clear
+    q.push(Message.entryUpdate(1, 4, _v(4)))
+    assert q.drain() == [Message.entryUpdate(1, 4, _v(4))]
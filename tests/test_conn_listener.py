@@ -90,3 +90,52 @@ def test_Threaded(nt_server, nt_client):
     assert len(result) == 1
     # assert handle == result[0].listener
     assert not result[0].connected
+
+
+def test_Backpressure(nt_server, nt_client):
+    nt_server_api = nt_server._api
+
+    if nt_server.proto_rev == 0x0200 or nt_client.proto_rev == 0x0200:
+        # this is annoying to test because of the reconnect
+        return
+
+    result_cond = threading.Condition()
+    result = []
+    conn_result = []
+
+    def _backpressure_cb(backpressured, info):
+        with result_cond:
+            result.append(backpressured)
+            result_cond.notify()
+
+    nt_server.addConnectionBackpressureListener(_backpressure_cb)
+
+    def _conn_cb(*args):
+        with result_cond:
+            conn_result.append(args)
+            result_cond.notify()
+
+    nt_server.addConnectionListener(_conn_cb)
+
+    nt_server.start_test()
+    nt_client.start_test()
+
+    with result_cond:
+        assert result_cond.wait_for(lambda: conn_result, 1.0)
+
+    # pretend that the write thread fell behind
+    (conn,) = nt_server_api.dispatcher.m_connections
+    conn.m_posted_messages += 100
+    assert conn.checkBackpressure(10, None)
+    assert conn.checkBackpressure(10, None)
+
+    conn.m_written_messages += 100
+    assert not conn.checkBackpressure(10, None)
+
+    assert nt_server_api.waitForConnectionListenerQueue(1.0)
+    assert result == [True, False]
+    assert conn.m_backpressure_events == 1
+    assert conn.m_backpressure_skipped == 2
+
+    # connection listeners don't see backpressure events
+    assert len(conn_result) == 1
@@ -0,0 +1,175 @@
+#
+# Tests of the server's handshake admission control, and of resuming sessions
+#
+
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from _pynetworktables._impl.constants import kClientHello, kResume, kProtoRevResume
+from _pynetworktables._impl.dispatcher import Dispatcher
+from _pynetworktables._impl.message import Message
+from _pynetworktables._impl.network_connection import NetworkConnection
+
+kDead = NetworkConnection.State.kDead
+
+
+@pytest.fixture
+def dispatcher():
+    d = Dispatcher(Mock(), Mock())
+    d.m_active = True
+    return d
+
+
+def make_conn():
+    conn = Mock(spec=NetworkConnection)
+    conn.state = NetworkConnection.State.kCreated
+    conn.m_handshake_queue_time = 0.0
+    return conn
+
+
+def test_handshake_admission(dispatcher):
+    d = dispatcher
+    d.setHandshakeLimits(2, 2)
+
+    conns = [make_conn() for _ in range(5)]
+    results = [d._admitServerConnection(conn) for conn in conns]
+
+    # two are started, two wait, and the last one is turned away
+    assert results == [True, True, True, True, False]
+    assert [conn.start.called for conn in conns] == [True, True, False, False, False]
+    assert d.m_connections == conns[:2]
+    conns[4].get_stream().close.assert_called_once_with()
+
+    # each finished handshake starts the connection that waited longest
+    time.sleep(0.02)
+    d._handshakeDone(conns[1])
+    assert conns[2].start.called and not conns[3].start.called
+    assert conns[2].m_handshake_queue_time > 0
+
+    d._handshakeDone(conns[0])
+    assert conns[3].start.called
+    assert d.m_connections == conns[:4]
+    assert d.m_handshakes == 2
+
+    d._handshakeDone(conns[2])
+    d._handshakeDone(conns[3])
+    assert d.m_handshakes == 0
+
+
+def test_handshake_admission_unlimited(dispatcher):
+    d = dispatcher
+    d.setHandshakeLimits(None, None)
+
+    conns = [make_conn() for _ in range(50)]
+    for conn in conns:
+        assert d._admitServerConnection(conn)
+
+    assert all(conn.start.called for conn in conns)
+
+
+def test_handshake_admission_stop(dispatcher):
+    d = dispatcher
+    d.m_networkMode = 0
+    d.m_server_acceptor = None
+    d.m_engine = Mock()
+    d.setHandshakeLimits(1, 2)
+
+    conns = [make_conn() for _ in range(3)]
+    for conn in conns:
+        d._admitServerConnection(conn)
+
+    # connections that are still waiting are closed too
+    d.stop()
+    conns[0].stop.assert_called_once_with()
+    conns[1].get_stream().close.assert_called_once_with()
+    conns[2].get_stream().close.assert_called_once_with()
+
+    d._handshakeDone(conns[0])
+    assert not conns[1].start.called
+
+
+def test_handshake_admission_dead_queued(dispatcher):
+    d = dispatcher
+    d.setHandshakeLimits(1, None)
+
+    # connections whose clients went away while they were queued finish
+    # their handshake as soon as they are started
+    def make_dead_conn():
+        conn = make_conn()
+        conn.start.side_effect = lambda: d._handshakeDone(conn)
+        return conn
+
+    first = make_conn()
+    d._admitServerConnection(first)
+
+    conns = [make_dead_conn() for _ in range(2000)]
+    for conn in conns:
+        d._admitServerConnection(conn)
+
+    d._handshakeDone(first)
+    assert all(conn.start.called for conn in conns)
+    assert not d.m_pending_handshakes
+    assert d.m_handshakes == 0
+
+
+def test_dead_slots_reused(dispatcher):
+    d = dispatcher
+    d.setHandshakeLimits(None, None)
+
+    conns = [make_conn() for _ in range(3)]
+    for conn in conns:
+        d._admitServerConnection(conn)
+    assert [conn.m_slot for conn in conns] == [0, 1, 2]
+
+    # the slot of a connection is freed when it dies
+    conns[1].state = kDead
+    d._connectionDied(conns[1])
+
+    conn = make_conn()
+    d._admitServerConnection(conn)
+    assert conn.m_slot == 1
+    assert d.m_connections == [conns[0], conn, conns[2]]
+
+    # a slot that was reported but isn't dead isn't reused
+    d._connectionDied(conns[0])
+    conn = make_conn()
+    d._admitServerConnection(conn)
+    assert conn.m_slot == 3
+    assert d.m_connections[0] is conns[0]
+
+
+def test_resume_unsupported(dispatcher):
+    d = dispatcher
+    d.setResumeEnabled(True)
+
+    conn = make_conn()
+    conn.get_proto_rev.return_value = 0x0300
+
+    def hello():
+        sent = []
+        steps = d._clientHandshakeSteps(conn, sent.extend)
+        steps.send(None)
+        return steps, sent
+
+    # the client asks to resume, and the server doesn't know how
+    steps, sent = hello()
+    assert [(msg.type, msg.id) for msg in sent] == [
+        (kClientHello, kProtoRevResume),
+        (kResume, None),
+    ]
+
+    with pytest.raises(StopIteration) as e:
+        steps.send(Message.protoUnsup(0x0300))
+    assert e.value.value is False
+    assert d.m_do_reconnect and d.m_reconnect_proto_rev == 0x0300
+
+    # so it connects normally from then on
+    _, sent = hello()
+    assert sent == [Message.clientHello(0x0300, d.m_identity)]
+
+    # until the server changes
+    d.setServer(("127.0.0.1", 1735))
+    _, sent = hello()
+    assert sent[0].id == kProtoRevResume
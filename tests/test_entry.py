@@ -2,6 +2,10 @@
 # Ensure that the NetworkTableEntry objects work
 #
 
+from array import array
+
+from _pynetworktables._impl.constants import NT_UNASSIGNED
+
 
 def test_entry_value(nt):
     e = nt.getEntry("/k1")
@@ -30,3 +34,47 @@ def test_entry_persistence(nt):
         assert not e.isPersistent()
 
         e.delete()
+
+
+def test_entry_double_array(nt):
+    e = nt.getEntry("/k3")
+
+    updates = []
+    e.addListener(
+        lambda *args: updates.append(args[2]),
+        nt.NotifyFlags.UPDATE | nt.NotifyFlags.LOCAL,
+    )
+
+    # arrays of doubles are stored without converting each element
+    assert e.setDoubleArray(array("d", [1, 2.5]))
+    assert e.getDoubleArray(None) == (1.0, 2.5)
+
+    # setting the same contents as a tuple is not an update
+    assert e.setDoubleArray((1.0, 2.5))
+    assert e.setDoubleArray(array("d", [1, 3]))
+    assert nt.waitForEntryListenerQueue(1.0)
+    assert updates == [(1.0, 3.0)]
+
+
+def test_entry_info(nt):
+    e = nt.getEntry("/k4")
+
+    assert not e.exists()
+    assert e.getType() == NT_UNASSIGNED
+    assert e.getInfo() == ("/k4", NT_UNASSIGNED, 0)
+
+    e.setDouble(1)
+    assert e.exists()
+    assert e.getType() == nt.EntryTypes.DOUBLE
+    assert e.getFlags() == 0
+
+    e.setPersistent()
+    assert e.getFlags() == nt.EntryFlags.PERSISTENT
+    assert e.getInfo() == ("/k4", nt.EntryTypes.DOUBLE, nt.EntryFlags.PERSISTENT)
+
+    e.forceSetString("x")
+    assert e.getType() == nt.EntryTypes.STRING
+
+    e.delete()
+    assert not e.exists()
+    assert e.getInfo() == ("/k4", NT_UNASSIGNED, 0)
@@ -13,7 +13,11 @@ import pytest
 
 from threading import Condition
 
-from _pynetworktables._impl.constants import NT_NOTIFY_LOCAL, NT_NOTIFY_NEW
+from _pynetworktables._impl.constants import (
+    NT_NOTIFY_LOCAL,
+    NT_NOTIFY_NEW,
+    NT_NOTIFY_UPDATE,
+)
 
 from _pynetworktables._impl.value import Value
 
@@ -149,3 +153,28 @@ def test_PrefixNewRemote(nt_live, server_cb):
     assert events[0].name == "/foo/bar"
     assert events[0].value == Value.makeDouble(1.0)
     assert events[0].flags == NT_NOTIFY_NEW
+
+
+def test_EntryBatchRemote(nt_live, server_cb):
+    nt_server, nt_client = nt_live
+
+    nt_server.addEntryListenerBatch(
+        server_cb, NT_NOTIFY_NEW | NT_NOTIFY_UPDATE, prefix="/foo/", collapse=True
+    )
+
+    ct = nt_client.getTable("foo")
+    for i in range(10):
+        ct.putNumber("bar", i)
+    nt_client.getTable("other").putNumber("baz", 1)
+    nt_client.flush()
+
+    # the listener may get the changes in one or more batches, but the last
+    # one has the final value
+    server_cb.wait(1)
+    assert nt_server.waitForEntryListenerQueue(1.0)
+    changes = [c for batch in server_cb.events for c in batch]
+    assert changes[-1][:2] == ("/foo/bar", 9)
+    assert all(c[0] == "/foo/bar" for c in changes)
+
+    nt_server.removeEntryListener(server_cb)
+    assert not nt_server._entry_listeners
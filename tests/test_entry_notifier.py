@@ -9,6 +9,8 @@
 # These tests are adapted from ntcore's test suite
 #
 
+import threading
+
 import pytest
 
 from _pynetworktables._impl.constants import (
@@ -303,3 +305,130 @@ def test_PollPrefixLocal(notifier):
     assert not timed_out
     print(results)
     assert len(results) == 6
+
+
+def test_ListenerOrderAndRemove(notifier):
+    results = []
+    done = threading.Event()
+
+    def _cb(name):
+        return lambda data: results.append(name)
+
+    val = Value.makeDouble(1)
+
+    notifier.add(_cb("foo/bar"), "/foo/bar", NT_NOTIFY_NEW)
+    notifier.addById(_cb("id"), 5, NT_NOTIFY_NEW)
+    notifier.add(_cb("all"), "", NT_NOTIFY_NEW)
+    notifier.add(_cb("x"), "/x", NT_NOTIFY_NEW)
+    notifier.addById(_cb("other id"), 6, NT_NOTIFY_NEW)
+    h = notifier.add(_cb("fo"), "/fo", NT_NOTIFY_NEW)
+    notifier.add(_cb("foo/bar/baz/"), "/foo/bar/baz/", NT_NOTIFY_NEW)
+    notifier.add(lambda data: done.set(), "/done", NT_NOTIFY_NEW)
+
+    def _notify():
+        done.clear()
+        notifier.notifyEntry(5, "/foo/bar/baz", val, NT_NOTIFY_NEW)
+        notifier.notifyEntry(7, "/done", val, NT_NOTIFY_NEW)
+        assert done.wait(1.0)
+
+    _notify()
+
+    # listeners are called in the order that they were added, and "all"
+    # also sees the /done notification
+    assert results == ["foo/bar", "id", "all", "fo", "all"]
+    del results[:]
+
+    notifier.remove(h)
+    notifier.add(_cb("foo"), "/foo", NT_NOTIFY_NEW)
+
+    _notify()
+
+    assert results == ["foo/bar", "id", "all", "foo", "all"]
+
+
+def test_ListenerVersionThreaded(notifier):
+    # adding and removing listeners from several threads must not lose any
+    # version changes, or the notifier thread could keep a stale copy
+    notifier.start()
+    listeners = notifier.m_owner.m_listeners
+    version = listeners.version
+
+    def _work():
+        for _ in range(500):
+            h = notifier.add(lambda data: None, "/foo", NT_NOTIFY_NEW)
+            notifier.remove(h)
+
+    threads = [threading.Thread(target=_work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert listeners.version == version + 4 * 500 * 2
+    assert not listeners
+
+
+@pytest.mark.parametrize("collapse", [False, True])
+def test_Batch(notifier, collapse):
+    batches = []
+    release = threading.Event()
+
+    # hold up the notifier thread so that everything gets queued
+    notifier.add(lambda data: release.wait(1.0), "/block", NT_NOTIFY_NEW)
+    notifier.addBatch(
+        batches.append, "/foo", NT_NOTIFY_NEW | NT_NOTIFY_UPDATE, collapse
+    )
+
+    notifier.notifyEntry(0, "/block", Value.makeDouble(0), NT_NOTIFY_NEW)
+    notifier.notifyEntry(1, "/foo/a", Value.makeDouble(1), NT_NOTIFY_NEW)
+    notifier.notifyEntry(2, "/foo/b", Value.makeDouble(2), NT_NOTIFY_NEW)
+    notifier.notifyEntry(1, "/foo/a", Value.makeDouble(3), NT_NOTIFY_UPDATE)
+    notifier.notifyEntry(3, "/bar", Value.makeDouble(4), NT_NOTIFY_NEW)
+    release.set()
+
+    assert notifier.waitForQueue(1.0)
+    assert len(batches) == 1
+
+    names = [(n.name, n.value.value, n.flags) for n in batches[0]]
+    if collapse:
+        assert names == [
+            ("/foo/a", 3, NT_NOTIFY_NEW | NT_NOTIFY_UPDATE),
+            ("/foo/b", 2, NT_NOTIFY_NEW),
+        ]
+    else:
+        assert names == [
+            ("/foo/a", 1, NT_NOTIFY_NEW),
+            ("/foo/b", 2, NT_NOTIFY_NEW),
+            ("/foo/a", 3, NT_NOTIFY_UPDATE),
+        ]
+
+    # later notifications come in their own batch
+    notifier.notifyEntry(2, "/foo/b", Value.makeDouble(5), NT_NOTIFY_UPDATE)
+    assert notifier.waitForQueue(1.0)
+    assert [n.value.value for n in batches[1]] == [5]
+
+
+@pytest.mark.parametrize("conflate", [False, True])
+def test_PollBounded(notifier, conflate):
+    poller = notifier.createPoller(conflate=conflate, maxlen=3)
+    notifier.addPolled(poller, "/foo", NT_NOTIFY_UPDATE)
+
+    for i in range(10):
+        notifier.notifyEntry(1, "/foo/a", Value.makeDouble(i), NT_NOTIFY_UPDATE)
+    notifier.notifyEntry(2, "/foo/b", Value.makeDouble(10), NT_NOTIFY_UPDATE)
+    notifier.notifyEntry(1, "/foo/a", Value.makeDouble(11), NT_NOTIFY_UPDATE)
+
+    assert notifier.waitForQueue(1.0)
+
+    results, timed_out = notifier.poll(poller, 0)
+    assert not timed_out
+    values = [(r.name, r.value.value) for _, r in results]
+
+    if conflate:
+        # only the newest value of each entry, in the order last updated
+        assert values == [("/foo/b", 10), ("/foo/a", 11)]
+        assert notifier.getPollerOverflow(poller) == 10
+    else:
+        # only the newest notifications
+        assert values == [("/foo/a", 9), ("/foo/b", 10), ("/foo/a", 11)]
+        assert notifier.getPollerOverflow(poller) == 9
@@ -0,0 +1,145 @@
+#
+# Tests for the buffered message decoder used by the read thread
+#
+
+import socket
+import threading
+
+import pytest
+
+from _pynetworktables._impl.constants import NT_DOUBLE
+from _pynetworktables._impl.frame_decoder import FrameDecoder
+from _pynetworktables._impl.message import Message
+from _pynetworktables._impl.tcpsockets.tcp_stream import TCPStream, StreamEOF
+from _pynetworktables._impl.value import Value
+from _pynetworktables._impl.wire import WireCodec
+
+
+@pytest.fixture(params=[0x0200, 0x0300])
+def proto_rev(request):
+    return request.param
+
+
+@pytest.fixture
+def stream_pair():
+    rd, wr = socket.socketpair()
+    yield TCPStream(rd, "127.0.0.1", 0, "test"), wr
+    rd.close()
+    wr.close()
+
+
+def _encode(msgs, codec):
+    out = []
+    for msg in msgs:
+        msg.write(out, codec)
+    return b"".join(out)
+
+
+def _make_msgs(count):
+    return [
+        Message.entryUpdate(i, i + 1, Value.makeDouble(i * 0.5)) for i in range(count)
+    ]
+
+
+def test_decoder_batch(stream_pair, proto_rev):
+    stream, wr = stream_pair
+    codec = WireCodec(proto_rev)
+    decoder = FrameDecoder(stream, codec, lambda msg_id: NT_DOUBLE)
+
+    msgs = _make_msgs(10)
+    wr.sendall(_encode(msgs, codec))
+
+    received = []
+    while len(received) < len(msgs):
+        received += decoder.readMessages()
+
+    assert received == msgs
+
+
+def test_decoder_partial_frames(stream_pair, proto_rev):
+    stream, wr = stream_pair
+    codec = WireCodec(proto_rev)
+
+    # small buffer forces both compaction and growth of the buffer
+    decoder = FrameDecoder(stream, codec, lambda msg_id: NT_DOUBLE, bufsize=16)
+
+    msgs = _make_msgs(5)
+    msgs.append(
+        Message.entryAssign("/a/long/key/name", 5, 1, Value.makeString("x" * 100), 0)
+    )
+    data = _encode(msgs, codec)
+
+    # send a byte at a time, messages should still come out whole
+    def _send():
+        for i in range(len(data)):
+            wr.sendall(data[i : i + 1])
+
+    th = threading.Thread(target=_send)
+    th.start()
+
+    received = []
+    while len(received) < len(msgs):
+        received += decoder.readMessages()
+
+    th.join()
+
+    if proto_rev < 0x0300:
+        # flags aren't transmitted in v2
+        assert received[:-1] == msgs[:-1]
+        assert received[-1].str == msgs[-1].str
+        assert received[-1].value == msgs[-1].value
+    else:
+        assert received == msgs
+
+
+def test_decoder_v2_assign_ends_batch(stream_pair):
+    stream, wr = stream_pair
+    codec = WireCodec(0x0200)
+
+    types = {}
+    decoder = FrameDecoder(stream, codec, lambda msg_id: types.get(msg_id))
+
+    msgs = [
+        Message.entryAssign("k", 1, 1, Value.makeDouble(1), 0),
+        Message.entryUpdate(1, 2, Value.makeDouble(2)),
+    ]
+    wr.sendall(_encode(msgs, codec))
+
+    # assignment comes by itself so it can be processed first
+    batch = []
+    while not batch:
+        batch = decoder.readMessages()
+    assert [m.type for m in batch] == [msgs[0].type]
+
+    types[1] = NT_DOUBLE
+    assert decoder.readMessages() == msgs[1:]
+
+
+def test_decoder_eof(stream_pair):
+    stream, wr = stream_pair
+    decoder = FrameDecoder(stream, WireCodec(0x0300), lambda msg_id: NT_DOUBLE)
+
+    # half a message, then the remote end goes away
+    wr.sendall(_encode(_make_msgs(1), decoder.m_codec)[:3])
+    wr.close()
+
+    with pytest.raises(StreamEOF):
+        decoder.readMessages()
+
+
+def test_decoder_feed(proto_rev):
+    codec = WireCodec(proto_rev)
+    decoder = FrameDecoder(None, codec, lambda msg_id: NT_DOUBLE, bufsize=16)
+
+    msgs = _make_msgs(5)
+    data = _encode(msgs, codec)
+
+    # nothing is returned until a message is complete
+    assert decoder.parseMessages() == []
+    decoder.feed(data[:3])
+    assert decoder.parseMessages() == []
+
+    # feeding more than fits in the buffer grows it
+    decoder.feed(data[3:])
+    assert decoder.parseMessages() == msgs
+    assert decoder.parseMessages() == []
@@ -2,6 +2,8 @@
 # These tests are leftover from the original pynetworktables tests
 #
 
+from array import array
+
 import pytest
 
 
@@ -168,3 +170,50 @@ def test_different_type(table1):
 
     assert not table1.putNumber("foo", 1)
     assert table1.getBoolean("foo", None) == True
+
+
+def test_put_numbers(table1):
+
+    assert table1.putNumbers(["a", "b"], [1, 2.5])
+    assert table1.getNumber("a", None) == 1.0
+    assert table1.getNumber("b", None) == 2.5
+
+    # keys with a different type are left alone
+    table1.putString("s", "x")
+    assert not table1.putNumbers(["s", "c"], array("d", [3, 4]))
+    assert table1.getString("s", None) == "x"
+    assert table1.getNumber("c", None) == 4.0
+
+    with pytest.raises(ValueError):
+        table1.putNumbers(["a"], [1, 2])
+
+
+def test_get_numbers(table1):
+    np = pytest.importorskip("numpy")
+
+    table1.putNumbers(["a", "b"], np.array([1.5, 2.5]))
+    table1.putString("s", "x")
+
+    values = table1.getNumbers(["a", "b", "s", "missing"], -1)
+    assert values.dtype == np.float64
+    assert values.tolist() == [1.5, 2.5, -1, -1]
+
+
+def test_number_array_view(table1):
+    np = pytest.importorskip("numpy")
+
+    a = np.arange(4, dtype=np.float64)
+    table1.putNumberArray("compact", a)
+    a[0] = 42
+
+    view = table1.getNumberArrayView("compact")
+    assert view.tolist() == [0, 1, 2, 3]
+    assert not view.flags.writeable
+
+    # the view shares the memory of the stored value
+    assert view.base is not None
+    assert table1.getNumberArray("compact", None) == (0, 1, 2, 3)
+
+    table1.putNumberArray("tuple", [1, 2])
+    assert table1.getNumberArrayView("tuple").tolist() == [1, 2]
+    assert table1.getNumberArrayView("missing", "x") == "x"
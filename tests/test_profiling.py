@@ -0,0 +1,107 @@
+#
+# Tests for the hot path profiling hooks
+#
+
+import threading
+
+import pytest
+
+from _pynetworktables._impl.support import profiling
+
+
+@pytest.fixture
+def profile():
+    profiling.reset()
+    profiling.enable()
+    yield profiling
+    profiling.enable(False)
+    profiling.reset()
+
+
+def test_histogram():
+    hist = profiling.Histogram()
+    for ns in (0, 1, 3, 4, 1000):
+        hist.record(ns)
+
+    assert hist.count == 5
+    assert hist.total == 1008
+    assert hist.max == 1000
+    assert hist.counts[:4] == [1, 1, 1, 1]
+    assert hist.counts[10] == 1
+
+
+def test_timed(profile):
+    fn = profile.timed(lambda a, b: a + b, "test.timed")
+    assert fn(1, 2) == 3
+
+    stats = profile.get_stats()["test.timed"]
+    assert stats["count"] == 1
+    assert sum(stats["buckets"].values()) == 1
+
+
+def test_register_lock():
+    class Owner(object):
+        pass
+
+    owner = Owner()
+    lock = owner.m_mutex = threading.Lock()
+    profiling.register_lock(owner, "m_mutex", "test.lock_wait")
+
+    try:
+        # only wrapped while enabled
+        assert owner.m_mutex is lock
+
+        profiling.enable()
+        with owner.m_mutex:
+            assert lock.locked()
+        assert not lock.locked()
+        assert profiling.get_stats()["test.lock_wait"]["count"] == 1
+    finally:
+        profiling.enable(False)
+        profiling.reset()
+
+    assert owner.m_mutex is lock
+
+
+def test_prometheus(profile):
+    hist = profile.histogram("test.prom")
+    hist.record(3)
+    hist.record(5)
+
+    text = profile.to_prometheus()
+    metric = "networktables_duration_seconds"
+    assert "# TYPE %s histogram" % metric in text
+    assert '%s_bucket{path="test.prom",le="4e-09"} 1' % metric in text
+    assert '%s_bucket{path="test.prom",le="8e-09"} 2' % metric in text
+    assert '%s_bucket{path="test.prom",le="+Inf"} 2' % metric in text
+    assert '%s_count{path="test.prom"} 2' % metric in text
+
+
+def test_profile_live(profile, nt_live):
+    nt_server, nt_client = nt_live
+
+    nt_client.getEntry("/cb").addListener(
+        lambda *args: None, nt_client.NotifyFlags.UPDATE | nt_client.NotifyFlags.NEW
+    )
+
+    # the first value may arrive during the handshake
+    with nt_client.expect_changes(1):
+        nt_server.getEntry("/cb").setDouble(1)
+
+    with nt_client.expect_changes(1):
+        nt_server.getEntry("/cb").setDouble(2)
+
+    assert nt_client.waitForEntryListenerQueue(1.0)
+
+    stats = nt_client.getProfile()
+    for name in (
+        "storage.process_incoming",
+        "storage.lock_wait",
+        "dispatcher.lock_wait",
+        "wire.encode",
+        "wire.decode",
+        "callback.entry-notifier",
+    ):
+        assert stats[name]["count"] > 0, name
+
+    assert "storage.process_incoming" in nt_client.getProfileText()
@@ -0,0 +1,49 @@
+#
+# Tests for the adaptive per-connection send interval
+#
+
+import pytest
+
+from _pynetworktables._impl.send_scheduler import SendScheduler
+
+
+def _run(sched, now, backlog, rtt=None):
+    assert sched.isDue(now)
+    sched.sent(now, backlog, rtt, 0.01, 0.5)
+    return sched.interval
+
+
+def test_scheduler_fast():
+    sched = SendScheduler()
+    now = 0
+    for _ in range(10):
+        assert _run(sched, now, False) == 0.01
+        now += 0.01
+
+
+def test_scheduler_backoff_recover():
+    sched = SendScheduler()
+    now = 0
+
+    intervals = []
+    for _ in range(8):
+        intervals.append(_run(sched, now, True))
+        assert not sched.isDue(now + intervals[-1] * 0.4)
+        now += intervals[-1]
+
+    assert intervals == pytest.approx([0.02, 0.04, 0.08, 0.16, 0.32, 0.5, 0.5, 0.5])
+
+    # once the backlog is gone it comes back down to the minimum
+    for _ in range(20):
+        now += _run(sched, now, False)
+
+    assert sched.interval == 0.01
+
+
+def test_scheduler_rtt():
+    sched = SendScheduler()
+
+    # never faster than the round trip time, but never slower than the max
+    assert _run(sched, 0, False, rtt=0.1) == 0.1
+    assert _run(sched, 1, False, rtt=2) == 0.5
+    assert _run(sched, 2, False, rtt=0.001) == 0.375
@@ -0,0 +1,54 @@
+#
+# Tests for the immutable mapping used by storage snapshots
+#
+
+from _pynetworktables._impl.support.snapshot_dict import SnapshotDict
+
+
+def test_snapshot_dict_updated():
+    d = SnapshotDict({"a": 1, "b": 2})
+    assert len(d) == 2
+    assert d["a"] == 1
+    assert d.get("c") is None
+    assert "b" in d and "c" not in d
+
+    d2 = d.updated({"a": 3, "b": None, "c": 4, "missing": None})
+    assert dict(d2.items()) == {"a": 3, "c": 4}
+    assert len(d2) == 2
+
+    # the old mapping is left alone
+    assert dict(d.items()) == {"a": 1, "b": 2}
+    assert d.updated({}) is d
+
+
+def test_snapshot_dict_shares_buckets():
+    d = SnapshotDict((str(i), i) for i in range(1000))
+    nbuckets = len(d.m_buckets)
+    assert nbuckets * nbuckets >= 1000
+
+    d2 = d.updated({"5": -5})
+    assert d2["5"] == -5 and d["5"] == 5
+
+    # only the bucket with the changed key is copied
+    shared = [b1 is b2 for b1, b2 in zip(d.m_buckets, d2.m_buckets)]
+    assert shared.count(False) == 1
+
+
+def test_snapshot_dict_grows():
+    d = SnapshotDict()
+    expected = {}
+    for i in range(2000):
+        changes = {i: i * 2}
+        if i % 3 == 2:
+            changes[i // 3] = None
+        d = d.updated(changes)
+
+        expected[i] = i * 2
+        if i % 3 == 2:
+            expected.pop(i // 3, None)
+
+    assert dict(d.items()) == expected
+    assert len(d) == len(expected)
+    assert sorted(d) == sorted(d.keys()) == sorted(expected)
+    assert sorted(d.values()) == sorted(expected.values())
+    assert len(d.m_buckets) ** 2 >= len(d)
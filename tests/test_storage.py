@@ -23,12 +23,14 @@ from _pynetworktables._impl.constants import (
     NT_PERSISTENT,
     NT_BOOLEAN,
     NT_DOUBLE,
+    NT_STRING,
     NT_NOTIFY_IMMEDIATE,
     NT_NOTIFY_LOCAL,
     NT_NOTIFY_NEW,
     NT_NOTIFY_DELETE,
     NT_NOTIFY_UPDATE,
     NT_NOTIFY_FLAGS,
+    NT_UNASSIGNED,
 )
 
 from _pynetworktables._impl.dispatcher import Dispatcher
@@ -38,6 +40,7 @@ from _pynetworktables._impl.network_connection import NetworkConnection
 from _pynetworktables._impl.rpc_server import RpcServer
 from _pynetworktables._impl.storage import Storage
 from _pynetworktables._impl.value import Value
+from _pynetworktables._impl.wire import WireCodec
 
 
 @pytest.fixture
@@ -681,9 +684,7 @@ def test_deleteAllEntries(storage_populated, dispatcher, entry_notifier):
 def test_DeleteAllEntriesPersistent(storage_populated, dispatcher, entry_notifier):
     storage = storage_populated
 
-    entry = storage.m_entries.get("foo2")
-    entry.flags = NT_PERSISTENT
-    entry.isPersistent = True
+    storage.setEntryFlags("foo2", NT_PERSISTENT)
     storage.deleteAllEntries()
     assert len(storage.getEntries("", 0)) == 1
     assert "foo2" in storage.m_entries
@@ -747,6 +748,327 @@ def test_GetEntryInfoPrefixTypes(storage_populated):
     assert NT_BOOLEAN == info[0].type
 
 
+def test_GetEntryValuesPrefix(storage_empty):
+    storage = storage_empty
+
+    for name in ("/a/b", "/a", "/a0", "/a/", "/b/a", "/", "/a/b/c", "/A"):
+        storage.setEntryTypeValue(name, Value.makeDouble(1))
+
+    # entry without a value is skipped
+    storage.getEntryId("/a/d")
+
+    assert [name for name, _ in storage.getEntryValues("/a/")] == [
+        "/a/",
+        "/a/b",
+        "/a/b/c",
+    ]
+    assert [name for name, _ in storage.getEntryValues("/a")] == [
+        "/a",
+        "/a/",
+        "/a/b",
+        "/a/b/c",
+        "/a0",
+    ]
+    assert storage.getEntryValues("/c") == []
+    assert len(storage.getEntryValues("")) == 8
+
+
+def test_GetInitialAssignmentsEncoded(storage_empty, conn):
+    storage = storage_empty
+    codec = WireCodec(0x0300)
+
+    def expected(name):
+        e = storage.m_entries[name]
+        out = []
+        Message.entryAssign(name, e.id, e.seq_num, e.value, e.flags).write(out, codec)
+        return b"".join(out)
+
+    def assignments():
+        msgs = []
+        storage.getInitialAssignments(conn, msgs)
+        assert len(msgs) == 1
+        return msgs[0]
+
+    # nothing to send for an empty storage
+    msgs = []
+    storage.getInitialAssignments(conn, msgs)
+    assert msgs == []
+
+    storage.setEntryTypeValue("foo", Value.makeDouble(1))
+    storage.setEntryTypeValue("bar", Value.makeString("x"))
+
+    msg = assignments()
+    assert msg.type == kEntryAssign
+    parts = storage.m_assignments[0x0300].parts
+    assert parts == {"foo": expected("foo"), "bar": expected("bar")}
+
+    out = []
+    msg.write(out, codec)
+    assert out == [b"".join(parts.values())]
+
+    # the same encoding is sent to every client until something changes
+    assert assignments() is msg
+
+    # then only the changed entries are encoded again
+    bar = parts["bar"]
+    storage.setEntryValue("foo", Value.makeDouble(2))
+    storage.setEntryTypeValue("baz", Value.makeBoolean(True))
+    assert assignments() is not msg
+    assert parts["foo"] == expected("foo")
+    assert parts["bar"] is bar
+    assert parts["baz"] == expected("baz")
+
+    storage.deleteEntry("bar")
+    msg = assignments()
+    assert sorted(parts) == ["baz", "foo"]
+
+    # each protocol revision has its own encoding
+    conn.get_proto_rev.return_value = 0x0200
+    assert assignments() is not msg
+    with pytest.raises(ValueError):
+        msg.write([], WireCodec(0x0200))
+
+
+def test_GetEntryValuesSnapshot(storage_empty):
+    storage = storage_empty
+
+    storage.setEntryTypeValue("/a", Value.makeDouble(1))
+    storage.setEntryTypeValue("/b", Value.makeDouble(2))
+    assert storage.getEntryValues("/") == [
+        ("/a", Value.makeDouble(1)),
+        ("/b", Value.makeDouble(2)),
+    ]
+
+    # unchanged storage reuses the snapshot
+    snapshot = storage.m_snapshot
+    storage.getEntryValues("/")
+    assert storage.m_snapshot is snapshot
+
+    # changes are copied into a new snapshot, the old one is left alone
+    storage.setEntryTypeValue("/a", Value.makeDouble(3))
+    storage.deleteEntry("/b")
+    storage.setEntryTypeValue("/c", Value.makeDouble(4))
+    assert storage.getEntryValues("/") == [
+        ("/a", Value.makeDouble(3)),
+        ("/c", Value.makeDouble(4)),
+    ]
+    assert storage.m_snapshot is not snapshot
+    assert snapshot.entries["/a"].value == Value.makeDouble(1)
+    assert "/b" in snapshot.entries
+    assert not storage.m_changed
+
+    # writers only queue their changes, and the next reader folds all of
+    # them into one snapshot without taking the lock
+    snapshot = storage.m_snapshot
+    storage.setEntryTypeValue("/a", Value.makeDouble(6))
+    storage.setEntryTypeValue("/a", Value.makeDouble(5))
+    assert storage.m_snapshot is snapshot
+    with storage.m_mutex:
+        assert storage.getEntryValues("/") == [
+            ("/a", Value.makeDouble(5)),
+            ("/c", Value.makeDouble(4)),
+        ]
+
+
+def test_ReadsWithoutLock(storage_empty):
+    storage = storage_empty
+
+    storage.setEntryTypeValue("/a", Value.makeDouble(1))
+    storage.setEntryFlags("/a", NT_PERSISTENT)
+    local_id = storage.getEntryId("/a")
+
+    # single entry reads don't wait for the storage lock
+    with storage.m_mutex:
+        assert storage.getEntryValue("/a") == Value.makeDouble(1)
+        assert storage.getEntryValue("/missing") is None
+        assert storage.getEntryTypeById(local_id) == NT_DOUBLE
+        assert storage.getEntryTypeById(1000) == NT_UNASSIGNED
+        assert storage.getEntryFlags("/a") == NT_PERSISTENT
+        assert storage.getEntryFlagsById(local_id) == NT_PERSISTENT
+        assert storage.getEntryNameById(local_id) == "/a"
+        assert storage.getEntryInfoById(local_id) == ("/a", NT_DOUBLE, NT_PERSISTENT)
+
+
+def test_EntryInfoPublished(storage_empty, is_server, conn):
+    storage = storage_empty
+    entry_id = 0xFFFF if is_server else 0
+
+    def info():
+        return storage.getEntryInfoById(storage.getEntryId("foo"))
+
+    assert info() == ("foo", NT_UNASSIGNED, 0)
+
+    value = Value.makeDouble(1.0)
+    storage.processIncoming(Message.entryAssign("foo", entry_id, 0, value, 0x2), conn)
+    first = info()
+    assert first == ("foo", NT_DOUBLE, 0x2)
+
+    # the record is only replaced when the type or flags change
+    storage.processIncoming(Message.entryUpdate(0, 1, Value.makeDouble(2.0)), conn)
+    assert info() is first
+
+    storage.processIncoming(Message.flagsUpdate(0, 0), conn)
+    assert info() == ("foo", NT_DOUBLE, 0)
+
+    storage.setEntryTypeValue("foo", Value.makeString("x"))
+    assert info() == ("foo", NT_STRING, 0)
+
+    storage.processIncoming(Message.entryDelete(0), conn)
+    assert info() == ("foo", NT_UNASSIGNED, 0)
+
+
+@pytest.fixture
+def storage_pair():
+    """A server storage and a client storage that has its entries"""
+    storages = []
+    for is_server in (True, False):
+        rpc_server = Mock(spec=RpcServer)
+        entry_notifier = Mock(spec=EntryNotifier)
+        entry_notifier.m_local_notifiers = False
+        storage = Storage(entry_notifier, rpc_server, FakeUserEntry)
+        storage.setDispatcher(Mock(spec=Dispatcher), is_server)
+        storages.append((storage, rpc_server))
+
+    yield storages[0][0], storages[1][0]
+
+    for storage, rpc_server in storages:
+        rpc_server.stop()
+        storage.stop()
+
+
+def sync_storages(server, client, conn):
+    msgs = [
+        Message.entryAssign(e.name, e.id, e.seq_num, e.value, e.flags)
+        for e in server.m_entries.values()
+        if e.value is not None
+    ]
+    client.applyInitialAssignments(conn, msgs, False, [])
+
+
+def test_ResumedAssignments(storage_pair, conn):
+    server, client = storage_pair
+
+    server.setEntryTypeValue("a", Value.makeDouble(1))
+    server.setEntryTypeValue("b", Value.makeDouble(2))
+    server.setEntryTypeValue("c", Value.makeDouble(3))
+    sync_storages(server, client, conn)
+
+    state = client.getResumeState()
+    assert len(state) == 27
+
+    # changes while the client was disconnected
+    c_id = server.m_entries["c"].id
+    server.setEntryValue("b", Value.makeDouble(20))
+    server.deleteEntry("c")
+    server.setEntryTypeValue("e", Value.makeDouble(5))
+
+    msgs = []
+    assert server.getResumedAssignments(conn, state, msgs)
+    assert msgs[0] == Message.entryDelete(c_id)
+    assert sorted((msg.type, msg.str, msg.id) for msg in msgs[1:]) == [
+        (kEntryAssign, "b", server.m_entries["b"].id),
+        (kEntryAssign, "e", server.m_entries["e"].id),
+    ]
+
+    # only the changes are applied and notified
+    notifier = client.m_notifier
+    notifier.reset_mock()
+    out = []
+    client.applyResumedAssignments(conn, msgs, state, out)
+    assert out == []
+    assert client.getEntryValue("a") == Value.makeDouble(1)
+    assert client.getEntryValue("b") == Value.makeDouble(20)
+    assert client.getEntryValue("c") is None
+    assert client.getEntryValue("e") == Value.makeDouble(5)
+    assert {c[1][1]: c[1][3] for c in notifier.notifyEntry.mock_calls} == {
+        "b": NT_NOTIFY_UPDATE,
+        "c": NT_NOTIFY_DELETE,
+        "e": NT_NOTIFY_NEW,
+    }
+    assert notifier.notifyEntry.call_count == 3
+    assert {e.name: e.id for e in client.m_idmap if e} == {
+        name: e.id for name, e in server.m_entries.items() if e.value is not None
+    }
+
+    # a state that can't be decoded gets the full assignments instead
+    assert not server.getResumedAssignments(conn, state[:-1], [])
+
+
+def test_ResumedAssignmentsSameSeqNum(storage_pair, conn):
+    server, client = storage_pair
+
+    server.setEntryTypeValue("a", Value.makeDouble(1))
+    server.setEntryTypeValue("b", Value.makeString("b"))
+    sync_storages(server, client, conn)
+    state = client.getResumeState()
+
+    # while the client was away, another client assigned new values without
+    # advancing the sequence numbers, which the server accepts
+    for name, value in (("a", Value.makeDouble(2)), ("b", Value.makeString("c"))):
+        e = server.m_entries[name]
+        server.processIncoming(
+            Message.entryAssign(name, e.id, e.seq_num, value, e.flags), conn
+        )
+        assert server.getEntryValue(name) == value
+
+    # so the client is sent the entries again instead of keeping stale values
+    msgs = []
+    assert server.getResumedAssignments(conn, state, msgs)
+    assert sorted(msg.str for msg in msgs) == ["a", "b"]
+
+    client.applyResumedAssignments(conn, msgs, state, [])
+    assert client.getEntryValue("a") == Value.makeDouble(2)
+    assert client.getEntryValue("b") == Value.makeString("c")
+
+    # and an unchanged client isn't
+    msgs = []
+    assert server.getResumedAssignments(conn, client.getResumeState(), msgs)
+    assert msgs == []
+
+
+def test_ResumedAssignmentsLocalWrites(storage_pair, conn):
+    server, client = storage_pair
+
+    server.setEntryTypeValue("a", Value.makeDouble(1))
+    server.setEntryTypeValue("b", Value.makeDouble(2))
+    server.setEntryTypeValue("c", Value.makeDouble(3))
+    sync_storages(server, client, conn)
+
+    # entries written by the client aren't in the state
+    client.setEntryValue("a", Value.makeDouble(10))
+    state = client.getResumeState()
+    assert len(state) == 18
+
+    # changes made after the state was taken are sent to the server
+    client.setEntryValue("b", Value.makeDouble(20))
+    client.setEntryFlags("c", NT_PERSISTENT)
+    client.setEntryTypeValue("d", Value.makeDouble(4))
+
+    # the server deleted the client's entry
+    server.deleteEntry("a")
+
+    msgs = []
+    assert server.getResumedAssignments(conn, state, msgs)
+    assert msgs == []
+
+    queue_outgoing = client.m_dispatcher._queueOutgoing
+    queue_outgoing.reset_mock()
+    out = []
+    client.applyResumedAssignments(conn, msgs, state, out)
+
+    b = client.m_entries["b"]
+    assert queue_outgoing.mock_calls == [
+        call(Message.entryUpdate(b.id, b.seq_num, b.value), None, None),
+        call(Message.flagsUpdate(client.m_entries["c"].id, NT_PERSISTENT), None, None),
+    ]
+
+    # and the entries that the server doesn't have are assigned again
+    assert sorted((msg.type, msg.str, msg.id) for msg in out) == [
+        (kEntryAssign, "a", 0xFFFF),
+        (kEntryAssign, "d", 0xFFFF),
+    ]
+
+
 def test_SavePersistentEmpty(storage_persistent):
     storage = storage_persistent
 
@@ -760,9 +1082,8 @@ def test_SavePersistentEmpty(storage_persistent):
 def test_savePersistent(storage_persistent):
     storage = storage_persistent
 
-    for e in storage.m_entries.values():
-        e.flags = NT_PERSISTENT
-        e.isPersistent = True
+    for name in list(storage.m_entries):
+        storage.setEntryFlags(name, NT_PERSISTENT)
 
     fp = StringIO()
     storage.savePersistent(fp=fp, periodic=False)
@@ -923,9 +1244,7 @@ def test_LoadPersistentUpdateValue(
 ):
     storage = storage_populated
 
-    entry = storage.m_entries.get("foo2")
-    entry.flags = NT_PERSISTENT
-    entry.isPersistent = True
+    storage.setEntryFlags("foo2", NT_PERSISTENT)
 
     fp = StringIO('[NetworkTables Storage 3.0]\ndouble "foo2"=1.0\n')
     assert storage.loadPersistent(fp=fp) is None
@@ -1058,6 +1377,61 @@ def test_loadPersistent(storage_empty, dispatcher, entry_notifier):
     assert Value.makeBoolean(True) == storage.getEntryValue("CaseSensitive/KeyName")
 
 
+def test_savePersistentWithoutLock(storage_persistent):
+    storage = storage_persistent
+    storage.setEntryFlags("boolean/true", NT_PERSISTENT)
+
+    reads = []
+
+    class _Entries(dict):
+        def values(self):
+            # the entries are read without blocking writers
+            reads.append(storage.m_mutex.locked())
+            return dict.values(self)
+
+    snapshot = storage._getSnapshot()
+    storage.m_snapshot = snapshot._replace(entries=_Entries(snapshot.entries))
+
+    fp = StringIO()
+    storage.savePersistent(fp=fp, periodic=False)
+    assert fp.getvalue() == (
+        '[NetworkTables Storage 3.0]\nboolean "boolean/true"=true\n\n'
+    )
+    assert reads == [False]
+
+
+def test_SaveLoadPersistentLog(storage_persistent, tmp_path, dispatcher):
+    storage = storage_persistent
+    filename = str(tmp_path / "networktables.ntlog")
+
+    for name in list(storage.m_entries):
+        storage.setEntryFlags(name, NT_PERSISTENT)
+
+    assert storage.savePersistent(filename) is None
+    entries = storage.getEntryValues("")
+
+    # periodic saves only append the changes
+    size = (tmp_path / "networktables.ntlog").stat().st_size
+    storage.setEntryTypeValue("double/zero", Value.makeDouble(1))
+    assert storage.savePersistent(filename, periodic=True) is None
+    assert (tmp_path / "networktables.ntlog").stat().st_size - size < 64
+
+    storage.deleteAllEntries()
+    storage.setEntryTypeValue("double/zero", Value.makeDouble(0))
+    assert storage.loadPersistent(filename) is None
+
+    assert storage.getEntryValues("") == [
+        (name, Value.makeDouble(1)) if name == "double/zero" else (name, value)
+        for name, value in entries
+    ]
+    assert storage.getEntryFlags("raw/normal") == NT_PERSISTENT
+
+    # INI export is still available
+    fp = StringIO()
+    assert storage.saveEntries("double/", fp=fp) is None
+    assert 'double "double/zero"=1.0' in fp.getvalue()
+
+
 def test_LoadPersistentWarn(storage_empty, dispatcher, entry_notifier):
     storage = storage_empty
 
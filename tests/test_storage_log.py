@@ -0,0 +1,156 @@
+#
+# Tests for the binary persistent storage log
+#
+
+import pytest
+
+from _pynetworktables._impl.storage_log import (
+    LOG_MAGIC,
+    LogFormatError,
+    PersistentLog,
+    is_log_filename,
+)
+from _pynetworktables._impl.value import Value
+
+
+@pytest.fixture
+def logfile(tmp_path):
+    return str(tmp_path / "networktables.ntlog")
+
+
+def _entries():
+    return sorted(
+        [
+            ("boolean", Value.makeBoolean(True)),
+            ("double", Value.makeDouble(-1.5)),
+            ("string", Value.makeString("hello\n\0")),
+            ("raw", Value.makeRaw(b"\0\3\5\n")),
+            ("booleanarr", Value.makeBooleanArray([True, False])),
+            # arrays aren't limited to 255 elements like on the wire
+            ("doublearr", Value.makeDoubleArray([i * 0.5 for i in range(300)])),
+            ("stringarr", Value.makeStringArray(["hello", "", "world"])),
+            ("emptyarr", Value.makeStringArray([])),
+            ("\0\3\5\n", Value.makeBoolean(False)),
+        ]
+    )
+
+
+def test_log_filename():
+    assert is_log_filename("networktables.ntlog")
+    assert not is_log_filename("networktables.ini")
+    assert not is_log_filename(None)
+
+
+def test_log_round_trip(logfile):
+    entries = _entries()
+    assert PersistentLog(logfile).save(entries) is None
+    assert PersistentLog(logfile).load() == entries
+
+
+def test_log_append(logfile):
+    entries = _entries()
+    log = PersistentLog(logfile)
+    log.save(entries)
+
+    with open(logfile, "rb") as fp:
+        data = fp.read()
+
+    # nothing changed, nothing is written
+    log.save(entries)
+    with open(logfile, "rb") as fp:
+        assert fp.read() == data
+
+    # only the changes are appended
+    entries = dict(entries)
+    entries["double"] = Value.makeDouble(2)
+    del entries["raw"]
+    entries = sorted(entries.items())
+    log.save(entries)
+
+    with open(logfile, "rb") as fp:
+        appended = fp.read()
+
+    assert appended.startswith(data)
+    assert len(appended) - len(data) < 64
+    assert log.m_records == len(_entries()) + 2
+    assert PersistentLog(logfile).load() == entries
+
+
+def test_log_compact(logfile):
+    log = PersistentLog(logfile)
+    for i in range(1000):
+        entries = [("a", Value.makeDouble(i)), ("b", Value.makeDouble(0))]
+        assert log.save(entries) is None
+
+    # old values were compacted away
+    assert log.m_records < 300
+
+    log2 = PersistentLog(logfile)
+    assert log2.load() == entries
+    assert log2.m_records == log.m_records
+
+
+def test_log_compact_reuses_records(logfile):
+    log = PersistentLog(logfile)
+    entries = _entries()
+    log.save(entries)
+    records = dict(log.m_records_data)
+
+    # unchanged values aren't encoded again when the log is compacted
+    log.m_size = None
+    assert log.save(entries) is None
+    assert all(log.m_records_data[name] is records[name] for name, _ in entries)
+    assert PersistentLog(logfile).load() == entries
+
+    # and a loaded log encodes them once, on the first save
+    log2 = PersistentLog(logfile)
+    log2.load()
+    log2.m_size = None
+    assert log2.save(entries) is None
+    assert log2.m_records_data == records
+    assert PersistentLog(logfile).load() == entries
+
+
+def test_log_torn_write(logfile):
+    entries = _entries()
+    log = PersistentLog(logfile)
+    log.save(entries)
+    log.save(entries + [("zzz", Value.makeDouble(2))])
+
+    # chop off part of the last record
+    with open(logfile, "rb") as fp:
+        data = fp.read()
+    with open(logfile, "wb") as fp:
+        fp.write(data[:-3])
+
+    # the incomplete record is ignored, and overwritten by the next save
+    log = PersistentLog(logfile)
+    assert log.load() == entries
+
+    entries = [("x", Value.makeString("y"))] + entries
+    log.save(entries)
+    assert PersistentLog(logfile).load() == sorted(entries)
+
+
+def test_log_bad_header(logfile):
+    with open(logfile, "wb") as fp:
+        fp.write(b"[NetworkTables Storage 3.0]\n")
+
+    with pytest.raises(LogFormatError):
+        PersistentLog(logfile).load()
+
+    with open(logfile, "wb") as fp:
+        pass
+
+    with pytest.raises(LogFormatError):
+        PersistentLog(logfile).load()
+
+
+def test_log_empty(logfile):
+    log = PersistentLog(logfile)
+    log.save([])
+
+    with open(logfile, "rb") as fp:
+        assert fp.read() == LOG_MAGIC
+
+    assert PersistentLog(logfile).load() == []
@@ -575,3 +575,73 @@ def test_sync_disconnect_write_by_both_both_prev(nt_server, nt_client):
     # more writes succeed
     assert ct.getString("foo", None) == "5"
     assert st.getString("foo", None) == "5"
+
+
+#
+# Resuming after disconnect
+#
+
+
+def test_sync_resume(nt_server, nt_client):
+    """
+    Client resumes its session after a disconnect
+
+    | Action           | Global NT state | Notes
+    | ---------------- | --------------- | -----
+    | server a=1 b=2 c=3
+    | connected        | a=1 b=2 c=3
+    | disconnect
+    | server b=20
+    | server delete c
+    | server d=4
+    | client e=5
+    | connected        | a=1 b=20 d=4 e=5 | a isn't sent again (3.0 only)
+    """
+    nt_client.enableResume()
+
+    ct = nt_client.getTable("table")
+    st = nt_server.getTable("table")
+
+    st.putNumber("a", 1)
+    st.putNumber("b", 2)
+    st.putNumber("c", 3)
+
+    nt_server.start_test()
+    with nt_client.expect_changes(3):
+        nt_client.start_test()
+
+    nt_client.disconnect()
+    st.putNumber("b", 20)
+    st.delete("c")
+    st.putNumber("d", 4)
+    ct.putNumber("e", 5)
+
+    # without resumption, the client is also notified of a
+    resumed = nt_server.proto_rev == 0x0300 and nt_client.proto_rev == 0x0300
+    changes = 3 if resumed else 4
+
+    with nt_server.expect_changes(1):
+        with nt_client.expect_changes(changes):
+            nt_client.start_test()
+
+    assert nt_client.waitForEntryListenerQueue(1)
+    assert nt_client._wait == changes
+
+    for t in (ct, st):
+        assert t.getNumber("a", None) == 1
+        assert t.getNumber("b", None) == 20
+        assert not t.containsKey("c")
+        assert t.getNumber("d", None) == 4
+        assert t.getNumber("e", None) == 5
+
+    # a restarted server has a new session, so everything is sent again (e was
+    # written by the client, so it is sent back instead)
+    nt_server.disconnect()
+    with nt_server.expect_changes(1):
+        with nt_client.expect_changes(3):
+            nt_server.start_test()
+
+    with nt_server.expect_changes(1):
+        ct.putNumber("a", 10)
+
+    assert st.getNumber("a", None) == 10
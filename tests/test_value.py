@@ -9,6 +9,8 @@
 # These tests are adapted from ntcore's test suite
 #
 
+from array import array
+
 from _pynetworktables._impl.constants import (
     NT_BOOLEAN,
     NT_DOUBLE,
@@ -18,6 +20,7 @@ from _pynetworktables._impl.constants import (
     NT_DOUBLE_ARRAY,
     NT_STRING_ARRAY,
 )
+from _pynetworktables._impl.double_array import DoubleArray
 from _pynetworktables._impl.value import Value
 
 
@@ -142,6 +145,55 @@ def test_DoubleArrayComparison():
     assert v1 != v2
 
 
+def test_DoubleArrayCompact():
+    a = array("d", [0.5, 0.25, 0.5])
+    v = Value.makeDoubleArray(a)
+    assert NT_DOUBLE_ARRAY == v.type
+    assert isinstance(v.value, DoubleArray)
+
+    # copied, so changing the input doesn't change the value
+    a[0] = 1
+    assert (0.5, 0.25, 0.5) == v.value
+    assert [0.5, 0.25, 0.5] == v.value
+    assert hash((0.5, 0.25, 0.5)) == hash(v.value)
+    assert 0.5 == v.value[0]
+    assert DoubleArray([0.25, 0.5]) == v.value[1:]
+    assert [0.5, 0.25, 0.5] == v.value.view().tolist()
+
+    # compares equal to the tuple based value
+    assert v == Value.makeDoubleArray([0.5, 0.25, 0.5])
+    assert v != Value.makeDoubleArray([0.5, 0.5, 0.5])
+    assert v == Value.makeDoubleArray(DoubleArray(v.value))
+
+    # other numeric arrays are converted
+    v = Value.makeDoubleArray(array("i", [1, 2]))
+    assert (1.0, 2.0) == v.value
+
+    # putValue picks the double array factory for arrays
+    assert Value.getFactory(array("d", [1])) == Value.makeDoubleArray
+
+
+def test_DoubleArrayCompactNaN():
+    nan = float("nan")
+    t = Value.makeDoubleArray([0.5, nan])
+    v = Value.makeDoubleArray(array("d", [0.5, nan]))
+
+    # same as a tuple of the same NaN object, which is equal to itself
+    assert t == Value.makeDoubleArray([0.5, nan])
+    assert v == t and t == v
+    assert not v != t
+    assert v == Value.makeDoubleArray(array("d", [0.5, nan]))
+    assert v == v
+    assert [0.5, nan] == v.value
+    assert hash(v.value) == hash(DoubleArray([0.5, nan]))
+
+    # other elements are still compared
+    assert v != Value.makeDoubleArray([0.25, nan])
+    assert v != Value.makeDoubleArray(array("d", [0.25, nan]))
+    assert v != Value.makeDoubleArray(array("d", [0.5, nan, 0.5]))
+    assert v != Value.makeDoubleArray(array("d", [0.5, 0.5]))
+
+
 def test_StringArrayComparison():
     v1 = Value.makeStringArray(["hello", "goodbye", "string"])
     v2 = Value.makeStringArray(("hello", "goodbye", "string"))
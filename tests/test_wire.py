@@ -4,11 +4,12 @@
 
 from __future__ import print_function
 
+from array import array
 from io import BytesIO
 
 import pytest
 
-from _pynetworktables._impl.message import Message
+from _pynetworktables._impl.message import CachedMessage, Message
 from _pynetworktables._impl.value import Value
 from _pynetworktables._impl.tcpsockets.tcp_stream import TCPStream, StreamEOF
 from _pynetworktables._impl.wire import WireCodec
@@ -102,6 +103,31 @@ def test_wire_doubleArray3(v_round_trip):
     v_round_trip(Value.makeDoubleArray([0] * 255))
 
 
+def test_wire_doubleArray4(v_round_trip):
+    v_round_trip(Value.makeDoubleArray([i * 0.25 - 10 for i in range(255)]))
+
+
+def test_wire_doubleArrayCompact(v_round_trip):
+    v_round_trip(Value.makeDoubleArray(array("d", [i * 0.25 - 10 for i in range(255)])))
+
+
+def test_wire_array_truncated(proto_rev):
+    # arrays longer than 255 elements are truncated on the wire
+    codec = WireCodec(proto_rev)
+
+    for v in (
+        Value.makeBooleanArray([True, False] * 150),
+        Value.makeDoubleArray(range(300)),
+        Value.makeDoubleArray(array("d", range(300))),
+    ):
+        out = []
+        codec.write_value(v, out)
+        rstream = ReadStream(BytesIO(b"".join(out)))
+
+        vv = codec.read_value(v.type, rstream)
+        assert vv.value == v.value[:255]
+
+
 def test_wire_stringArray1(v_round_trip):
     v_round_trip(Value.makeStringArray([]))
 
@@ -239,6 +265,37 @@ def test_wire_rpcResponse(msg_round_trip):
     msg_round_trip(Message.rpcResponse(0x1234, 0x4321, "parameter"), minver=0x0300)
 
 
+def test_wire_resume(msg_round_trip):
+    msg_round_trip(Message.resume("token", b"\x00\x01" * 200, 0x01), minver=0x0300)
+
+
+def test_wire_cachedMessage():
+    msg = Message.entryAssign("Hi", 0x1234, 0x4321, Value.makeDouble(1.0), 0x1)
+    cmsg = CachedMessage(msg)
+    assert cmsg == msg
+
+    for proto_rev in (0x0200, 0x0300):
+        codec = WireCodec(proto_rev)
+        expected = []
+        msg.write(expected, codec)
+
+        # encoded once per protocol revision, then reused
+        for _ in range(2):
+            out = []
+            cmsg.write(out, codec)
+            assert out == [b"".join(expected)]
+
+    assert sorted(cmsg.m_encoded) == [0x0200, 0x0300]
+
+
+def test_wire_valueSlots():
+    # values are created for every update, so they don't carry a __dict__
+    v = Value.makeStringArray(["a", "bc"])
+    assert not hasattr(v, "__dict__")
+    with pytest.raises(AttributeError):
+        v.m_encoded = None
+
+
 # Various invalid unicode
 def test_decode_invalid_string(proto_rev):
     codec = WireCodec(proto_rev)